@@ -0,0 +1,108 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: entries and polymer entities fetched in batched GraphQL requests vs two
+# REST requests per entry, fallback to single requests (same fields), GraphQL retried after a backoff,
+# and time to the first record (local mock server)
+# Run from the 02-APIs folder:  python benchmarks/bench_batch_fetch.py [entries] [latency ms]
+import os
+import sys
+import time
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import RCSBClient, text_query, select_fields, ENTRY_FIELDS, ENTITY_FIELDS
+from mock_server import MockServer, mock_identifier
+
+
+def client_for(server, **kwargs):
+    kwargs.setdefault("rate", None)
+    return RCSBClient(search_url=server.search_url, data_url=server.data_url, graphql_url=server.graphql_url,
+                      backoff=0.01, **kwargs)
+
+
+def selected(record):
+    # A harvest record with the entry and entity cut down to the fields fetch_entries returns
+    return dict(record, entry=select_fields(record["entry"], ENTRY_FIELDS),
+                polymer_entity=select_fields(record["polymer_entity"], ENTITY_FIELDS))
+
+
+def run(server, query, rows, batch_size):
+    # Full harvest: (seconds to the first record, total seconds, records, requests sent)
+    before = server.requests
+    with client_for(server) as client:
+        start = time.perf_counter()
+        first, records = None, []
+        for record in client.harvest(query, rows=rows, batch_size=batch_size):
+            first = first if first is not None else time.perf_counter() - start
+            records.append(record)
+        return first, time.perf_counter() - start, records, server.requests - before
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    query = text_query("ATOMIC FORCE")
+
+    # Same records as the per-id requests, in search order, through 503s and retries
+    with MockServer(total=23, fail_every=5) as server:
+        with client_for(server, max_workers=4) as client:
+            full = list(client.harvest(query, rows=10))
+            expected = [selected(record) for record in full]
+            batched = list(client.harvest(query, rows=10, batch_size=5))
+            assert batched == expected and client.graphql_available
+            # The full REST documents have more fields than the batched records
+            assert "rcsb_entry_info" in full[0]["entry"] and "rcsb_entry_info" not in batched[0]["entry"]
+            assert server.graphql_requests >= 5
+            # Unknown ids come back empty, in place
+            ids = [mock_identifier(0), "ZZZZ", mock_identifier(1)]
+            fetched = list(client.fetch_entries(ids, batch_size=2))
+            assert [f[0] for f in fetched] == ids and fetched[1] == ("ZZZZ", None, None)
+            assert fetched[2][2]["rcsb_id"] == mock_identifier(1) + "_1"
+
+    # No GraphQL endpoint (404), or a GraphQL error: concurrent single requests instead, same fields
+    for options in ({"graphql": False}, {"graphql_max_ids": 3}):
+        with MockServer(total=23, **options) as server:
+            with client_for(server, max_workers=4) as client:
+                assert list(client.harvest(query, rows=10, batch_size=5)) == expected
+                # Batches already in flight fail too (one failure), none is sent during the backoff
+                assert not client.graphql_available and 1 <= server.graphql_requests <= client.max_workers
+                assert client.graphql_failures == 1
+
+    # GraphQL is tried again once the backoff is over, and the pause doubles while it keeps failing
+    with MockServer(total=23, graphql_max_ids=3) as server:
+        with client_for(server, max_workers=1, graphql_backoff=0.05) as client:
+            ids = [mock_identifier(rank) for rank in range(6)]
+            list(client.fetch_entries(ids, batch_size=6))
+            assert not client.graphql_available and server.graphql_requests == 1
+            time.sleep(0.06)
+            list(client.fetch_entries(ids, batch_size=6))
+            assert client.graphql_failures == 2 and client.graphql_retry_at - time.monotonic() > 0.05
+            time.sleep(0.11)
+            sent = server.graphql_requests
+            entries = [entry for _, entry, _ in client.fetch_entries(ids, batch_size=3)]
+            assert entries == [select_fields(client.entry(i), ENTRY_FIELDS) for i in ids]
+            assert server.graphql_requests == sent + 2 and client.graphql_failures == 0 and client.graphql_available
+    print("ok")
+
+    # Per-id REST requests vs batches of growing size
+    rows = 100
+    with MockServer(total=total, latency=latency) as server:
+        print(f"{total} entries, {latency * 1e3:.0f} ms latency per request, 8 workers\n")
+        print(f"{'fetch':30s} {'requests':>9s} {'first record':>13s} {'total':>9s}")
+        reference = None
+        for batch_size in (None, 10, 50, 100, 250):
+            first, elapsed, records, sent = run(server, query, rows, batch_size)
+            # Compared on the fields that both paths return
+            records = [selected(record) for record in records]
+            reference = reference if reference is not None else records
+            assert records == reference
+            label = "per id (entry + entity)" if batch_size is None else f"GraphQL, {batch_size} ids per request"
+            print(f"{label:30s} {sent:9d} {first * 1e3:10.0f} ms {elapsed:7.2f} s")
+    print("\n(the mock answers a batch in the same time as one id: real batches take longer,"
+          " but far less than one round trip per id)")
+
+
+if __name__ == "__main__":
+    main()
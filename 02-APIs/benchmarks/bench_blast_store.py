@@ -0,0 +1,122 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: BLAST questions answered on the columnar BlastTable vs by walking
+# lists of dicts, on several synthetic BLAST runs merged into one table
+# Run from the 02-APIs folder:  python benchmarks/bench_blast_store.py [MB per run] [runs]
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import BlastTable
+from bench_blast_xml import make_blast_xml
+
+
+def timed(func, *args, repeats=5, **kwargs):
+    # Best wall time of a few calls
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+# The same questions, walking a list of dicts (one per HSP)
+def dicts_filter(records):
+    return [r for r in records if r["evalue"] < 1e-20 and r["percent_identity"] > 30]
+
+
+def dicts_best_per_organism(records):
+    best = {}
+    for r in records:
+        if r["evalue"] < 1e-20 and r["percent_identity"] > 30:
+            if r["organism"] not in best or r["evalue"] < best[r["organism"]]["evalue"]:
+                best[r["organism"]] = r
+    return sorted(best.values(), key=lambda r: r["evalue"])
+
+
+def dicts_top(records, k=10):
+    return sorted(records, key=lambda r: -r["bit_score"])[:k]
+
+
+def dicts_count(records):
+    counts = {}
+    for r in records:
+        counts[r["organism"]] = counts.get(r["organism"], 0) + 1
+    return counts
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    run_count = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    workdir = tempfile.mkdtemp(prefix="databanks-store-")
+    try:
+        xml = os.path.join(workdir, "run.xml")
+        make_blast_xml(xml, size_mb)
+        table, t_build = timed(BlastTable.from_xml, xml, repeats=1)
+        print(f"one run: {len(table)} HSPs, table built in {t_build:.2f} s while streaming the XML")
+
+        # Several runs: the same hits with scores and e-values varied per run
+        rng = np.random.default_rng(0)
+        runs = []
+        for i in range(run_count):
+            columns = dict(table.columns)
+            columns["bit_score"] = columns["bit_score"] * rng.uniform(0.5, 1.5, len(table))
+            columns["evalue"] = columns["evalue"] * 10.0 ** rng.normal(0, 2, len(table))
+            runs.append(BlastTable(columns, table.strings, [f"run-{i}"]))
+        merged, t_concat = timed(BlastTable.concat, runs, repeats=1)
+        assert len(merged) == run_count * len(table) and merged.runs == [f"run-{i}" for i in range(run_count)]
+        assert (merged["accession"][:len(table)] == table["accession"]).all()
+        records = merged.records()
+        print(f"{run_count} runs merged: {len(merged)} HSPs in {t_concat * 1e3:.1f} ms")
+
+        # Persistence
+        path = os.path.join(workdir, "store.npz")
+        _, t_save = timed(merged.save, path, repeats=1)
+        loaded, t_load = timed(BlastTable.load, path, repeats=1)
+        assert all((loaded.columns[name] == merged.columns[name]).all() for name in merged.columns)
+        assert loaded.runs == merged.runs
+        print(f"save {t_save * 1e3:.1f} ms, load {t_load * 1e3:.1f} ms, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+
+        # Same answers both ways
+        print(f"\n{'question':44s} {'dicts':>10s} {'BlastTable':>12s}")
+        questions = [
+            ("e-value < 1e-20 and identity > 30%",
+             lambda: dicts_filter(records),
+             lambda: merged.filter(mask=(merged["evalue"] < 1e-20) & (merged["percent_identity"] > 30))),
+            ("... best HSP per organism",
+             lambda: dicts_best_per_organism(records),
+             lambda: merged.filter(mask=(merged["evalue"] < 1e-20) & (merged["percent_identity"] > 30))
+                           .best_per("organism", "evalue")),
+            ("top 10 by bit score",
+             lambda: dicts_top(records),
+             lambda: merged.top(10, "bit_score")),
+            ("HSPs per organism",
+             lambda: dicts_count(records),
+             lambda: merged.group_by("organism", func="count")),
+        ]
+        for label, by_dicts, by_table in questions:
+            expected, t_dicts = timed(by_dicts)
+            result, t_table = timed(by_table)
+            if isinstance(expected, dict):
+                assert dict(zip(result[0].tolist(), result[1].tolist())) == expected
+            else:
+                assert len(result) == len(expected)
+                for record, row in zip(expected, result.records()):
+                    assert record["evalue"] == row["evalue"] or record["bit_score"] == row["bit_score"]
+            print(f"{label:44s} {t_dicts * 1e3:8.1f} ms {t_table * 1e3:10.2f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
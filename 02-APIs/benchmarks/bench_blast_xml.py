@@ -0,0 +1,145 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: streaming BLAST XML parser (iterparse) vs the notebook's xmltodict.parse,
+# on blast.xml and on synthetic multi-query files, time and peak RSS in fresh processes
+# Run from the 02-APIs folder:  python benchmarks/bench_blast_xml.py [MB ...]
+import os
+import re
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+# Make the databanks package importable when running this file directly
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from databanks import iter_hits
+
+# xmltodict holds the whole document (several times the file size): skipped above this size
+XMLTODICT_LIMIT_MB = 256
+
+
+def make_blast_xml(path, size_mb, hits_per_query=500, source="blast.xml"):
+    """
+    Writes a multi-query BLAST XML file of about size_mb MB from the hits of
+    source: queries of hits_per_query hits each, every third hit with two HSPs
+    (the case where xmltodict returns a list instead of a dict).
+    """
+    text = open(source).read()
+    head = text[:text.index("<Iteration>")]
+    hits = re.findall(r"<Hit>.*?</Hit>\n", text, re.S)
+    target, written, query, count = size_mb * 1e6, 0, 0, 0
+    with open(path, 'w') as out:
+        written += out.write(head)
+        while written < target:
+            query += 1
+            written += out.write(f"<Iteration>\n  <Iteration_iter-num>{query}</Iteration_iter-num>\n"
+                                 f"  <Iteration_query-ID>Query_{query}</Iteration_query-ID>\n"
+                                 f"  <Iteration_query-def>synthetic query {query}</Iteration_query-def>\n"
+                                 f"  <Iteration_query-len>312</Iteration_query-len>\n<Iteration_hits>\n")
+            for num in range(1, hits_per_query + 1):
+                hit = re.sub(r"<Hit_num>\d+</Hit_num>", f"<Hit_num>{num}</Hit_num>", hits[count % len(hits)])
+                if count % 3 == 0:
+                    hsp = re.search(r"    <Hsp>.*?</Hsp>\n", hit, re.S).group(0)
+                    hit = hit.replace("</Hit_hsps>", hsp.replace("<Hsp_num>1</Hsp_num>", "<Hsp_num>2</Hsp_num>")
+                                      + "  </Hit_hsps>", 1)
+                written += out.write(hit)
+                count += 1
+            written += out.write("</Iteration_hits>\n</Iteration>\n")
+        out.write("</BlastOutput_iterations>\n</BlastOutput>\n")
+    return count
+
+
+# Each parser (imports, code) runs in its own interpreter and reports hits, HSPs, a checksum, time and peak RSS
+PARSERS = {
+    "streaming iterparse": ("from databanks import iter_hits", """
+hits = hsps = 0
+total = 0.0
+for hit in iter_hits(PATH):
+    hits += 1
+    hsps += len(hit.hsps)
+    total += sum(hsp.bit_score for hsp in hit.hsps)
+"""),
+    "xmltodict.parse (notebook)": ("import xmltodict", """
+with open(PATH, "r") as fp:
+    blast_res = fp.read()
+blast_results = xmltodict.parse(blast_res)
+# Single items come back as dicts, repeated ones as lists: normalise every level
+as_list = lambda value: value if isinstance(value, list) else [value]
+hits = hsps = 0
+total = 0.0
+for iteration in as_list(blast_results['BlastOutput']['BlastOutput_iterations']['Iteration']):
+    for hit in as_list((iteration.get('Iteration_hits') or {}).get('Hit', [])):
+        hits += 1
+        for hsp in as_list(hit['Hit_hsps']['Hsp']):
+            hsps += 1
+            total += float(hsp['Hsp_bit-score'])
+"""),
+}
+
+RUNNER = """
+import sys, json, time, resource
+sys.path.insert(0, ROOT)
+{setup}
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{"hits": hits, "hsps": hsps, "total": round(total, 3), "seconds": elapsed, "rss_mb": rss}}))
+"""
+
+
+def run_parser(path, setup, code):
+    done = subprocess.run([sys.executable, "-c", f"ROOT = {ROOT!r}\nPATH = {path!r}\n" + RUNNER.format(setup=setup, code=code)],
+                          capture_output=True, text=True)
+    if done.returncode != 0:
+        return None
+    return json.loads(done.stdout)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [32, 128, 1024]
+    workdir = tempfile.mkdtemp(prefix="databanks-blast-")
+    try:
+        # Multi-query file with multi-HSP hits: query of each hit, HSP lists
+        small = os.path.join(workdir, "small.xml")
+        count = make_blast_xml(small, 0.5, hits_per_query=50)
+        hits = list(iter_hits(small))
+        assert len(hits) == count and hits[0].query_id == "Query_1" and hits[50].query_id == "Query_2"
+        assert [len(hit.hsps) for hit in hits[:4]] == [2, 1, 1, 2] and hits[0].hsps[1].num == 2
+        assert hits[0].evalue == min(hsp.evalue for hsp in hits[0].hsps)
+        print("ok")
+
+        for size in [None] + sizes:
+            if size is None:
+                label, path = "blast.xml", "blast.xml"
+            else:
+                label, path = f"synthetic {size} MB", os.path.join(workdir, f"{size}.xml")
+                make_blast_xml(path, size)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"\n{label} ({size_mb:.1f} MB)")
+            results = {}
+            for name, (setup, code) in PARSERS.items():
+                if name.startswith("xmltodict") and size_mb > XMLTODICT_LIMIT_MB:
+                    print(f"  {name:28s} skipped (file above {XMLTODICT_LIMIT_MB} MB)")
+                    continue
+                result = run_parser(path, setup, code)
+                if result is None:
+                    print(f"  {name:28s} failed")
+                    continue
+                results[name] = result
+                print(f"  {name:28s} {result['seconds']:7.2f} s   peak RSS {result['rss_mb']:7.1f} MB   "
+                      f"{result['hits']} hits, {result['hsps']} HSPs")
+            # Both parsers read the same hits and HSPs
+            counts = {(r["hits"], r["hsps"], r["total"]) for r in results.values()}
+            assert len(counts) == 1, counts
+            if size is not None:
+                os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Benchmark: time and peak RSS of a full map load (np.fromfile, and gemmi if installed) vs the
+# memory-mapped CCP4Map (middle slice, sub-volume, projection), each in a fresh process
+# Run from the 02-APIs folder:  python benchmarks/bench_ccp4_map.py [synthetic grid size]
+import os
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+# Make the databanks package importable when running this file directly
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from databanks import CCP4Map, write_map
+
+# Each case runs in its own interpreter: setup (imports) is excluded from the RSS and the time.
+# Peak RSS also counts the page-cache pages a memory map touches (clean, dropped under memory
+# pressure); heap is what the case allocates (NumPy arrays included)
+CASES = {
+    "full load (np.fromfile)": (
+        "from databanks import read_header",
+        "h = read_header(PATH)\n"
+        "grid = np.fromfile(PATH, dtype=h['dtype'], offset=h['data_offset']).reshape(h['ns'], h['nr'], h['nc'])\n"
+        "result = grid.transpose(2, 1, 0)[grid.shape[2] // 2].copy()"),
+    "gemmi.read_ccp4_map + slice": (
+        "import gemmi",
+        "xmap = gemmi.read_ccp4_map(PATH).grid\n"
+        "result = xmap.array[xmap.array.shape[0] // 2, :, :].copy()"),
+    "CCP4Map middle slice": (
+        "from databanks import CCP4Map",
+        "result = CCP4Map(PATH).section()"),
+    "CCP4Map middle slice (z)": (
+        "from databanks import CCP4Map",
+        "result = CCP4Map(PATH).section(axis='z')"),
+    "CCP4Map 32^3 sub-volume": (
+        "from databanks import CCP4Map",
+        "m = CCP4Map(PATH)\n"
+        "c = [n // 2 for n in m.shape]\n"
+        "result = m.subvolume(slice(c[0] - 16, c[0] + 16), slice(c[1] - 16, c[1] + 16), slice(c[2] - 16, c[2] + 16))"),
+    "CCP4Map max projection (z)": (
+        "from databanks import CCP4Map",
+        "result = CCP4Map(PATH).projection('z', 'max')"),
+}
+
+RUNNER = """
+import sys, json, time, resource, tracemalloc
+sys.path.insert(0, ROOT)
+import numpy as np
+{setup}
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+start = time.perf_counter()
+{action}
+elapsed = time.perf_counter() - start
+heap = tracemalloc.get_traced_memory()[1]
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_mb": (after - before) / 1024, "heap_mb": heap / 1e6,
+                  "sum": float(np.asarray(result, dtype=np.float64).sum())}}))
+"""
+
+
+def run_case(path, setup, action):
+    code = f"ROOT = {ROOT!r}\nPATH = {path!r}\n" + RUNNER.format(setup=setup, action=action)
+    done = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if done.returncode != 0:
+        return None
+    return json.loads(done.stdout)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    workdir = tempfile.mkdtemp(prefix="databanks-ccp4-")
+    try:
+        real = os.path.join(workdir, "emd_32377.map")
+        with gzip.open("emd_32377.map.gz", 'rb') as f, open(real, 'wb') as out:
+            shutil.copyfileobj(f, out)
+
+        # Synthetic map written section by section (never whole in memory)
+        synthetic = os.path.join(workdir, "synthetic.map")
+        rng = np.random.default_rng(0)
+        noise = rng.normal(size=(size, size, 8)).astype(np.float32)
+        write_map(synthetic, np.lib.stride_tricks.as_strided(
+            noise, shape=(size, size, size), strides=noise.strides[:2] + (0,)))
+
+        for path in (real, synthetic):
+            with CCP4Map(path) as m:
+                print(f"\n{os.path.basename(path)}: {m.shape} voxels, {os.path.getsize(path) / 1e6:.0f} MB")
+            results = {}
+            for name, (setup, action) in CASES.items():
+                result = run_case(path, setup, action)
+                if result is None:
+                    print(f"  {name:32s} (not available)")
+                    continue
+                results[name] = result
+                print(f"  {name:32s} {result['seconds'] * 1e3:8.1f} ms   peak RSS +{result['rss_mb']:7.1f} MB"
+                      f"   heap {result['heap_mb']:7.1f} MB")
+            # Same middle slice from the full load and from the memory map
+            assert abs(results["full load (np.fromfile)"]["sum"] - results["CCP4Map middle slice"]["sum"]) < 1e-6
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: notebook download (.content + gzip copy) vs streamed download with on-the-fly
+# decompression of emd_32377.map.gz, served by the local mock server
+# Run from the 02-APIs folder:  python benchmarks/bench_emdb_download.py
+import os
+import sys
+import gzip
+import time
+import shutil
+import hashlib
+import tempfile
+import tracemalloc
+
+import requests
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import RCSBClient, MapDownloader, ChecksumError, file_checksum
+from mock_server import MockServer
+
+GZ_PATH = "emd_32377.map.gz"
+URL_PATH = "/pub/emdb/structures/EMD-32377/map/emd_32377.map.gz"
+
+
+def notebook_style(url, folder):
+    # The notebook: whole file in memory, written to disk, then decompressed into a second file
+    data = requests.get(url)
+    with open(os.path.join(folder, "emd_32377.map.gz"), 'wb') as fp:
+        fp.write(data.content)
+    with gzip.open(os.path.join(folder, "emd_32377.map.gz"), 'rb') as fp:
+        with open(os.path.join(folder, "emd_32377.map"), 'wb') as out:
+            shutil.copyfileobj(fp, out)
+    return os.path.join(folder, "emd_32377.map")
+
+
+def measure(func, *args):
+    # Wall time and peak Python memory of one call
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def sha256(path):
+    return hashlib.sha256(open(path, 'rb').read()).hexdigest()
+
+
+def main():
+    if not os.path.exists(GZ_PATH):
+        raise SystemExit(f"{GZ_PATH} not found (run from the 02-APIs folder)")
+    expected = hashlib.sha256(gzip.decompress(open(GZ_PATH, 'rb').read())).hexdigest()
+    checksum = file_checksum(GZ_PATH, "md5")
+    workdir = tempfile.mkdtemp(prefix="databanks-emdb-")
+    try:
+        # Plain streamed download with checksum, and a wrong checksum
+        with MockServer(files={URL_PATH: GZ_PATH}) as server:
+            url = server.url + URL_PATH
+            downloader = MapDownloader(backoff=0.01)
+            path = downloader.download(url, os.path.join(workdir, "copy.map.gz"), checksum=checksum)
+            assert file_checksum(path, "md5") == checksum
+            try:
+                downloader.fetch_map(url, os.path.join(workdir, "bad.map"), checksum="md5:" + "0" * 32)
+                raise AssertionError("wrong checksum accepted")
+            except ChecksumError:
+                assert not os.path.exists(os.path.join(workdir, "bad.map"))
+
+        # A transfer cut in the middle resumes with a Range request
+        with MockServer(files={URL_PATH: GZ_PATH}, drop_after=1_000_000) as server:
+            path = MapDownloader(backoff=0.01).fetch_map(server.url + URL_PATH, os.path.join(workdir, "resumed.map"),
+                                                         checksum=checksum)
+            assert sha256(path) == expected and server.requests == 2
+            assert not os.path.exists(path + ".gz.part")
+
+        # A server without Range support restarts from the first byte
+        with MockServer(files={URL_PATH: GZ_PATH}, drop_after=1_000_000, ranges=False) as server:
+            path = MapDownloader(backoff=0.01).fetch_map(server.url + URL_PATH, os.path.join(workdir, "restarted.map"),
+                                                         checksum=checksum)
+            assert sha256(path) == expected
+
+        # A partial .gz left by an earlier run is replayed locally, then completed
+        part = os.path.join(workdir, "partial.map.gz.part")
+        with open(GZ_PATH, 'rb') as f, open(part, 'wb') as out:
+            out.write(f.read(1_500_000))
+        with MockServer(files={URL_PATH: GZ_PATH}) as server:
+            path = MapDownloader().fetch_map(server.url + URL_PATH, os.path.join(workdir, "partial.map"),
+                                             checksum=checksum, keep_gz=True)
+            assert sha256(path) == expected and file_checksum(path + ".gz", "md5") == checksum
+
+        # Through the RCSB client: EMD id -> files.rcsb.org path -> .map
+        with MockServer(files={URL_PATH: GZ_PATH}) as server:
+            with RCSBClient(files_url=server.files_url, rate=None) as client:
+                path = client.download_map("EMD-32377", os.path.join(workdir, "client"))
+            assert os.path.basename(path) == "emd_32377.map" and sha256(path) == expected
+
+        # Time and peak memory, on the real map and on 8 concatenated copies (a multi-member .gz)
+        large = os.path.join(workdir, "large.map.gz")
+        with open(large, 'wb') as out:
+            for _ in range(8):
+                out.write(open(GZ_PATH, 'rb').read())
+        for source, label in ((GZ_PATH, GZ_PATH), (large, "8 x " + GZ_PATH)):
+            reference = hashlib.sha256()
+            with gzip.open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    reference.update(chunk)
+            with MockServer(files={URL_PATH: source}) as server:
+                url = server.url + URL_PATH
+                folder = tempfile.mkdtemp(dir=workdir)
+                path, t_nb, peak_nb = measure(notebook_style, url, folder)
+                assert sha256(path) == reference.hexdigest()
+                path, t_st, peak_st = measure(MapDownloader().fetch_map, url, os.path.join(folder, "streamed.map"))
+                assert sha256(path) == reference.hexdigest()
+            print(f"\n{label} ({os.path.getsize(source) / 1e6:.1f} MB -> {os.path.getsize(path) / 1e6:.1f} MB)")
+            print(f"notebook (.content + gzip copy): {t_nb * 1e3:7.1f} ms, peak {peak_nb / 1e6:6.1f} MB")
+            print(f"streamed + on-the-fly gunzip:    {t_st * 1e3:7.1f} ms, peak {peak_st / 1e6:6.1f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
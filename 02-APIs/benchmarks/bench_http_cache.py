@@ -0,0 +1,123 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: on-disk HTTP cache in front of the RCSB client, against the local mock
+# server (cache keys, repeat runs, TTL + ETag revalidation, offline mode, LRU eviction)
+# Run from the 02-APIs folder:  python benchmarks/bench_http_cache.py [results] [latency ms]
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import RCSBClient, HTTPCache, OfflineError, cache_key, text_query
+from mock_server import MockServer, mock_identifier
+
+
+class CountingCache(HTTPCache):
+    # HTTPCache that counts its reads (one per request, hit or miss)
+    reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return super().get(key)
+
+
+def harvest(server, cache, rate=None):
+    # One pipeline run: search + entry + polymer entity of every result
+    urls = {"search_url": server.search_url, "data_url": server.data_url} if server else {}
+    with RCSBClient(cache=cache, rate=rate, backoff=0.01, **urls) as client:
+        return list(client.harvest(text_query("ATOMIC FORCE"), rows=50))
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    workdir = tempfile.mkdtemp(prefix="databanks-cache-")
+    try:
+        # Equal requests share a key: JSON key order, spacing and query parameter order do not matter
+        assert cache_key("post", "HTTPS://Search.rcsb.org/q", b'{"a": 1, "b": [1, 2]}') == \
+            cache_key("POST", "https://search.rcsb.org/q", '{"b":[1,2],"a":1}')
+        assert cache_key("GET", "https://x.org/p?b=2&a=1#top") == cache_key("GET", "https://x.org/p?a=1&b=2")
+        assert cache_key("GET", "https://x.org/p?a=1") != cache_key("GET", "https://x.org/p?a=2")
+        assert cache_key("POST", "https://x.org/p", b"a=1&b=2") == cache_key("POST", "https://x.org/p", b"b=2&a=1")
+        assert cache_key("GET", "https://x.org/p") != cache_key("POST", "https://x.org/p")
+
+        path = os.path.join(workdir, "http.sqlite")
+        with MockServer(total=total, latency=latency) as server:
+            # First run fills the cache, the second makes no request at all (rate limit 10/s as by default)
+            with CountingCache(path) as cache:
+                start = time.perf_counter()
+                first = harvest(server, cache, rate=None)
+                t_first = time.perf_counter() - start
+                sent = server.requests
+                assert sent == total // 50 + 2 * total and cache.report()["stored"] == sent
+                # A miss reads the cache once, and the counters of the threads add up
+                assert cache.reads == sent and cache.report()["misses"] == sent
+            with HTTPCache(path) as cache:
+                start = time.perf_counter()
+                second = harvest(server, cache, rate=10.0)
+                t_second = time.perf_counter() - start
+                assert second == first and server.requests == sent
+                assert cache.report()["hits"] == sent and cache.report()["misses"] == 0
+            print(f"{total} entries, {sent} requests ({latency * 1e3:.0f} ms latency each)")
+            print(f"  first run (network, cache filled): {t_first:6.2f} s")
+            print(f"  repeat run (cache only):           {t_second:6.2f} s, {server.requests - sent} requests")
+
+            # Expired answers are revalidated: unchanged documents come back as empty 304s
+            with HTTPCache(path, ttl=0) as cache:
+                start = time.perf_counter()
+                third = harvest(server, cache)
+                t_third = time.perf_counter() - start
+                report = cache.report()
+            get_count = 2 * total
+            assert third == first and server.not_modified == get_count and report["revalidated"] == get_count
+            print(f"  expired (ttl=0), revalidated:      {t_third:6.2f} s, {server.not_modified} answers 304")
+
+            # A changed document has a new ETag: the full answer replaces the cached one
+            server.server.revision = 1
+            with HTTPCache(path, ttl=0) as cache:
+                changed = harvest(server, cache)
+                assert cache.report()["revalidated"] == total  # polymer entities did not change
+            assert changed[0]["entry"]["struct"]["title"].endswith("(revision 1)")
+
+        # Offline: the server is gone, the cache answers everything it has seen
+        with HTTPCache(path, offline=True) as cache:
+            start = time.perf_counter()
+            offline = harvest(server, cache)
+            t_offline = time.perf_counter() - start
+            assert offline == changed
+            with RCSBClient(data_url=server.data_url, cache=cache) as client:
+                try:
+                    client.entry(mock_identifier(total + 5))
+                    raise AssertionError("uncached request answered offline")
+                except OfflineError:
+                    pass
+        print(f"  offline (server stopped):          {t_offline:6.2f} s")
+
+        # LRU bound: the least recently used answers go first
+        with MockServer(total=total) as server:
+            with HTTPCache(os.path.join(workdir, "small.sqlite"), max_bytes=20_000) as cache:
+                with RCSBClient(data_url=server.data_url, cache=cache, rate=None) as client:
+                    ids = [mock_identifier(rank) for rank in range(100)]
+                    for identifier in ids:
+                        client.entry(identifier)
+                        client.entry(ids[0])  # kept in use
+                    requests_before = server.requests
+                    client.entry(ids[0])
+                    assert server.requests == requests_before
+                    report = cache.report()
+                    assert report["bytes"] <= 20_000 and report["evicted"] > 0
+                    client.entry(ids[1])
+                    assert server.requests == requests_before + 1
+                print(f"\nLRU: {report['entries']} answers kept in {report['bytes']} bytes, {report['evicted']} evicted")
+        print("ok")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: chunk-wise map summaries (statistics, histogram, slices, projections,
+# pyramid) vs the same computed on the fully loaded grid, and the summary cache
+# Run from the 02-APIs folder:  python benchmarks/bench_map_stats.py [synthetic grid size]
+import os
+import sys
+import gzip
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from databanks import CCP4Map, MapSummaryCache, map_summary, read_header, render_preview, write_map
+
+
+def full_summary(path, bins=256):
+    # The in-memory way: load the whole grid, then reduce it
+    h = read_header(path)
+    grid = np.fromfile(path, dtype=h["dtype"], offset=h["data_offset"]).reshape(h["ns"], h["nr"], h["nc"])
+    xyz = grid.transpose([2 - [h["mapc"], h["mapr"], h["maps"]].index(axis) for axis in (1, 2, 3)])
+    values = grid.astype(np.float64)
+    stats = {"min": values.min(), "max": values.max(), "mean": values.mean(), "rms": values.std(),
+             "counts": np.histogram(values, bins, range=(values.min(), values.max()))[0]}
+    arrays = {}
+    for dim, name in enumerate("xyz"):
+        arrays["slice_" + name] = np.take(xyz, xyz.shape[dim] // 2, axis=dim)
+        arrays["mip_" + name] = xyz.max(axis=dim)
+    return stats, arrays
+
+
+def timed(func, *args, **kwargs):
+    # Wall time of one call
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def measure(func, *args, **kwargs):
+    # Wall time of one call, then peak Python memory (NumPy buffers included) of a second,
+    # traced call (tracemalloc slows the calls down)
+    result, elapsed = timed(func, *args, **kwargs)
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def check(path):
+    # The chunk-wise summary matches the in-memory one (histogram forced to the data range)
+    reference, ref_arrays = full_summary(path)
+    stats, arrays = map_summary(path, slab=5)
+    for key in ("min", "max", "mean", "rms"):
+        assert np.isclose(stats[key], reference[key], rtol=1e-9, atol=1e-12), key
+    if stats["histogram"]["range"] == [reference["min"], reference["max"]]:
+        assert stats["histogram"]["counts"] == reference["counts"].tolist()
+    assert sum(stats["histogram"]["counts"]) == np.prod(stats["shape"])
+    for name, value in ref_arrays.items():
+        assert np.array_equal(arrays[name], value), name
+    level = arrays["level_0"]
+    assert max(level.shape) <= 64 and np.isclose(level.mean(), stats["mean"], atol=stats["rms"])
+    return stats
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    workdir = tempfile.mkdtemp(prefix="databanks-stats-")
+    try:
+        real = os.path.join(workdir, "emd_32377.map")
+        with gzip.open("emd_32377.map.gz", 'rb') as f, open(real, 'wb') as out:
+            shutil.copyfileobj(f, out)
+        stats = check(real)
+        # The EMDB header statistics agree with the computed ones
+        h = read_header(real)
+        assert np.isclose(stats["rms"], h["rms"], rtol=1e-6) and np.isclose(stats["mean"], h["amean"], rtol=1e-6)
+        # The preview is drawn without pyplot: the caller's matplotlib backend is left alone
+        png = render_preview(*map_summary(real), os.path.join(workdir, "preview.png"))
+        assert os.path.getsize(png) > 0 and "matplotlib.pyplot" not in sys.modules
+        print(f"emd_32377: contour {stats['contour']:.4f} (mean + 3 rms), {stats['contour_fraction']:.2%} of the voxels above")
+
+        # Axis orders other than x, y, z in the file
+        rng = np.random.default_rng(0)
+        volume = rng.normal(size=(45, 38, 61)).astype(np.float32)
+        for axes in ((3, 1, 2), (2, 3, 1)):
+            write_map(os.path.join(workdir, "axes.map"), volume, axes=axes)
+            check(os.path.join(workdir, "axes.map"))
+
+        # Larger synthetic map (a blob in noise), written without holding it in memory
+        synthetic = os.path.join(workdir, "synthetic.map")
+        noise = rng.normal(scale=0.1, size=(size, size, 8)).astype(np.float32)
+        noise[size // 3:2 * size // 3, size // 3:2 * size // 3] += 1.0
+        write_map(synthetic, np.lib.stride_tricks.as_strided(
+            noise, shape=(size, size, size), strides=noise.strides[:2] + (0,)))
+        print("ok")
+
+        for path in (real, synthetic):
+            with CCP4Map(path) as m:
+                print(f"\n{os.path.basename(path)}: {m.shape} voxels, {os.path.getsize(path) / 1e6:.0f} MB")
+            _, t_full, peak_full = measure(full_summary, path)
+            _, t_chunk, peak_chunk = measure(map_summary, path)
+            print(f"  full load + NumPy:   {t_full * 1e3:8.1f} ms, peak {peak_full / 1e6:7.1f} MB")
+            print(f"  chunk-wise summary:  {t_chunk * 1e3:8.1f} ms, peak {peak_chunk / 1e6:7.1f} MB")
+
+            # Cache: first call computes and renders, the next ones read the .json
+            cache = MapSummaryCache(os.path.join(workdir, "cache"))
+            _, t_miss = timed(cache.stats, path)
+            _, t_hit = timed(cache.stats, path)
+            assert cache.report() == {"hits": 1, "misses": 1} and os.path.exists(cache.preview(path))
+            print(f"  cache miss (+ npz + png): {t_miss * 1e3:8.1f} ms,  hit: {t_hit * 1e3:6.2f} ms")
+
+        # Browsing the collection reads only the small .json files
+        entries, t_browse = timed(MapSummaryCache(os.path.join(workdir, "cache")).browse)
+        assert len(entries) == 2
+        print(f"\nbrowse {len(entries)} cached maps: {t_browse * 1e3:.2f} ms")
+
+        # A modified map is recomputed, a removed one pruned
+        os.utime(real, ns=(0, 0))
+        cache = MapSummaryCache(os.path.join(workdir, "cache"))
+        assert not cache.is_fresh(real) and cache.is_fresh(synthetic)
+        os.remove(synthetic)
+        assert cache.prune() == [os.path.abspath(synthetic)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
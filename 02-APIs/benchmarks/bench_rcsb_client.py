@@ -0,0 +1,85 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: notebook-style blocking requests vs the pooled concurrent RCSBClient (local mock server)
+# Run from the 02-APIs folder:  python benchmarks/bench_rcsb_client.py [entries]
+import os
+import sys
+import time
+
+import requests
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import RCSBClient, text_query
+from mock_server import MockServer, mock_identifier
+
+
+def notebook_style(server, query, rows):
+    # One blocking call per page, entry and polymer entity, a new connection each time
+    ids = []
+    for start in range(0, server.server.total, rows):
+        query["request_options"]["paginate"] = {"start": start, "rows": rows}
+        ids += [item["identifier"] for item in requests.post(server.search_url, json=query).json()["result_set"]]
+    records = []
+    for identifier in ids:
+        entry = requests.get(f"{server.data_url}/entry/{identifier}").json()
+        entity = requests.get(f"{server.data_url}/polymer_entity/{identifier}/1").json()
+        records.append((identifier, entry["rcsb_external_references"][0]["id"],
+                        entity["entity_poly"]["pdbx_seq_one_letter_code"]))
+    return records
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    query = text_query("ATOMIC FORCE")
+
+    # Correctness against the mock: paging, order, limit, 404s, empty searches and retries
+    with MockServer(total=23, fail_every=5) as server:
+        with RCSBClient(search_url=server.search_url, data_url=server.data_url,
+                        max_workers=4, rate=None, backoff=0.01) as client:
+            assert client.search_ids(query, rows=5) == [mock_identifier(r) for r in range(23)]
+            assert client.search_ids(query, rows=5, limit=7) == [mock_identifier(r) for r in range(7)]
+            assert client.entry("ZZZZ") is None
+            records = list(client.harvest(query, rows=10))
+            assert [r["identifier"] for r in records] == [mock_identifier(r) for r in range(23)]
+            assert records[0]["emdb_ids"] == ["EMD-30000"]
+            assert records[0]["map_urls"][0].endswith("/EMD-30000/map/emd_30000.map.gz")
+            assert records[5]["polymer_entity"]["entity_poly"]["pdbx_seq_one_letter_code"]
+    with MockServer(total=0) as server:
+        with RCSBClient(search_url=server.search_url, data_url=server.data_url, rate=None) as client:
+            assert client.search_ids(query) == []
+
+    # Rate limit: a burst of 20 requests, then 20 per second
+    with MockServer(total=40) as server:
+        with RCSBClient(search_url=server.search_url, data_url=server.data_url, max_workers=8, rate=20) as client:
+            start = time.perf_counter()
+            list(client.entries([mock_identifier(r) for r in range(40)]))
+            elapsed = time.perf_counter() - start
+    assert elapsed >= (40 - 20) / 20 * 0.9, f"rate limit not applied ({elapsed:.2f} s)"
+    print(f"Rate limit 20/s: 40 requests in {elapsed:.2f} s")
+
+    # Throughput with 20 ms of server latency per request
+    with MockServer(total=total, latency=0.02) as server:
+        start = time.perf_counter()
+        baseline = notebook_style(server, query, rows=100)
+        t_notebook, c_notebook = time.perf_counter() - start, server.connections
+
+    for workers in (8, 32):
+        with MockServer(total=total, latency=0.02) as server:
+            with RCSBClient(search_url=server.search_url, data_url=server.data_url,
+                            max_workers=workers, rate=None) as client:
+                start = time.perf_counter()
+                records = [(r["identifier"], r["emdb_ids"][0],
+                            r["polymer_entity"]["entity_poly"]["pdbx_seq_one_letter_code"])
+                           for r in client.harvest(query, rows=100)]
+                t_client = time.perf_counter() - start
+            assert records == baseline
+            print(f"{total} entries, {server.requests} requests: notebook style {t_notebook:6.2f} s "
+                  f"({c_notebook} connections), RCSBClient {workers:2d} workers {t_client:5.2f} s "
+                  f"({server.connections} connections)  x{t_notebook / t_client:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# Based on simple_requests.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Check + benchmark: the notebook's module-level requests.get/post/put/delete vs the pooled RESTClient
+# (ordering of get_many/post_many, retries, per-host limits, timeouts, gzip, metrics) on the local mock server
+# Run from the 02-APIs folder:  python benchmarks/bench_rest_client.py [requests] [latency ms]
+import os
+import sys
+import json
+import time
+
+import requests
+
+# Make the databanks package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from databanks import RESTClient, endpoint_name
+from mock_server import MockServer
+
+# Headers and payload of the notebook
+HEADERS = {"Content-Type": "application/json", "User-Agent": "advance-python-small-client/1.0"}
+PAYLOAD = {"title": "This is the TITLE", "body": "This is a NEW DATA!", "userId": 1}
+
+
+def notebook_style(server, numbers):
+    # One blocking module-level call per post, a new connection each time
+    return [requests.get(f"{server.url}/posts/{n}", headers=HEADERS).json() for n in numbers]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.01
+
+    # Metrics keys: ids folded, API versions kept
+    assert endpoint_name("get", "https://data.rcsb.org/rest/v1/core/entry/4HHB") == "GET data.rcsb.org/rest/v1/core/entry/{id}"
+    assert endpoint_name("POST", "https://search.rcsb.org/rcsbsearch/v2/query") == "POST search.rcsb.org/rcsbsearch/v2/query"
+
+    # The notebook's four requests, through one client
+    with MockServer() as server:
+        with RESTClient(base_url=server.url, backoff=0.01) as client:
+            assert client.get("posts", params={"userId": 1}).json()[0]["title"] == "mock post 1"
+            created = client.post("posts", json=PAYLOAD)
+            assert created.status_code == 201 and created.json() == dict(PAYLOAD, id=101)
+            updated = client.put("posts/1", json=dict(PAYLOAD, title="New updated TITLE")).json()
+            assert updated["title"] == "New updated TITLE" and updated["id"] == 1
+            assert client.delete("posts/1").status_code == 200
+            assert client.get_json("posts/500", missing_ok=True) is None
+        assert server.connections == 1
+
+    # Bulk helpers: answers in input order although later posts answer later; failures in place
+    with MockServer(latency=0.005, fail_every=7) as server:
+        with RESTClient(base_url=server.url, max_workers=8, backoff=0.01) as client:
+            numbers = [n % 100 + 1 for n in range(200, 0, -1)]
+            posts = client.get_many([f"posts/{n}" for n in numbers])
+            assert [post["id"] for post in posts] == numbers
+            answers = client.get_many(["posts/3", "posts/999", "posts/4"], return_exceptions=True)
+            assert answers[0]["id"] == 3 and answers[2]["id"] == 4
+            assert isinstance(answers[1], requests.HTTPError) and answers[1].response.status_code == 404
+            try:
+                client.get_many(["posts/3", "posts/999"])
+                raise AssertionError("404 not raised")
+            except requests.HTTPError:
+                pass
+            payloads = [dict(PAYLOAD, title=f"title {i}") for i in range(50)]
+            assert [a["title"] for a in client.post_many("posts", payloads)] == [p["title"] for p in payloads]
+            users = client.get_many(["posts"] * 3, params=[{"userId": u} for u in (1, 2, 3)])
+            assert [{p["userId"] for p in answer} for answer in users] == [{1}, {2}, {3}]
+
+            # 503s were retried, and counted per endpoint
+            report = client.report()
+            host = server.url.split("//")[1]
+            stats = report[f"GET {host}/posts/{{id}}"]
+            assert stats["count"] == 200 + 3 + 2 and stats["errors"] == 2 and stats["retries"] > 0
+            assert report[f"POST {host}/posts"]["count"] == 50
+
+    # Per-host limit: never more than 2 requests (and connections) at once to the mock
+    with MockServer(latency=0.01) as server:
+        host = server.url.split("//")[1]
+        with RESTClient(base_url=server.url, max_workers=8, host_limits={host: 2}) as client:
+            client.get_many([f"posts/{n}" for n in range(1, 41)])
+        assert server.max_active <= 2 and server.connections <= 2, (server.max_active, server.connections)
+
+    # Timeouts: retried, then raised and counted as errors
+    with MockServer(latency=0.3) as server:
+        with RESTClient(base_url=server.url, timeout=0.05, retries=1, backoff=0.01) as client:
+            try:
+                client.get("posts/1")
+                raise AssertionError("timeout not raised")
+            except requests.Timeout:
+                pass
+            stats = client.report()[f"GET {server.url.split('//')[1]}/posts/{{id}}"]
+            assert stats["errors"] == 1 and stats["retries"] == 1
+            # A POST may have reached the server: not sent again unless the caller allows it
+            for retry_unsafe, attempts in ((False, 1), (True, 2)):
+                before = server.requests
+                try:
+                    client.post("posts", json=PAYLOAD, retry_unsafe=retry_unsafe)
+                    raise AssertionError("timeout not raised")
+                except requests.Timeout:
+                    pass
+                time.sleep(0.3)
+                assert server.requests - before == attempts, (retry_unsafe, server.requests - before)
+
+    # gzip: compressed answers (decoded transparently) and compressed request bodies
+    with MockServer(gzip=True) as server:
+        with RESTClient(base_url=server.url, compress_min=256) as client:
+            everything = client.get("posts")
+            assert everything.headers["Content-Encoding"] == "gzip" and len(everything.json()) == 100
+            big = dict(PAYLOAD, body="x" * 2000)
+            assert client.post("posts", json=big).json() == dict(big, id=101)
+            assert client.post("posts", json=PAYLOAD).json() == dict(PAYLOAD, id=101)
+            assert server.compressed_requests == 1
+            stats = client.report()[f"GET {server.url.split('//')[1]}/posts"]
+            assert stats["wire_bytes"] < stats["bytes"] / 2
+            print(f"gzip: /posts is {stats['bytes']} bytes, {stats['wire_bytes']} on the wire")
+    print("ok")
+
+    # Notebook style vs the pooled client
+    numbers = [n % 100 + 1 for n in range(count)]
+    with MockServer(latency=latency) as server:
+        start = time.perf_counter()
+        expected = notebook_style(server, numbers)
+        t_notebook = time.perf_counter() - start
+        connections = server.connections
+        print(f"\n{count} GET /posts/n ({latency * 1e3:.0f}-{3 * latency * 1e3:.0f} ms each): "
+              f"notebook style {t_notebook:6.2f} s ({connections} connections)")
+        for workers in (1, 8, 32):
+            before = server.connections
+            with RESTClient(base_url=server.url, max_workers=workers) as client:
+                start = time.perf_counter()
+                posts = client.get_many([f"posts/{n}" for n in numbers])
+                elapsed = time.perf_counter() - start
+                report = client.report()
+            assert posts == expected
+            print(f"  RESTClient {workers:2d} workers {elapsed:6.2f} s ({server.connections - before} connections)"
+                  f"  x{t_notebook / elapsed:4.1f}")
+        print("\nmetrics of the last run:")
+        print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
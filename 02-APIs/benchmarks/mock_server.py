@@ -0,0 +1,403 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Local mock of the RCSB search, data (REST + GraphQL) APIs, of the file server and of a small
+# jsonplaceholder-like /posts resource (simple_requests), no network needed; used by the checks and benchmarks
+#   with MockServer(total=1000, latency=0.02) as server:
+#       client = RCSBClient(search_url=server.search_url, data_url=server.data_url, ...)
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def mock_identifier(rank):
+    # Fake 4-character PDB ids: 1000, 1001, ... (hexadecimal, upper case)
+    return f"{0x1000 + rank:04X}"
+
+
+def _post_document(number):
+    # Post number of the /posts resource (userId: ten posts per user, as on jsonplaceholder)
+    return {"userId": (number - 1) // 10 + 1, "id": number,
+            "title": f"mock post {number}", "body": "lorem ipsum dolor sit amet " * 4}
+
+
+def _rank(server, identifier):
+    # Rank of a mock id, or None if there is no such entry
+    rank = int(identifier, 16) - 0x1000 if identifier and all(c in "0123456789ABCDEF" for c in identifier) else -1
+    return rank if 0 <= rank < server.total else None
+
+
+def _entry_document(server, identifier, rank):
+    revision = f" (revision {server.revision})" if server.revision else ""
+    return {
+        "rcsb_id": identifier,
+        "struct": {"title": f"Mock structure {identifier}{revision}"},
+        "exptl": [{"method": "ELECTRON MICROSCOPY"}],
+        "rcsb_external_references": [{"id": f"EMD-{30000 + rank}", "type": "EMDB",
+                                      "link": f"https://www.ebi.ac.uk/emdb/EMD-{30000 + rank}"}],
+        # Beyond the fields RCSBClient asks GraphQL for, as in a real REST entry
+        "rcsb_entry_info": {"deposited_atom_count": 1000 + rank, "polymer_entity_count": 2},
+    }
+
+
+def _entity_document(identifier, rank, entity):
+    return {
+        "rcsb_id": f"{identifier}_{entity}",
+        "rcsb_polymer_entity_container_identifiers": {"entity_id": str(entity)},
+        "entity_poly": {"type": "polypeptide(L)",
+                        "pdbx_seq_one_letter_code": "GPMAHAPGTDQMFYVGTMDGWYLDTKLNSVAIGAHW"[:20 + rank % 16]},
+        "rcsb_polymer_entity": {"pdbx_description": f"Mock protein {entity}"},
+    }
+
+
+def _selection(query):
+    # Field tree selected under entries(...) in a GraphQL query text: {"struct": {"title": None}, ...}
+    tokens = re.findall(r"\w+|[{}]", re.sub(r"\([^)]*\)", "", query))
+    stack, name = [{}], None
+    for token in tokens:
+        if token == "{":
+            stack[-1][name] = {}
+            stack.append(stack[-1][name])
+        elif token == "}":
+            stack.pop()
+        else:
+            name = token
+            stack[-1][name] = None
+    return stack[0]["query"]["entries"]
+
+
+def _select(document, fields):
+    # What GraphQL answers: the selected fields only (null when missing)
+    if isinstance(document, list):
+        return [_select(item, fields) for item in document]
+    if not isinstance(document, dict):
+        return document
+    return {name: document.get(name) if sub is None else _select(document.get(name), sub)
+            for name, sub in fields.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1: connections stay open between requests (keep-alive)
+    protocol_version = "HTTP/1.1"
+
+    # Headers and body are separate writes: without TCP_NODELAY each keep-alive answer waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+
+    def _send(self, status, document=None, headers=()):
+        body = json.dumps(document).encode() if document is not None else b""
+        headers = list(headers)
+        if self.server.gzip and len(body) >= 512 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            # Compressed answer (the ETag below stays that of the document)
+            headers.append(("Content-Encoding", "gzip"))
+            document_body, body = body, gzip.compress(body)
+        else:
+            document_body = body
+        if status == 200 and self.command == "GET":
+            # Validator of the document: a matching If-None-Match gets an empty 304
+            etag = '"' + hashlib.sha1(document_body).hexdigest()[:16] + '"'
+            headers.append(("ETag", etag))
+            if self.headers.get("If-None-Match") == etag:
+                with self.server.lock:
+                    self.server.not_modified += 1
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def _tracked(self, handler):
+        # Run a request handler, keeping track of the requests being answered at the same time
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            handler()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+
+    def _body(self):
+        # Request body as JSON (gzip-compressed bodies are decompressed first)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            with self.server.lock:
+                self.server.compressed_requests += 1
+            body = gzip.decompress(body)
+        return json.loads(body or b"{}")
+
+
+    def _count(self):
+        # Count the request, wait the simulated latency and maybe fail it
+        with self.server.lock:
+            self.server.requests += 1
+            number = self.server.requests
+        time.sleep(self.server.latency)
+        if self.server.fail_every and number % self.server.fail_every == 0:
+            self._send(503, {"error": "try again"}, headers=[("Retry-After", "0")])
+            return False
+        return True
+
+
+    def do_POST(self):
+        self._tracked(self._post)
+
+
+    def do_PUT(self):
+        self._tracked(self._put)
+
+
+    def do_DELETE(self):
+        self._tracked(self._delete)
+
+
+    def do_GET(self):
+        self._tracked(self._get)
+
+
+    def _post_number(self, path):
+        # n of /posts/n if that post exists, else None
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "posts" and parts[1].isdigit() and 1 <= int(parts[1]) <= 100:
+            return int(parts[1])
+        return None
+
+
+    def _posts(self, path, query):
+        # GET /posts (?userId=) and /posts/n; later posts answer later, so concurrent answers arrive out of order
+        if path.rstrip("/") == "/posts":
+            users = parse_qs(query).get("userId")
+            posts = [_post_document(n) for n in range(1, 101)]
+            return self._send(200, [p for p in posts if not users or str(p["userId"]) in users])
+        number = self._post_number(path)
+        if number is None:
+            return self._send(404, {})
+        time.sleep(self.server.latency * (number % 3))
+        self._send(200, _post_document(number))
+
+
+    def _put(self):
+        document = self._body()
+        if not self._count():
+            return
+        number = self._post_number(urlsplit(self.path).path)
+        if number is None:
+            return self._send(404, {})
+        self._send(200, dict(document, id=number))
+
+
+    def _delete(self):
+        if not self._count():
+            return
+        if self._post_number(urlsplit(self.path).path) is None:
+            return self._send(404, {})
+        self._send(200, {})
+
+
+    def _post(self):
+        query = self._body()
+        if not self._count():
+            return
+        path = urlsplit(self.path).path
+        if path.rstrip("/") == "/posts":
+            # New post: the payload echoed with the next id
+            return self._send(201, dict(query, id=101))
+        if path == "/graphql":
+            with self.server.lock:
+                self.server.graphql_requests += 1
+            if self.server.graphql:
+                return self._graphql(query)
+        if path != "/rcsbsearch/v2/query":
+            return self._send(404, {"error": "not found"})
+        page = query.get("request_options", {}).get("paginate", {"start": 0, "rows": 10})
+        start, rows, total = page["start"], page["rows"], self.server.total
+        if total == 0:
+            return self._send(204)
+        result_set = [{"identifier": mock_identifier(rank), "score": 1.0 - rank / total}
+                      for rank in range(start, min(start + rows, total))]
+        self._send(200, {"query_id": "mock", "result_type": "entry", "total_count": total,
+                         "result_set": result_set})
+
+
+    def _graphql(self, query):
+        # entries(entry_ids: $ids): the REST documents of the known ids, each with its polymer
+        # entities, cut down to the fields selected by the query text
+        ids = (query.get("variables") or {}).get("ids") or []
+        if len(ids) > self.server.graphql_max_ids:
+            return self._send(200, {"data": None, "errors": [{"message": f"at most {self.server.graphql_max_ids} ids"}]})
+        fields, entries = _selection(query.get("query") or ""), []
+        for identifier in ids:
+            rank = _rank(self.server, identifier)
+            if rank is not None:
+                entry = _entry_document(self.server, identifier, rank)
+                entry["polymer_entities"] = [_entity_document(identifier, rank, entity) for entity in (1, 2)]
+                entries.append(_select(entry, fields))
+        self._send(200, {"data": {"entries": entries}})
+
+
+    def _send_file(self, local_path):
+        # Static file with Range support (206), optionally cut after drop_after bytes once
+        size = os.path.getsize(local_path)
+        start = 0
+        ranged = self.server.ranges and self.headers.get("Range", "").startswith("bytes=")
+        if ranged:
+            start = int(self.headers["Range"][6:].split("-")[0])
+            if start >= size:
+                return self._send(416, headers=[("Content-Range", f"bytes */{size}")])
+        self.send_response(206 if ranged else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Accept-Ranges", "bytes" if self.server.ranges else "none")
+        self.send_header("ETag", f'"{size:x}-{os.stat(local_path).st_mtime_ns:x}"')
+        if ranged:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        sent = 0
+        with open(local_path, 'rb') as f:
+            f.seek(start)
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                with self.server.lock:
+                    drop = self.server.drop_after and sent + len(chunk) > self.server.drop_after
+                    if drop:
+                        self.server.drop_after = 0
+                if drop:
+                    # Simulate a broken transfer: close the connection in the middle of the body
+                    self.wfile.write(chunk[:len(chunk) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(chunk)
+                sent += len(chunk)
+
+
+    def _get(self):
+        if not self._count():
+            return
+        parts = urlsplit(self.path)
+        path = parts.path
+        if path.startswith("/posts"):
+            return self._posts(path, parts.query)
+        if path in self.server.files:
+            return self._send_file(self.server.files[path])
+        parts = path.strip("/").split("/")
+        # /rest/v1/core/entry/{id} and /rest/v1/core/polymer_entity/{id}/{entity}
+        if parts[:3] == ["rest", "v1", "core"] and len(parts) >= 5:
+            identifier = parts[4]
+            rank = _rank(self.server, identifier)
+            if rank is None:
+                return self._send(404, {"status": 404, "message": "No data found"})
+            if parts[3] == "entry":
+                return self._send(200, _entry_document(self.server, identifier, rank))
+            if parts[3] == "polymer_entity" and len(parts) == 6:
+                return self._send(200, _entity_document(identifier, rank, parts[5]))
+        self._send(404, {"status": 404, "message": "No data found"})
+
+
+class _Server(ThreadingHTTPServer):
+    # Room for many clients connecting at once (the default backlog of 5 drops SYNs: 1 s retransmits)
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up (e.g. after a timeout) are expected, other errors are printed
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+# Class for a mock server running in a background thread on a free local port
+class MockServer:
+    def __init__(self, total=100, latency=0.0, fail_every=0, files=None, ranges=True, drop_after=0, revision=0,
+                 graphql=True, graphql_max_ids=500, gzip=False):
+        # total search results; seconds added to every request; every n-th request answers 503;
+        # revision changes the entry documents (and their ETags), as an update of the database would
+        # files: URL path -> local file served as is (Range requests unless ranges=False);
+        # drop_after: the first file transfer going past this many bytes is cut;
+        # graphql=False answers 404 on /graphql, batches above graphql_max_ids ids get a GraphQL error;
+        # gzip: answers of 512 bytes or more are compressed for clients accepting it
+        self.server = _Server(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.total = total
+        self.server.latency = latency
+        self.server.fail_every = fail_every
+        self.server.files = dict(files or {})
+        self.server.ranges = ranges
+        self.server.drop_after = drop_after
+        self.server.revision = revision
+        self.server.not_modified = 0
+        self.server.graphql = graphql
+        self.server.graphql_max_ids = graphql_max_ids
+        self.server.graphql_requests = 0
+        self.server.gzip = gzip
+        self.server.compressed_requests = 0
+        self.server.active = 0
+        self.server.max_active = 0
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.connections = 0
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.search_url = self.url + "/rcsbsearch/v2/query"
+        self.data_url = self.url + "/rest/v1/core"
+        self.files_url = self.url + "/pub/emdb/structures"
+        self.graphql_url = self.url + "/graphql"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+
+    @property
+    def connections(self):
+        return self.server.connections
+
+
+    @property
+    def not_modified(self):
+        # 304 answers sent to conditional requests
+        return self.server.not_modified
+
+
+    @property
+    def graphql_requests(self):
+        return self.server.graphql_requests
+
+
+    @property
+    def max_active(self):
+        # Most requests answered at the same time so far
+        return self.server.max_active
+
+
+    @property
+    def compressed_requests(self):
+        # Requests that came with a gzip-compressed body
+        return self.server.compressed_requests
@@ -0,0 +1,25 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# databanks/__init__.py
+# Reusable clients for the databanks of the RCSB_Mapping notebook (RCSB, EMDB, NCBI BLAST)
+# and the pooled REST client generalising simple_requests.
+
+# Core imports
+from .rest_client_module import RESTClient, RateLimiter, EndpointStats, endpoint_name
+from .rcsb_client_module import RCSBClient, text_query, select_fields, ENTRY_FIELDS, ENTITY_FIELDS
+from .http_cache_module import HTTPCache, CachedSession, CacheLookup, OfflineError, cache_key
+from .emdb_download_module import MapDownloader, GzipStream, ChecksumError, file_checksum
+from .ccp4_map_module import CCP4Map, read_header, write_map
+from .map_stats_module import MapSummaryCache, map_summary, render_preview
+from .blast_xml_module import Hit, HSP, iter_hits, iter_hsps
+from .blast_store_module import BlastTable, parse_organism
+
+# Allow users to cleanly import these classes and functions directly
+__all__ = ['RESTClient', 'RateLimiter', 'EndpointStats', 'endpoint_name',
+           'RCSBClient', 'text_query', 'select_fields', 'ENTRY_FIELDS', 'ENTITY_FIELDS',
+           'HTTPCache', 'CachedSession', 'CacheLookup', 'OfflineError', 'cache_key',
+           'MapDownloader', 'GzipStream', 'ChecksumError', 'file_checksum',
+           'CCP4Map', 'read_header', 'write_map',
+           'MapSummaryCache', 'map_summary', 'render_preview',
+           'Hit', 'HSP', 'iter_hits', 'iter_hsps',
+           'BlastTable', 'parse_organism']
@@ -0,0 +1,293 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import re for the organism names, json for the run list and NumPy for the columns
+import re
+import json
+import numpy as np
+
+# Import the streaming parser: tables are filled hit by hit, never from a whole document
+from .blast_xml_module import iter_hits
+
+# One row per HSP, one NumPy array per column; text columns hold int32 codes (see STRING_COLUMNS)
+COLUMNS = [
+    ("run", "i4"), ("query_id", "i4"), ("query_len", "i4"),
+    ("hit_num", "i4"), ("hit_id", "i4"), ("accession", "i4"), ("definition", "i4"), ("organism", "i4"),
+    ("hit_len", "i4"), ("hsp_num", "i4"),
+    ("bit_score", "f8"), ("score", "i4"), ("evalue", "f8"), ("percent_identity", "f4"),
+    ("identity", "i4"), ("positive", "i4"), ("gaps", "i4"), ("align_len", "i4"),
+    ("query_from", "i4"), ("query_to", "i4"), ("hit_from", "i4"), ("hit_to", "i4"),
+    ("query_frame", "i2"), ("hit_frame", "i2"),
+]
+STRING_COLUMNS = ("query_id", "hit_id", "accession", "definition", "organism")
+
+# Organism in a hit description: '[Genus species]' (nr, RefSeq) or 'Genus species [strain] cDNA/mRNA' (dbEST)
+ORGANISM_PATTERNS = [
+    re.compile(r"\[([^\[\]]+)\]\s*$"),
+    re.compile(r"\b([A-Z][a-z]+ [a-z][a-z.-]+)(?: \S+)? (?:cDNA|mRNA|genomic|DNA|EST)\b"),
+]
+
+
+def parse_organism(definition):
+    # Best guess of the organism of a hit from its description ('' when none is found)
+    for pattern in ORGANISM_PATTERNS:
+        match = pattern.search(definition or "")
+        if match:
+            return match.group(1)
+    return ""
+
+
+# Class for many BLAST runs as one columnar table of HSPs, queried with vectorised NumPy operations
+class BlastTable:
+    def __init__(self, columns=None, strings=None, runs=None, index=None):
+        # columns: name -> array (all of the same length); strings: text column -> its distinct values
+        self.columns = columns if columns is not None else {name: np.zeros(0, dtype) for name, dtype in COLUMNS}
+        self.strings = strings if strings is not None else {name: np.array([], dtype=str) for name in STRING_COLUMNS}
+
+        # Name (usually the XML path) of each run, indexed by the 'run' column
+        self.runs = list(runs or [])
+
+        # Selected rows, in order (None = all): filters and sorts only narrow or reorder
+        # this index, and a column is gathered through it only when it is read
+        self.index = index
+
+
+    @classmethod
+    def from_hits(cls, hits, run="run"):
+        """
+        Builds a table from Hit records (e.g. iter_hits(path)), one row per
+        HSP. Text columns are stored once per distinct value.
+        """
+        columns = {name: [] for name, _ in COLUMNS}
+        codes = {name: {} for name in STRING_COLUMNS}
+
+        def code(column, value):
+            # Code of a text value, added to the column's table on first sight
+            table = codes[column]
+            value = value or ""
+            if value not in table:
+                table[value] = len(table)
+            return table[value]
+
+        for hit in hits:
+            hit_codes = (code("query_id", hit.query_id), code("hit_id", hit.id), code("accession", hit.accession),
+                         code("definition", hit.definition), code("organism", parse_organism(hit.definition)))
+            for hsp in hit.hsps:
+                for name, value in zip(STRING_COLUMNS, hit_codes):
+                    columns[name].append(value)
+                columns["query_len"].append(hit.query_len or 0)
+                columns["hit_num"].append(hit.num or 0)
+                columns["hit_len"].append(hit.length or 0)
+                columns["hsp_num"].append(hsp.num or 0)
+                columns["percent_identity"].append(hsp.percent_identity or 0.0)
+                for name in ("bit_score", "score", "evalue", "identity", "positive", "gaps", "align_len",
+                             "query_from", "query_to", "hit_from", "hit_to", "query_frame", "hit_frame"):
+                    value = getattr(hsp, name)
+                    columns[name].append(value if value is not None else 0)
+
+        size = len(columns["hsp_num"])
+        columns = {name: np.zeros(size, dtype) if name == "run" else np.array(columns[name], dtype=dtype)
+                   for name, dtype in COLUMNS}
+        strings = {name: np.array(list(codes[name]), dtype=str) for name in STRING_COLUMNS}
+        return cls(columns, strings, [run])
+
+
+    @classmethod
+    def from_xml(cls, path, run=None):
+        # Table of one BLAST XML file, read with the streaming parser
+        return cls.from_hits(iter_hits(path), run=run if run is not None else str(path))
+
+
+    def __len__(self):
+        return len(self.columns["run"]) if self.index is None else len(self.index)
+
+
+    def __repr__(self):
+        return f"BlastTable({len(self)} HSPs, {len(self.runs)} runs)"
+
+
+    def column(self, name):
+        # Values of a column for the selected rows (codes for the text columns)
+        values = self.columns[name]
+        return values if self.index is None else values[self.index]
+
+
+    def __getitem__(self, key):
+        """
+        table['evalue'] is a column (text columns decoded to strings),
+        table[mask] / table[positions] / table[a:b] a new table of those rows.
+        """
+        if isinstance(key, str):
+            if key in STRING_COLUMNS:
+                return self.strings[key][self.column(key)]
+            if key == "run" and self.runs:
+                return np.array(self.runs, dtype=str)[self.column("run")]
+            return self.column(key)
+        if isinstance(key, slice):
+            positions = np.arange(len(self))[key]
+        else:
+            key = np.asarray(key)
+            positions = np.flatnonzero(key) if key.dtype == bool else key
+        index = positions if self.index is None else self.index[positions]
+        return BlastTable(self.columns, self.strings, self.runs, index)
+
+
+    def compact(self):
+        # A table holding only the selected rows (index applied to every column)
+        if self.index is None:
+            return self
+        return BlastTable({name: self.column(name) for name in self.columns}, self.strings, self.runs)
+
+
+    def codes(self, column, values):
+        # Codes of text values in a column, for fast comparisons on the int32 codes (-1 if absent)
+        lookup = {value: i for i, value in enumerate(self.strings[column])}
+        return np.array([lookup.get(value, -1) for value in np.atleast_1d(values)], dtype=np.int32)
+
+
+    def filter(self, evalue_max=None, bit_score_min=None, identity_min=None, align_len_min=None,
+               query=None, organism=None, mask=None):
+        """
+        Rows matching every given condition: e-value <= evalue_max, bit score
+        >= bit_score_min, percent identity >= identity_min, alignment length
+        >= align_len_min, query id / organism equal to a value (or in a list),
+        and an optional boolean mask over the rows of this table.
+        """
+        keep = np.ones(len(self), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        if evalue_max is not None:
+            keep &= self.column("evalue") <= evalue_max
+        if bit_score_min is not None:
+            keep &= self.column("bit_score") >= bit_score_min
+        if identity_min is not None:
+            keep &= self.column("percent_identity") >= identity_min
+        if align_len_min is not None:
+            keep &= self.column("align_len") >= align_len_min
+        for column, values in (("query_id", query), ("organism", organism)):
+            if values is not None:
+                keep &= np.isin(self.column(column), self.codes(column, values))
+        return self[keep]
+
+
+    def _sort_key(self, column, descending):
+        # Values to sort on ascending: text columns by their strings' rank, descending by negation
+        if column in STRING_COLUMNS:
+            rank = np.argsort(np.argsort(self.strings[column], kind="stable"))
+            values = rank[self.column(column)]
+        else:
+            values = self.column(column)
+        return -values.astype(np.float64) if descending else values
+
+
+    def sort(self, by="evalue", descending=False):
+        """
+        Rows sorted on one column or a list of columns (the first is the
+        primary key); descending applies to all of them or is a matching list.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        descending = descending if isinstance(descending, (list, tuple)) else [descending] * len(by)
+        # np.lexsort sorts on the last key first
+        keys = [self._sort_key(column, desc) for column, desc in zip(by, descending)][::-1]
+        return self[np.lexsort(keys)]
+
+
+    def top(self, k, by="bit_score", descending=True):
+        # The k best rows on one column (argpartition: no full sort), best first
+        if k >= len(self):
+            return self.sort(by, descending)
+        key = self._sort_key(by, descending)
+        part = np.argpartition(key, k - 1)[:k]
+        return self[part[np.argsort(key[part], kind="stable")]]
+
+
+    def best_per(self, group="organism", by="evalue", descending=False, k=1):
+        """
+        The k best rows of every group (e.g. the best HSP per organism, or
+        per query), groups in the order of their best row.
+        """
+        groups = self.column(group)
+        # Sort by group, then by the ranking column within each group
+        order = np.lexsort((self._sort_key(by, descending), groups))
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        # Rank of each row within its group, kept when below k
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        chosen = order[rank < k]
+        # Groups ordered by their best row
+        return self[chosen].sort(by, descending)
+
+
+    def group_by(self, group="organism", column="bit_score", func="max"):
+        """
+        Aggregates a numeric column per group ('max', 'min', 'sum', 'mean' or
+        'count'). Returns (group values, aggregated values), sorted by group.
+        """
+        codes = self.column(group)
+        if group in STRING_COLUMNS or group == "run":
+            # Small non-negative codes: counting them needs no sort
+            counts = np.bincount(codes)
+            unique = np.flatnonzero(counts)
+            inverse = (np.cumsum(counts > 0) - 1)[codes]
+            counts = counts[unique]
+        else:
+            unique, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        labels = self.strings[group][unique] if group in STRING_COLUMNS else unique
+        if func == "count":
+            return labels, counts
+        values = self.column(column).astype(np.float64)
+        if func in ("sum", "mean"):
+            result = np.bincount(inverse, weights=values, minlength=len(unique))
+            return labels, result / counts if func == "mean" else result
+        result = np.full(len(unique), -np.inf if func == "max" else np.inf)
+        {"max": np.maximum, "min": np.minimum}[func].at(result, inverse, values)
+        return labels, result
+
+
+    def records(self, limit=None):
+        # Rows as dicts (text columns decoded), e.g. for printing or JSON
+        table = self[:limit] if limit is not None else self
+        names = [name for name, _ in COLUMNS]
+        values = [table[name].tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        One table from several (e.g. many BLAST runs): text values are merged
+        into shared tables and the codes and run numbers remapped.
+        """
+        tables = [table.compact() for table in tables]
+        strings, runs, parts = {}, [], []
+        for name in STRING_COLUMNS:
+            strings[name] = np.unique(np.concatenate([t.strings[name] for t in tables] or [np.array([], dtype=str)]))
+        for table in tables:
+            columns = dict(table.columns)
+            for name in STRING_COLUMNS:
+                # Position of each old value in the merged (sorted) table
+                remap = np.searchsorted(strings[name], table.strings[name]).astype(np.int32)
+                columns[name] = remap[columns[name]]
+            columns["run"] = columns["run"] + len(runs)
+            runs.extend(table.runs)
+            parts.append(columns)
+        if not parts:
+            return cls()
+        columns = {name: np.concatenate([part[name] for part in parts]) for name, _ in COLUMNS}
+        return cls(columns, strings, runs)
+
+
+    def save(self, path):
+        # One .npz file: a column per array, the text tables and the run names (no pickled objects)
+        table = self.compact()
+        arrays = {"column_" + name: values for name, values in table.columns.items()}
+        arrays.update({"strings_" + name: values for name, values in table.strings.items()})
+        arrays["runs"] = np.array(json.dumps(table.runs))
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        return path
+
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            columns = {name: npz["column_" + name] for name, _ in COLUMNS}
+            strings = {name: npz["strings_" + name] for name in STRING_COLUMNS}
+            return cls(columns, strings, json.loads(str(npz["runs"])))
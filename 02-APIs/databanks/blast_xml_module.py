@@ -0,0 +1,137 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import ElementTree: iterparse reads the XML incrementally, element by element
+import xml.etree.ElementTree as ET
+
+
+# Class for one high-scoring segment pair (one local alignment of a hit)
+class HSP:
+    __slots__ = ("num", "bit_score", "score", "evalue", "query_from", "query_to", "hit_from", "hit_to",
+                 "query_frame", "hit_frame", "identity", "positive", "gaps", "align_len",
+                 "qseq", "hseq", "midline")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        # BLAST leaves out <Hsp_gaps> when there are none
+        self.gaps = 0
+
+
+    @property
+    def percent_identity(self):
+        # Identical positions over the alignment length, in percent
+        return 100.0 * self.identity / self.align_len if self.identity is not None and self.align_len else None
+
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+    def __repr__(self):
+        return f"HSP(num={self.num}, evalue={self.evalue}, bit_score={self.bit_score}, identity={self.identity}/{self.align_len})"
+
+
+# Class for one database sequence hit of a query, with its HSPs (always a list)
+class Hit:
+    __slots__ = ("query_id", "query_def", "query_len", "num", "id", "definition", "accession", "length", "hsps")
+
+    def __init__(self, query_id=None, query_def=None, query_len=None):
+        # Query of the <Iteration> the hit belongs to (one per query in multi-query searches)
+        self.query_id, self.query_def, self.query_len = query_id, query_def, query_len
+        self.num = self.id = self.definition = self.accession = self.length = None
+        self.hsps = []
+
+
+    @property
+    def best(self):
+        # The HSP with the lowest e-value
+        return min(self.hsps, key=lambda hsp: hsp.evalue) if self.hsps else None
+
+
+    @property
+    def evalue(self):
+        return self.best.evalue if self.hsps else None
+
+
+    @property
+    def bit_score(self):
+        return max(hsp.bit_score for hsp in self.hsps) if self.hsps else None
+
+
+    def as_dict(self):
+        record = {name: getattr(self, name) for name in self.__slots__ if name != "hsps"}
+        record["hsps"] = [hsp.as_dict() for hsp in self.hsps]
+        return record
+
+
+    def __repr__(self):
+        return f"Hit(num={self.num}, id={self.id!r}, evalue={self.evalue}, hsps={len(self.hsps)})"
+
+
+# BLAST XML tag -> (attribute, converter)
+HSP_FIELDS = {
+    "Hsp_num": ("num", int), "Hsp_bit-score": ("bit_score", float), "Hsp_score": ("score", int),
+    "Hsp_evalue": ("evalue", float), "Hsp_query-from": ("query_from", int), "Hsp_query-to": ("query_to", int),
+    "Hsp_hit-from": ("hit_from", int), "Hsp_hit-to": ("hit_to", int),
+    "Hsp_query-frame": ("query_frame", int), "Hsp_hit-frame": ("hit_frame", int),
+    "Hsp_identity": ("identity", int), "Hsp_positive": ("positive", int), "Hsp_gaps": ("gaps", int),
+    "Hsp_align-len": ("align_len", int), "Hsp_qseq": ("qseq", str), "Hsp_hseq": ("hseq", str),
+    "Hsp_midline": ("midline", str),
+}
+HIT_FIELDS = {
+    "Hit_num": ("num", int), "Hit_id": ("id", str), "Hit_def": ("definition", str),
+    "Hit_accession": ("accession", str), "Hit_len": ("length", int),
+}
+QUERY_FIELDS = {"Iteration_query-ID": "query_id", "Iteration_query-def": "query_def", "Iteration_query-len": "query_len"}
+
+
+def iter_hits(source):
+    """
+    Yields the hits of a BLAST XML file (path or binary file object) one at
+    a time as Hit records, for every query of the file, without building the
+    document: each <Hit> is removed from the tree once converted, so memory
+    stays constant whatever the file size.
+    """
+    query = {"query_id": None, "query_def": None, "query_len": None}
+    stack, hit, hsp = [], None, None
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            stack.append(elem)
+            if tag == "Hsp":
+                hsp = HSP()
+            elif tag == "Hit":
+                hit = Hit(**query)
+            elif tag == "Iteration":
+                query = {"query_id": None, "query_def": None, "query_len": None}
+            continue
+        stack.pop()
+
+        # Leaf fields: convert the text into the open record
+        if hsp is not None and tag in HSP_FIELDS:
+            name, convert = HSP_FIELDS[tag]
+            setattr(hsp, name, convert(elem.text or ""))
+        elif hit is not None and tag in HIT_FIELDS:
+            name, convert = HIT_FIELDS[tag]
+            setattr(hit, name, convert(elem.text or ""))
+        elif tag in QUERY_FIELDS:
+            query[QUERY_FIELDS[tag]] = int(elem.text) if tag == "Iteration_query-len" else elem.text
+
+        # Closed records: detach the element from its parent so it can be freed
+        elif tag in ("Hsp", "Hit", "Iteration"):
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+            if tag == "Hsp":
+                hit.hsps.append(hsp)
+                hsp = None
+            elif tag == "Hit":
+                yield hit
+                hit = None
+
+
+def iter_hsps(source):
+    # Yields (hit, hsp) pairs, one per alignment, e.g. for tables with one row per HSP
+    for hit in iter_hits(source):
+        for hsp in hit.hsps:
+            yield hit, hsp
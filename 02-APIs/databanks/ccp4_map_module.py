@@ -0,0 +1,225 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import struct for the 1024-byte header and NumPy for the memory-mapped voxels
+import struct
+import numpy as np
+
+# CCP4/MRC header: 56 words of 4 bytes, then 10 labels of 80 characters
+# (https://www.ccpem.ac.uk/mrc_format/mrc2014.php)
+HEADER_SIZE = 1024
+HEADER_FIELDS = [
+    ("nc", "i"), ("nr", "i"), ("ns", "i"), ("mode", "i"),
+    ("ncstart", "i"), ("nrstart", "i"), ("nsstart", "i"),
+    ("nx", "i"), ("ny", "i"), ("nz", "i"),
+    ("cell_a", "f"), ("cell_b", "f"), ("cell_c", "f"),
+    ("alpha", "f"), ("beta", "f"), ("gamma", "f"),
+    ("mapc", "i"), ("mapr", "i"), ("maps", "i"),
+    ("amin", "f"), ("amax", "f"), ("amean", "f"),
+    ("ispg", "i"), ("nsymbt", "i"),
+    ("extra1", "8s"), ("exttyp", "4s"), ("nversion", "i"), ("extra2", "84s"),
+    ("origin_x", "f"), ("origin_y", "f"), ("origin_z", "f"),
+    ("map", "4s"), ("machst", "4s"), ("rms", "f"), ("nlabl", "i"),
+    ("labels", "800s"),
+]
+HEADER_FORMAT = "".join(code for _, code in HEADER_FIELDS)
+
+# Voxel types by MODE (3 and 4 are complex; 3 has no NumPy type: two int16 per voxel)
+MODES = {0: "i1", 1: "i2", 2: "f4", 3: "i2", 4: "c8", 6: "u2", 12: "f2"}
+
+
+def _byteorder(raw):
+    # MACHST 0x44 0x41 (or 0x44 0x44) is little-endian, 0x11 0x11 big-endian; otherwise guess from MODE
+    stamp = raw[212:214]
+    if stamp in (b"\x44\x41", b"\x44\x44"):
+        return "<"
+    if stamp == b"\x11\x11":
+        return ">"
+    return "<" if struct.unpack("<i", raw[12:16])[0] in MODES else ">"
+
+
+def read_header(path):
+    """
+    Parses the 1024-byte header of a CCP4/MRC map into a typed dict:
+    ints and floats as numbers, text fields decoded, 'labels' as a list of
+    the nlabl non-empty labels, plus 'byteorder', 'dtype' (NumPy, with byte
+    order) and 'data_offset' (first voxel byte, after the extended header).
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path}: too short for a CCP4/MRC map")
+    if raw[:2] == b"\x1f\x8b":
+        raise ValueError(f"{path}: gzip file, decompress it first (MapDownloader.fetch_map does it while downloading)")
+    byteorder = _byteorder(raw)
+    values = struct.unpack(byteorder + HEADER_FORMAT, raw)
+    header = {}
+    for (name, code), value in zip(HEADER_FIELDS, values):
+        header[name] = value.decode("latin-1").rstrip("\0 ") if code.endswith("s") else value
+    header["labels"] = [header["labels"][80 * i:80 * (i + 1)].rstrip()
+                        for i in range(min(max(header["nlabl"], 0), 10))]
+    if header["mode"] not in MODES:
+        raise ValueError(f"{path}: unsupported MODE {header['mode']}")
+    header["byteorder"] = byteorder
+    header["dtype"] = np.dtype(byteorder + MODES[header["mode"]])
+    header["data_offset"] = HEADER_SIZE + header["nsymbt"]
+    return header
+
+
+def write_map(path, xyz, voxel_size=1.0, axes=(1, 2, 3), labels=()):
+    """
+    Writes a float32 MRC2014 map from an array indexed [x, y, z], storing
+    its columns, rows and sections along axes (MAPC, MAPR, MAPS). The
+    statistics in the header are computed one section at a time.
+    """
+    xyz = np.asarray(xyz)
+    # File order: sections, rows, columns
+    data = xyz.transpose([a - 1 for a in axes][::-1])
+    ns, nr, nc = data.shape
+    size = dict(zip((1, 2, 3), xyz.shape))
+    amin, amax, total, squares = np.inf, -np.inf, 0.0, 0.0
+    for section in data:
+        section = section.astype(np.float64)
+        amin, amax = min(amin, section.min()), max(amax, section.max())
+        total += section.sum()
+        squares += np.square(section).sum()
+    mean = total / data.size
+    values = {
+        "nc": nc, "nr": nr, "ns": ns, "mode": 2, "ncstart": 0, "nrstart": 0, "nsstart": 0,
+        "nx": size[1], "ny": size[2], "nz": size[3],
+        "cell_a": size[1] * voxel_size, "cell_b": size[2] * voxel_size, "cell_c": size[3] * voxel_size,
+        "alpha": 90.0, "beta": 90.0, "gamma": 90.0, "mapc": axes[0], "mapr": axes[1], "maps": axes[2],
+        "amin": amin, "amax": amax, "amean": mean, "ispg": 1, "nsymbt": 0,
+        "extra1": b"", "exttyp": b"", "nversion": 20140, "extra2": b"",
+        "origin_x": 0.0, "origin_y": 0.0, "origin_z": 0.0, "map": b"MAP ", "machst": b"\x44\x41\x00\x00",
+        "rms": float(np.sqrt(max(0.0, squares / data.size - mean ** 2))), "nlabl": len(labels),
+        "labels": b"".join(label.encode("latin-1")[:80].ljust(80) for label in labels[:10]),
+    }
+    with open(path, 'wb') as f:
+        f.write(struct.pack("<" + HEADER_FORMAT, *(values[name] for name, _ in HEADER_FIELDS)))
+        for section in data:
+            f.write(np.ascontiguousarray(section, dtype="<f4").tobytes())
+    return path
+
+
+# Class for reading CCP4/MRC density maps lazily through a memory map
+class CCP4Map:
+    def __init__(self, path):
+        # Parse the header and map the voxels (nothing is read until it is used)
+        self.path = path
+        self.header = read_header(path)
+        h = self.header
+
+        # File order: sections (slowest), rows, columns (fastest); MODE 3 stores (re, im) int16 pairs
+        shape = (h["ns"], h["nr"], h["nc"]) + ((2,) if h["mode"] == 3 else ())
+        self.data = np.memmap(path, dtype=h["dtype"], mode='r', offset=h["data_offset"], shape=shape)
+
+        # Which axis (1 = x, 2 = y, 3 = z) the columns, rows and sections run along
+        self.axes = (h["mapc"], h["mapr"], h["maps"])
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        # Release the memory map
+        mm = getattr(self.data, "_mmap", None)
+        self.data = None
+        if mm is not None:
+            mm.close()
+
+
+    @property
+    def shape(self):
+        # Grid size along x, y, z
+        return tuple(self.xyz.shape[:3])
+
+
+    @property
+    def voxel_size(self):
+        # Ångström per voxel along x, y, z (cell length / sampling)
+        h = self.header
+        return (h["cell_a"] / h["nx"], h["cell_b"] / h["ny"], h["cell_c"] / h["nz"])
+
+
+    @property
+    def origin(self):
+        # Position (Å) of the first voxel: MRC origin if set, otherwise the CCP4 start indices
+        h = self.header
+        if any((h["origin_x"], h["origin_y"], h["origin_z"])):
+            return (h["origin_x"], h["origin_y"], h["origin_z"])
+        start = dict(zip(self.axes, (h["ncstart"], h["nrstart"], h["nsstart"])))
+        return tuple(start.get(axis, 0) * size for axis, size in zip((1, 2, 3), self.voxel_size))
+
+
+    @property
+    def xyz(self):
+        """
+        The voxels indexed [x, y, z] (like gemmi's grid.array): a transposed
+        view of the memory map, so indexing it still reads only what it needs.
+        """
+        # Position of x, y, z among the file axes (columns=2, rows=1, sections=0)
+        file_axis = {axis: 2 - i for i, axis in enumerate(self.axes)}
+        order = [file_axis[axis] for axis in (1, 2, 3)] + ([3] if self.data.ndim == 4 else [])
+        return self.data.transpose(order)
+
+
+    def section(self, index=None, axis="x"):
+        """
+        One 2D slice as an in-memory array, through the middle of the map by
+        default (xyz[shape[0] // 2] is the notebook's plot with axis='x').
+        Only the pages holding that slice are read.
+        """
+        dim = "xyz".index(axis)
+        key = [slice(None)] * 3
+        key[dim] = self.xyz.shape[dim] // 2 if index is None else index
+        return np.array(self.xyz[tuple(key)])
+
+
+    def subvolume(self, x=slice(None), y=slice(None), z=slice(None)):
+        # A box of the map as an in-memory array, e.g. subvolume(slice(40, 80), slice(40, 80), slice(40, 80))
+        return np.array(self.xyz[x, y, z])
+
+
+    def slabs(self, slab=16):
+        """
+        Yields (section_dim, sections, block) over the map, slab file sections
+        at a time: block is the xyz view of those sections and section_dim the
+        xyz axis they run along. Only one block is paged in at a time.
+        """
+        # Axis of the xyz view along which the file sections run
+        section_dim = self.axes[2] - 1
+        for start in range(0, self.data.shape[0], slab):
+            index = [slice(None)] * 3
+            index[section_dim] = slice(start, start + slab)
+            yield section_dim, index[section_dim], self.xyz[tuple(index)]
+
+
+    def projection(self, axis="z", func="max", slab=16):
+        """
+        Projection of the map along an axis ('max', 'min', 'sum' or 'mean'),
+        computed over slabs of file sections so that only slab sections are in
+        memory at a time, whatever the size of the map.
+        """
+        reduce = {"max": np.maximum, "min": np.minimum, "sum": np.add, "mean": np.add}[func]
+        dtype = np.float64 if func in ("sum", "mean") else None
+        dim = "xyz".index(axis)
+
+        result, parts, section_dim = None, [], None
+        for section_dim, _, block in self.slabs(slab):
+            part = reduce.reduce(block, axis=dim, dtype=dtype)
+            if dim == section_dim:
+                # Projecting across the sections: combine the slabs
+                result = part if result is None else reduce(result, part)
+            else:
+                # Projecting within the sections: each slab gives its own rows of the result
+                parts.append(part)
+        if parts:
+            result = np.concatenate(parts, axis=section_dim if section_dim < dim else section_dim - 1)
+        if func == "mean":
+            result = result / self.xyz.shape[dim]
+        return result
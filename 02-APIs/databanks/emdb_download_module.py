@@ -0,0 +1,228 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import modules for files, checksums, gzip decompression and the retry delays
+import os
+import time
+import zlib
+import random
+import hashlib
+
+# Import requests for the streamed HTTP transfers
+import requests
+
+# Chunk written to disk (and fed to the decompressor) at a time; larger chunks
+# do not go faster but multiply the transient buffers of requests/urllib3
+CHUNK_SIZE = 1 << 18
+
+
+class ChecksumError(ValueError):
+    # Raised when a downloaded file does not match the expected checksum or size
+    pass
+
+
+def parse_checksum(checksum):
+    # 'md5:9e10...' or 'sha256:ab12...' -> (hashlib object, expected hex digest); None -> (None, None)
+    if not checksum:
+        return None, None
+    algorithm, _, digest = checksum.partition(":")
+    if not digest:
+        raise ValueError(f"checksum must look like 'md5:<hex>' or 'sha256:<hex>': {checksum!r}")
+    return hashlib.new(algorithm.lower()), digest.lower()
+
+
+def file_checksum(path, algorithm="md5", chunk_size=CHUNK_SIZE):
+    # '<algorithm>:<hex digest>' of a local file, read in chunks
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return f"{algorithm}:{digest.hexdigest()}"
+
+
+# Class for gunzipping a stream chunk by chunk (multi-member .gz files included)
+class GzipStream:
+    def __init__(self, out):
+        # Decompressed bytes go to out (a binary file object)
+        self.out = out
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.size = 0
+
+
+    def write(self, chunk):
+        # Decompress one chunk of the .gz, at most CHUNK_SIZE output bytes at a time
+        while chunk:
+            data = self.decompressor.decompress(chunk, CHUNK_SIZE)
+            self.out.write(data)
+            self.size += len(data)
+            if self.decompressor.eof:
+                # A new gzip member may follow the end of the previous one
+                chunk = self.decompressor.unused_data
+                if chunk:
+                    self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                chunk = self.decompressor.unconsumed_tail
+
+
+    def close(self):
+        # The gzip trailer (CRC32 + size) is checked by zlib: a missing end means a truncated file
+        if not self.decompressor.eof:
+            raise ChecksumError("truncated gzip stream")
+        data = self.decompressor.flush()
+        self.out.write(data)
+        self.size += len(data)
+
+
+# Receivers of the downloaded chunks: update(chunk), reset() when the download restarts from 0
+class _HashSink:
+    def __init__(self, hasher):
+        self.hasher = hasher
+        self.name = hasher.name if hasher is not None else None
+        self.start = hasher.copy() if hasher is not None else None
+
+
+    def update(self, chunk):
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+
+
+    def reset(self):
+        if self.start is not None:
+            self.hasher = self.start.copy()
+
+
+    def feed_file(self, path, chunk_size):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                self.update(chunk)
+
+
+    def hexdigest(self):
+        return self.hasher.hexdigest() if self.hasher is not None else None
+
+
+class _GunzipSink(_HashSink):
+    def __init__(self, out):
+        self.out = out
+        self.stream = GzipStream(out)
+
+
+    def update(self, chunk):
+        self.stream.write(chunk)
+
+
+    def reset(self):
+        self.out.seek(0)
+        self.out.truncate()
+        self.stream = GzipStream(self.out)
+
+
+    def close(self):
+        self.stream.close()
+
+
+# Class for streaming (and resuming) large downloads such as EMDB maps
+class MapDownloader:
+    def __init__(self, session=None, chunk_size=CHUNK_SIZE, retries=5, backoff=0.5, timeout=60):
+        # Reuse the caller's pooled session if given
+        self.session = session if session is not None else requests.Session()
+        self.chunk_size = chunk_size
+
+        # A dropped connection is resumed where it stopped, up to retries times
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+
+    def _stream(self, url, part_path, sinks):
+        """
+        Appends the remote file to part_path from its current size (HTTP
+        Range request), also feeding every chunk to the sinks.
+        Returns the total size; reconnects and resumes when the transfer drops.
+        """
+        for attempt in range(self.retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    # Nothing left to fetch
+                    if response.status_code == 416 and offset:
+                        return offset
+                    response.raise_for_status()
+
+                    # The server ignored the range: start again from the first byte
+                    if offset and response.status_code != 206:
+                        offset = 0
+                        for sink in sinks:
+                            sink.reset()
+                    mode = 'ab' if offset else 'wb'
+                    expected = response.headers.get("Content-Length")
+                    expected = offset + int(expected) if expected is not None else None
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(self.chunk_size):
+                            f.write(chunk)
+                            for sink in sinks:
+                                sink.update(chunk)
+                    size = os.path.getsize(part_path)
+                    if expected is not None and size != expected:
+                        raise requests.ConnectionError(f"transfer stopped at {size} of {expected} bytes")
+                    return size
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+
+    def download(self, url, path, checksum=None):
+        """
+        Streams url to path in chunks (constant memory) through path + '.part',
+        resuming a previous partial download with a Range request.
+        checksum ('md5:<hex>' or 'sha256:<hex>') is verified before the file
+        is moved into place; a mismatch removes the partial file.
+        Returns path.
+        """
+        hasher, digest = parse_checksum(checksum)
+        sink = _HashSink(hasher)
+        part_path = path + ".part"
+        # Bytes already on disk count towards the checksum
+        if hasher is not None and os.path.exists(part_path):
+            sink.feed_file(part_path, self.chunk_size)
+        self._stream(url, part_path, [sink])
+        if digest is not None and sink.hexdigest() != digest:
+            os.remove(part_path)
+            raise ChecksumError(f"{url}: {sink.name} {sink.hexdigest()} != {digest}")
+        os.replace(part_path, path)
+        return path
+
+
+    def fetch_map(self, url, map_path, checksum=None, keep_gz=False):
+        """
+        Downloads a .map.gz and gunzips it on the fly into map_path while the
+        chunks arrive (no second pass over the file, nothing held in memory).
+        The compressed bytes are kept in map_path + '.gz.part' so that an
+        interrupted transfer resumes (the part already on disk is decompressed
+        again locally). checksum applies to the .gz file, as published.
+        With keep_gz, the .gz is kept as map_path + '.gz'. Returns map_path.
+        """
+        hasher, digest = parse_checksum(checksum)
+        part_path = map_path + ".gz.part"
+        map_part = map_path + ".part"
+        with open(map_part, 'wb') as out:
+            gunzip = _GunzipSink(out)
+            sinks = [_HashSink(hasher), gunzip]
+            # Replay what an earlier attempt already downloaded
+            if os.path.exists(part_path):
+                for sink in sinks:
+                    sink.feed_file(part_path, self.chunk_size)
+            self._stream(url, part_path, sinks)
+            gunzip.close()
+
+        if digest is not None and sinks[0].hexdigest() != digest:
+            os.remove(part_path)
+            os.remove(map_part)
+            raise ChecksumError(f"{url}: {sinks[0].name} {sinks[0].hexdigest()} != {digest}")
+        os.replace(map_part, map_path)
+        if keep_gz:
+            os.replace(part_path, map_path + ".gz")
+        else:
+            os.remove(part_path)
+        return map_path
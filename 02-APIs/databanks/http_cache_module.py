@@ -0,0 +1,293 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import modules for the cache database, keys, timing and thread safety
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import collections
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Import requests: cached answers are rebuilt as requests.Response objects
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Statuses kept in the cache (a 404 is a valid answer: "this entry does not exist")
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 404, 410}
+
+# What the cache holds for a request: the prepared request, its key, the cache entry (or None)
+# and the answer to return without going to the server (or None)
+CacheLookup = collections.namedtuple("CacheLookup", "request key entry answer")
+
+
+class OfflineError(requests.RequestException):
+    # Raised in offline mode when a request is not in the cache (not retried by the clients)
+    pass
+
+
+def canonical_url(url):
+    # Lower-case scheme and host, query parameters sorted, no fragment
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+
+def canonical_body(body):
+    """
+    The request body in a canonical form, so that equal requests share a key:
+    JSON re-serialised with sorted keys and no spaces, form data sorted.
+    """
+    if not body:
+        return b""
+    if isinstance(body, str):
+        body = body.encode()
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    try:
+        pairs = parse_qsl(body.decode("ascii"), keep_blank_values=True, strict_parsing=True)
+        return urlencode(sorted(pairs)).encode()
+    except (UnicodeDecodeError, ValueError):
+        return body
+
+
+def cache_key(method, url, body=None):
+    # SHA-256 of method + canonical URL + canonical body
+    digest = hashlib.sha256()
+    for part in (method.upper().encode(), canonical_url(url).encode(), canonical_body(body)):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# Class for storing HTTP answers on disk (one SQLite file), with expiry and LRU eviction
+class HTTPCache:
+    def __init__(self, path, ttl=24 * 3600, max_bytes=256 * 1024 * 1024, offline=False):
+        # Answers are fresh for ttl seconds after they were stored or revalidated,
+        # then revalidated (ETag / Last-Modified) or fetched again
+        self.path = path
+        self.ttl = ttl
+
+        # Least recently used answers are evicted beyond max_bytes of bodies
+        self.max_bytes = max_bytes
+
+        # Offline: answers come only from the cache (stale ones included), never from the network
+        self.offline = offline
+
+        # One connection shared by the client threads, serialised by a lock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, method TEXT, url TEXT, status INTEGER,"
+            " headers TEXT, body BLOB, etag TEXT, last_modified TEXT, stored REAL, accessed REAL, size INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # Counters reported at the end of a run (updated under the lock: the clients are threaded)
+        self.hits, self.misses, self.revalidated, self.stored, self.evicted = 0, 0, 0, 0, 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+    def get(self, key):
+        """
+        Returns the cached answer of a key as a dict (status, headers, body,
+        etag, last_modified, age in seconds, fresh), or None. Marks it as used.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+        url, status, headers, body, etag, last_modified, stored = row
+        return {"url": url, "status": status, "headers": json.loads(headers), "body": body, "etag": etag,
+                "last_modified": last_modified, "age": now - stored, "fresh": now - stored < self.ttl}
+
+
+    def put(self, key, method, url, status, headers, body):
+        # Store (or replace) an answer, then evict the least recently used ones beyond max_bytes
+        headers = dict(headers)
+        now = time.time()
+        body = body or b""
+        row = (key, method.upper(), url, status, json.dumps(headers), sqlite3.Binary(body),
+               headers.get("ETag") or headers.get("etag"), headers.get("Last-Modified") or headers.get("last-modified"),
+               now, now, len(body))
+        with self.lock:
+            old = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self.size += len(body) - (old[0] if old else 0)
+            self.stored += 1
+            self._evict()
+            self.connection.commit()
+
+
+    def touch(self, key):
+        # A revalidated answer (304) is fresh again for ttl seconds
+        now = time.time()
+        with self.lock:
+            self.connection.execute("UPDATE responses SET stored = ?, accessed = ? WHERE key = ?", (now, now, key))
+            self.connection.commit()
+
+
+    def _evict(self):
+        # Drop the least recently used answers until the bodies fit in max_bytes (lock held)
+        while self.size > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.size <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                self.evicted += 1
+
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.size = 0
+
+
+    def count(self, hits=0, misses=0, revalidated=0):
+        # Add to the counters of the requests answered, fetched and revalidated
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.revalidated += revalidated
+
+
+    def report(self):
+        # Return the counters as a dictionary
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "stored": self.stored, "evicted": self.evicted, "entries": len(self), "bytes": self.size}
+
+
+def _cached_response(entry, request):
+    # Rebuild a requests.Response from a cache entry
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = bytes(entry["body"])
+    response.url = entry["url"]
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.reason = "OK" if response.status_code < 400 else "Cached error"
+    response.request = request
+    response.from_cache = True
+    return response
+
+
+# Session that answers repeated requests from an HTTPCache (a drop-in for requests.Session)
+class CachedSession(requests.Session):
+    def __init__(self, cache, methods=("GET", "HEAD", "POST")):
+        super().__init__()
+        # The cache, and the methods whose answers are cached (POST: RCSB searches, BLAST queries)
+        self.cache = cache
+        self.methods = {method.upper() for method in methods}
+
+
+    def _prepare(self, method, url, kwargs):
+        # The request as it would be sent (params merged into the URL, json/data encoded) and its key
+        fields = {name: kwargs[name] for name in ("params", "data", "json", "headers", "files") if name in kwargs}
+        request = self.prepare_request(requests.Request(method.upper(), url, **fields))
+        return request, cache_key(request.method, request.url, request.body)
+
+
+    def _cacheable(self, method, kwargs):
+        # Streamed requests (file downloads) bypass the cache
+        return method.upper() in self.methods and not kwargs.get("stream")
+
+
+    def lookup(self, method, url, **kwargs):
+        """
+        Looks a request up in the cache without any network access. Returns
+        a CacheLookup whose answer is the cached response to use (a fresh
+        one, or any one in offline mode) or None when the request must go to
+        the server; None when the request bypasses the cache. Passing it to
+        request(..., lookup=...) saves reading the cache a second time.
+        Raises OfflineError in offline mode when nothing is cached.
+        """
+        if not self._cacheable(method, kwargs):
+            return None
+        request, key = self._prepare(method, url, kwargs)
+        entry = self.cache.get(key)
+        if entry is not None and (entry["fresh"] or self.cache.offline):
+            self.cache.count(hits=1)
+            return CacheLookup(request, key, entry, _cached_response(entry, request))
+        if self.cache.offline:
+            raise OfflineError(f"offline and not cached: {request.method} {request.url}")
+        return CacheLookup(request, key, entry, None)
+
+
+    def from_cache(self, method, url, **kwargs):
+        """
+        The cached answer of a request without any network access: a fresh
+        one, or any one in offline mode (OfflineError if there is none).
+        None when the request must go to the server.
+        """
+        lookup = self.lookup(method, url, **kwargs)
+        return lookup.answer if lookup is not None else None
+
+
+    def request(self, method, url, lookup=None, **kwargs):
+        """
+        Like requests.Session.request, with the cache in front: fresh answers
+        come from the cache, stale ones are revalidated with If-None-Match /
+        If-Modified-Since (a 304 refreshes them), new ones are stored.
+        lookup is the result of lookup() for this same request, if the
+        caller already has it.
+        """
+        if lookup is None:
+            lookup = self.lookup(method, url, **kwargs)
+            if lookup is None:
+                return super().request(method, url, **kwargs)
+        request, key, entry, cached = lookup
+        if cached is not None:
+            return cached
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = super().request(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.count(revalidated=1)
+            self.cache.touch(key)
+            return _cached_response(entry, request)
+        self.cache.count(misses=1)
+        if response.status_code in CACHEABLE_STATUSES and "no-store" not in response.headers.get("Cache-Control", ""):
+            self.cache.put(key, request.method, request.url, response.status_code, response.headers, response.content)
+        response.from_cache = False
+        return response
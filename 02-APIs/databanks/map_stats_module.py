@@ -0,0 +1,288 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import modules for the cache files and NumPy for the chunk-wise reductions
+import os
+import json
+import hashlib
+import numpy as np
+
+# Import the memory-mapped reader: the volume is only ever read one slab at a time
+from .ccp4_map_module import CCP4Map
+
+# Version of the summary layout, stored in the cache so old entries are recomputed
+SUMMARY_VERSION = 1
+
+
+def _block_mean(volume, factor):
+    # Mean over factor^3 blocks (a smaller last block where the size is not a multiple)
+    out = np.asarray(volume, dtype=np.float64)
+    for dim in range(3):
+        starts = np.arange(0, out.shape[dim], factor)
+        counts = np.diff(np.append(starts, out.shape[dim]))
+        shape = [1, 1, 1]
+        shape[dim] = len(counts)
+        out = np.add.reduceat(out, starts, axis=dim) / counts.reshape(shape)
+    return out
+
+
+def _index(dim, i):
+    # Basic-indexing key for plane i along dim (a view: np.take would copy the whole block)
+    key = [slice(None)] * 3
+    key[dim] = i
+    return tuple(key)
+
+
+def _preview_factor(shape, preview_size):
+    # Smallest power of two that brings the largest side down to preview_size voxels
+    factor = 1
+    while max(shape) > preview_size * factor:
+        factor *= 2
+    return factor
+
+
+def map_summary(source, bins=256, slab=16, preview_size=64, contour_sigma=3.0):
+    """
+    Summarises a CCP4/MRC map in one pass over its sections, slab by slab
+    (a map larger than the RAM is never loaded). Returns (stats, arrays):
+    stats is a JSON-ready dict (shape, voxel size, min/max/mean/RMS,
+    histogram, suggested contour level) and arrays holds the central slices
+    and maximum-intensity projections along x, y, z plus a pyramid of
+    block-averaged volumes (largest side <= preview_size, then halved).
+    source is a path or an open CCP4Map.
+    """
+    cmap = source if isinstance(source, CCP4Map) else CCP4Map(source)
+    try:
+        if cmap.header["mode"] in (3, 4):
+            raise ValueError(f"{cmap.path}: complex map (MODE {cmap.header['mode']}), no density statistics")
+        shape = cmap.shape
+        factor = _preview_factor(shape, preview_size)
+        # Slabs hold whole preview blocks, so each block is averaged within one slab
+        slab = -(-max(slab, factor) // factor) * factor
+        center = [n // 2 for n in shape]
+
+        # The header range is tried for the histogram; a second pass is needed only if it is wrong
+        h = cmap.header
+        lo, hi = float(h["amin"]), float(h["amax"])
+        valid_range = np.isfinite(lo) and np.isfinite(hi) and lo < hi
+        counts = np.zeros(bins, dtype=np.int64)
+
+        amin, amax, total, squares = np.inf, -np.inf, 0.0, 0.0
+        slices, mips, lowres = [[] for _ in range(3)], [[] for _ in range(3)], []
+        section_dim = cmap.axes[2] - 1
+        for section_dim, sections, block in cmap.slabs(slab):
+            # Scalar statistics on the slab as stored in the file (contiguous)
+            values = np.asarray(cmap.data[sections], dtype=np.float64)
+            amin, amax = min(amin, values.min()), max(amax, values.max())
+            total += values.sum()
+            squares += np.dot(values.ravel(), values.ravel())
+            if valid_range:
+                counts += np.histogram(values, bins, range=(lo, hi))[0]
+            del values
+
+            for dim in range(3):
+                if dim == section_dim:
+                    # Across the sections: the slab holding the central section, running maximum
+                    local = center[dim] - sections.start
+                    if 0 <= local < block.shape[dim]:
+                        slices[dim].append(np.array(block[_index(dim, local)]))
+                    part = block.max(axis=dim)
+                    mips[dim] = [part if not mips[dim] else np.maximum(mips[dim][0], part)]
+                else:
+                    # Within the sections: each slab gives its own rows of the result
+                    slices[dim].append(np.array(block[_index(dim, center[dim])]))
+                    mips[dim].append(block.max(axis=dim))
+            lowres.append(_block_mean(block, factor))
+
+        # Join the per-slab parts along the section axis (one axis less once dim is removed)
+        arrays = {}
+        for dim, name in enumerate("xyz"):
+            join = section_dim if section_dim < dim else section_dim - 1
+            arrays["slice_" + name] = (slices[dim][0] if dim == section_dim
+                                       else np.concatenate(slices[dim], axis=join)).astype(np.float32)
+            arrays["mip_" + name] = (mips[dim][0] if dim == section_dim
+                                     else np.concatenate(mips[dim], axis=join)).astype(np.float32)
+        level = np.concatenate(lowres, axis=section_dim)
+        factors = [factor]
+        arrays["level_0"] = level.astype(np.float32)
+        while max(level.shape) > 8:
+            level = _block_mean(level, 2)
+            factors.append(factors[-1] * 2)
+            arrays[f"level_{len(factors) - 1}"] = level.astype(np.float32)
+
+        # Second pass only when the header range was missing or did not cover the data
+        if not (valid_range and lo <= amin and amax <= hi):
+            lo, hi = float(amin), (float(amax) if amax > amin else float(amin) + 1.0)
+            counts[:] = 0
+            for _, sections, _ in cmap.slabs(slab):
+                counts += np.histogram(cmap.data[sections], bins, range=(lo, hi))[0]
+
+        size = np.prod(shape, dtype=np.float64)
+        mean = total / size
+        rms = float(np.sqrt(max(0.0, squares / size - mean ** 2)))
+        contour = min(mean + contour_sigma * rms, float(amax))
+        edges = np.linspace(lo, hi, bins + 1)
+        above = counts[edges[:-1] >= contour].sum()
+
+        stats = {
+            "path": os.path.abspath(cmap.path),
+            "shape": list(shape),
+            "voxel_size": [float(v) for v in cmap.voxel_size],
+            "origin": [float(v) for v in cmap.origin],
+            "mode": h["mode"],
+            "labels": h["labels"],
+            "min": float(amin),
+            "max": float(amax),
+            "mean": float(mean),
+            "rms": rms,
+            "contour": float(contour),
+            "contour_sigma": contour_sigma,
+            "contour_fraction": float(above / size),
+            "histogram": {"range": [lo, hi], "counts": counts.tolist()},
+            "levels": [{"factor": f, "shape": list(arrays[f"level_{i}"].shape)} for i, f in enumerate(factors)],
+        }
+        return stats, arrays
+    finally:
+        if cmap is not source:
+            cmap.close()
+
+
+def render_preview(stats, arrays, png_path, cmap="viridis", dpi=80):
+    """
+    Draws the three central slices (top row) and the three maximum-intensity
+    projections (bottom row) into one PNG, with the histogram contour level
+    in the title. Returns png_path.
+    """
+    # Headless figure on its own Agg canvas: no pyplot, the caller's backend is left alone
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(9, 6))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(2, 3)
+    plane = {"x": ("Y", "Z"), "y": ("X", "Z"), "z": ("X", "Y")}
+    for row, kind in enumerate(("slice", "mip")):
+        for col, axis in enumerate("xyz"):
+            ax = axes[row][col]
+            # Arrays are [first, second]: transpose so the first axis runs horizontally
+            ax.imshow(arrays[f"{kind}_{axis}"].T, origin="lower", cmap=cmap)
+            ax.set_title(f"{'central slice' if kind == 'slice' else 'max projection'} {axis}", fontsize=9)
+            ax.set_xlabel(plane[axis][0], fontsize=8)
+            ax.set_ylabel(plane[axis][1], fontsize=8)
+            ax.tick_params(labelsize=7)
+    fig.suptitle(f"{os.path.basename(stats['path'])}  {'x'.join(map(str, stats['shape']))}  "
+                 f"mean {stats['mean']:.3g}  rms {stats['rms']:.3g}  contour {stats['contour']:.3g}", fontsize=10)
+    fig.tight_layout()
+    fig.savefig(png_path, dpi=dpi)
+    return png_path
+
+
+# Class for keeping the summaries and previews of a map collection on disk
+class MapSummaryCache:
+    def __init__(self, folder, bins=256, slab=16, preview_size=64, contour_sigma=3.0):
+        # One .json (statistics), .npz (slices, projections, pyramid) and .png per map
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+        # Options of the summaries: entries computed with other options are stale
+        self.options = {"bins": bins, "slab": slab, "preview_size": preview_size, "contour_sigma": contour_sigma}
+
+        # Counters reported at the end of a run
+        self.hits, self.misses = 0, 0
+
+
+    def _base(self, path):
+        # Cache file prefix: map name + hash of its absolute path (two maps may share a name)
+        path = os.path.abspath(path)
+        key = hashlib.blake2b(path.encode(), digest_size=8).hexdigest()
+        name = os.path.basename(path)
+        return os.path.join(self.folder, f"{name}-{key}")
+
+
+    def _load_entry(self, path):
+        try:
+            with open(self._base(path) + ".json", 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+
+    def is_fresh(self, path):
+        """
+        Checks whether the cached summary of a map matches the file (size and
+        mtime), the summary options and layout, and its .npz and .png exist.
+        """
+        entry = self._load_entry(path)
+        if entry is None or entry.get("version") != SUMMARY_VERSION or entry.get("options") != self.options:
+            return False
+        stat = os.stat(path)
+        base = self._base(path)
+        return (stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+                and os.path.exists(base + ".npz") and os.path.exists(base + ".png"))
+
+
+    def update(self, path):
+        # Summarise the map, then write the arrays, the preview and the statistics (last: it marks the entry valid)
+        stat = os.stat(path)
+        stats, arrays = map_summary(path, **self.options)
+        base = self._base(path)
+        np.savez_compressed(base + ".tmp.npz", **arrays)
+        os.replace(base + ".tmp.npz", base + ".npz")
+        render_preview(stats, arrays, base + ".tmp.png")
+        os.replace(base + ".tmp.png", base + ".png")
+        entry = {"version": SUMMARY_VERSION, "options": self.options,
+                 "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "stats": stats}
+        with open(base + ".tmp.json", 'w') as f:
+            json.dump(entry, f)
+        os.replace(base + ".tmp.json", base + ".json")
+        return stats
+
+
+    def stats(self, path):
+        # Statistics of a map, computed (with arrays and preview) only when the cache is stale
+        if self.is_fresh(path):
+            self.hits += 1
+            return self._load_entry(path)["stats"]
+        self.misses += 1
+        return self.update(path)
+
+
+    def arrays(self, path):
+        # Slices, projections and pyramid levels of a map (np.load of the cached .npz)
+        self.stats(path)
+        with np.load(self._base(path) + ".npz") as npz:
+            return {name: npz[name] for name in npz.files}
+
+
+    def preview(self, path):
+        # Path of the PNG preview of a map
+        self.stats(path)
+        return self._base(path) + ".png"
+
+
+    def browse(self):
+        # Statistics of every cached map (only the small .json files are read)
+        entries = []
+        for name in sorted(os.listdir(self.folder)):
+            if name.endswith(".json") and not name.endswith(".tmp.json"):
+                with open(os.path.join(self.folder, name), 'r') as f:
+                    entry = json.load(f)
+                entries.append(dict(entry["stats"], preview=os.path.join(self.folder, name[:-5] + ".png")))
+        return entries
+
+
+    def prune(self):
+        # Remove the cache files of maps that no longer exist
+        removed = []
+        for entry in self.browse():
+            if not os.path.exists(entry["path"]):
+                base = self._base(entry["path"])
+                for ext in (".json", ".npz", ".png"):
+                    if os.path.exists(base + ext):
+                        os.remove(base + ext)
+                removed.append(entry["path"])
+        return removed
+
+
+    def report(self):
+        # Return the counters as a dictionary
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,338 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import modules for paths, batching and the GraphQL backoff
+import os
+import time
+import itertools
+import collections
+
+# Import requests for its exceptions
+import requests
+
+# Import the pooled REST client, the streaming map downloader
+from .rest_client_module import RESTClient
+from .emdb_download_module import MapDownloader
+
+# Public endpoints used in the notebook (overridable, e.g. to point at a mock server)
+SEARCH_URL = "https://search.rcsb.org/rcsbsearch/v2/query"
+DATA_URL = "https://data.rcsb.org/rest/v1/core"
+GRAPHQL_URL = "https://data.rcsb.org/graphql"
+FILES_URL = "https://files.rcsb.org/pub/emdb/structures"
+EMDB_URL = "https://www.ebi.ac.uk/emdb/api/entry"
+
+# Fields of an entry and of a polymer entity that fetch_entries returns (nested dicts: None
+# for a leaf). The GraphQL query asks for exactly these, and the REST fallback documents are
+# cut down to them, so a record has the same fields whichever path fetched it.
+ENTRY_FIELDS = {
+    "rcsb_id": None,
+    "struct": {"title": None},
+    "exptl": {"method": None},
+    "rcsb_external_references": {"id": None, "type": None, "link": None},
+}
+ENTITY_FIELDS = {
+    "rcsb_id": None,
+    "rcsb_polymer_entity_container_identifiers": {"entity_id": None},
+    "entity_poly": {"type": None, "pdbx_seq_one_letter_code": None, "pdbx_seq_one_letter_code_can": None},
+}
+
+
+def _selection(fields):
+    # GraphQL selection set of a field tree: {"struct": {"title": None}} -> 'struct { title }'
+    return " ".join(name if sub is None else f"{name} {{ {_selection(sub)} }}" for name, sub in fields.items())
+
+
+# Data API GraphQL query: the entry and polymer entity fields the notebook reads, for many ids at once
+ENTRIES_QUERY = f"""
+query ($ids: [String!]!) {{
+  entries(entry_ids: $ids) {{
+    {_selection(ENTRY_FIELDS)}
+    polymer_entities {{ {_selection(ENTITY_FIELDS)} }}
+  }}
+}}
+"""
+
+# Longest pause of GraphQL after repeated failures (seconds)
+GRAPHQL_MAX_BACKOFF = 600.0
+
+
+def select_fields(document, fields):
+    """
+    Cuts a document (dict, or list of dicts) down to a field tree such as
+    ENTRY_FIELDS, as a GraphQL query would: every field of the tree is
+    present (None when the document lacks it), no other field is.
+    """
+    if document is None:
+        return None
+    if isinstance(document, list):
+        return [select_fields(item, fields) for item in document]
+    if not isinstance(document, dict):
+        return document
+    return {name: document.get(name) if sub is None else select_fields(document.get(name), sub)
+            for name, sub in fields.items()}
+
+
+def text_query(text, method="ELECTRON MICROSCOPY", return_type="entry"):
+    """
+    The search of the notebook as a dict: full-text match of text among the
+    entries solved with an experimental method (exptl.method).
+    """
+    nodes = [{"type": "terminal", "service": "full_text", "parameters": {"value": text}}]
+    if method:
+        nodes.append({"type": "terminal", "service": "text",
+                      "parameters": {"attribute": "exptl.method", "operator": "exact_match", "value": method}})
+    return {"query": {"type": "group", "logical_operator": "and", "nodes": nodes},
+            "request_options": {"paginate": {"start": 0, "rows": 10}},
+            "return_type": return_type}
+
+
+# Class for harvesting RCSB search results, entries, polymer entities and EMDB references
+class RCSBClient(RESTClient):
+    def __init__(self, search_url=SEARCH_URL, data_url=DATA_URL, files_url=FILES_URL, emdb_url=EMDB_URL,
+                 max_workers=8, rate=10.0, retries=4, backoff=0.5, timeout=30, session=None, cache=None,
+                 graphql_url=GRAPHQL_URL, host_limits=None, graphql_backoff=30.0):
+        # Pooled session, bounded concurrency, rate limit, retries and metrics (see RESTClient)
+        super().__init__(max_workers=max_workers, host_limits=host_limits, rate=rate, retries=retries,
+                         backoff=backoff, timeout=timeout, session=session, cache=cache)
+
+        # Store the endpoints
+        self.search_url = search_url
+        self.data_url = data_url.rstrip("/")
+        self.graphql_url = graphql_url
+        self.files_url = files_url.rstrip("/")
+        self.emdb_url = emdb_url.rstrip("/")
+
+        # After a GraphQL failure, batches go to REST until graphql_retry_at; the pause
+        # starts at graphql_backoff seconds and doubles while GraphQL keeps failing
+        self.graphql_backoff = graphql_backoff
+        self.graphql_failures = 0
+        self.graphql_retry_at = 0.0
+
+
+    @property
+    def graphql_available(self):
+        # True when the next batch goes to GraphQL (an endpoint is set, and no failure pause is running)
+        return self.graphql_url is not None and time.monotonic() >= self.graphql_retry_at
+
+
+    def search(self, query, start=0, rows=100):
+        """
+        Runs one page of a search query (dict as in the notebook) and returns
+        the JSON answer (total_count, result_set). An empty search gives
+        {'total_count': 0, 'result_set': []} (the API answers 204).
+        """
+        query = dict(query)
+        options = dict(query.get("request_options", {}))
+        options["paginate"] = {"start": start, "rows": rows}
+        query["request_options"] = options
+        # A search only reads: safe to resend after a connection error
+        response = self.request("POST", self.search_url, json=query, retry_unsafe=True)
+        if response.status_code == 204 or not response.content:
+            return {"total_count": 0, "result_set": []}
+        return response.json()
+
+
+    def iter_search(self, query, rows=100, limit=None):
+        """
+        Yields every result_set item of a search ({'identifier', 'score'}),
+        in rank order. The first page gives total_count; the other pages are
+        then fetched concurrently. limit caps the number of results.
+        """
+        first = self.search(query, 0, rows)
+        total = first.get("total_count", 0)
+        if limit is not None:
+            total = min(total, limit)
+        # map keeps the page order while the pages download in parallel
+        pages = self.executor.map(lambda start: self.search(query, start, rows), range(rows, total, rows))
+        items = (item for page in itertools.chain([first], pages) for item in page.get("result_set", []))
+        yield from itertools.islice(items, total)
+
+
+    def search_ids(self, query, rows=100, limit=None):
+        # All matching identifiers, in rank order
+        return [item["identifier"] for item in self.iter_search(query, rows=rows, limit=limit)]
+
+
+    def entry(self, identifier):
+        # Entry document (core/entry/{id}); None if it does not exist
+        return self.get_json(f"{self.data_url}/entry/{identifier}", missing_ok=True)
+
+
+    def polymer_entity(self, identifier, entity_id=1):
+        # Polymer entity document (core/polymer_entity/{id}/{entity}); None if it does not exist
+        return self.get_json(f"{self.data_url}/polymer_entity/{identifier}/{entity_id}", missing_ok=True)
+
+
+    def emdb_entry(self, emd_id):
+        # EMDB metadata of a map (EBI EMDB API), e.g. emdb_entry("EMD-32377")
+        return self.get_json(f"{self.emdb_url}/{emd_id}", missing_ok=True)
+
+
+    def entries(self, identifiers):
+        # (identifier, entry document) for many identifiers, fetched concurrently
+        return self.map_many(self.entry, identifiers)
+
+
+    def polymer_entities(self, identifiers, entity_id=1):
+        # (identifier, polymer entity document) for many identifiers, fetched concurrently
+        return self.map_many(lambda identifier: self.polymer_entity(identifier, entity_id), identifiers)
+
+
+    @staticmethod
+    def emdb_ids(entry):
+        # EMDB map identifiers ('EMD-32377') referenced by an entry document
+        if not entry:
+            return []
+        return [ref["id"] for ref in entry.get("rcsb_external_references", [])
+                if ref.get("type", "EMDB") == "EMDB" and str(ref.get("id", "")).startswith("EMD-")]
+
+
+    def emdb_map_url(self, emd_id):
+        # files.rcsb.org path of a map: EMD-32377 -> .../EMD-32377/map/emd_32377.map.gz
+        return f"{self.files_url}/{emd_id}/map/emd_{emd_id.split('-')[1]}.map.gz"
+
+
+    def download_map(self, emd_id, folder=".", checksum=None, keep_gz=False):
+        """
+        Streams the map of an EMDB entry into folder/emd_<number>.map,
+        decompressing while it downloads and resuming interrupted transfers
+        (see MapDownloader.fetch_map). Returns the .map path.
+        """
+        os.makedirs(folder, exist_ok=True)
+        map_path = os.path.join(folder, f"emd_{emd_id.split('-')[1]}.map")
+        downloader = MapDownloader(session=self.session, retries=self.retries, backoff=self.backoff)
+        return downloader.fetch_map(self.emdb_map_url(emd_id), map_path, checksum=checksum, keep_gz=keep_gz)
+
+
+    def graphql(self, query, variables=None):
+        """
+        Runs a Data API GraphQL query and returns its 'data'. Raises
+        ValueError when the answer carries errors and no data.
+        """
+        # A query only reads (no mutation): safe to resend after a connection error
+        answer = self.request("POST", self.graphql_url, json={"query": query, "variables": variables or {}},
+                              retry_unsafe=True).json()
+        if answer.get("errors") and not answer.get("data"):
+            raise ValueError(f"GraphQL errors: {answer['errors']}")
+        return answer.get("data") or {}
+
+
+    @staticmethod
+    def _split_entry(document, entity_id):
+        # GraphQL entry -> (entry document as from REST, polymer entity document entity_id)
+        entry = dict(document)
+        entity = None
+        for candidate in entry.pop("polymer_entities", None) or []:
+            identifiers = candidate.get("rcsb_polymer_entity_container_identifiers") or {}
+            if str(identifiers.get("entity_id")) == str(entity_id):
+                entity = candidate
+        return entry, entity
+
+
+    def _fetch_batch(self, identifiers, entity_id):
+        # One GraphQL request for a batch: identifier -> (entry, entity); None if the request failed
+        try:
+            data = self.graphql(ENTRIES_QUERY, {"ids": identifiers})
+        except (requests.RequestException, ValueError):
+            with self.lock:
+                # Batches already in flight when GraphQL went down count as one failure
+                if time.monotonic() >= self.graphql_retry_at:
+                    self.graphql_failures += 1
+                    delay = self.graphql_backoff * 2 ** (self.graphql_failures - 1)
+                    self.graphql_retry_at = time.monotonic() + min(delay, GRAPHQL_MAX_BACKOFF)
+            return None
+        with self.lock:
+            self.graphql_failures = 0
+        documents = {}
+        for document in data.get("entries") or []:
+            if document:
+                entry, entity = self._split_entry(document, entity_id)
+                documents[document["rcsb_id"].upper()] = (select_fields(entry, ENTRY_FIELDS),
+                                                          select_fields(entity, ENTITY_FIELDS))
+        return documents
+
+
+    def _fetch_single(self, identifier, entity_id):
+        # Fallback: the notebook's two REST requests, cut down to the fields of a GraphQL answer
+        return (select_fields(self.entry(identifier), ENTRY_FIELDS),
+                select_fields(self.polymer_entity(identifier, entity_id), ENTITY_FIELDS))
+
+
+    def _batch_results(self, batch, future, entity_id):
+        # (identifier, entry, entity) of a batch, from its GraphQL answer or from single requests
+        documents = future.result() if future is not None else None
+        if documents is None:
+            # Fallback in the caller's thread, so the workers are free for the single requests
+            for identifier, (entry, entity) in self.map_many(lambda i: self._fetch_single(i, entity_id), batch):
+                yield identifier, entry, entity
+            return
+        for identifier in batch:
+            entry, entity = documents.get(identifier.upper(), (None, None))
+            yield identifier, entry, entity
+
+
+    def fetch_entries(self, identifiers, entity_id=1, batch_size=100):
+        """
+        Yields (identifier, entry, polymer entity) for every identifier, in
+        input order, fetching batch_size entries per GraphQL request instead
+        of two REST requests per entry. Up to max_workers batches are in
+        flight while earlier ones are consumed, and identifiers may be a
+        generator (e.g. of a running search), so results stream out as their
+        batch arrives. A batch whose GraphQL request fails falls back to
+        concurrent single REST requests, and so do the batches of the next
+        graphql_backoff seconds (doubling while GraphQL keeps failing).
+        Either way the entry and entity hold exactly the ENTRY_FIELDS and
+        ENTITY_FIELDS fields (see select_fields), never the full REST
+        documents. Missing entries give (identifier, None, None).
+        """
+        identifiers = iter(identifiers)
+        pending = collections.deque()
+        while True:
+            batch = list(itertools.islice(identifiers, batch_size))
+            if batch:
+                future = (self.executor.submit(self._fetch_batch, batch, entity_id)
+                          if self.graphql_available else None)
+                pending.append((batch, future))
+            # Hand out the oldest batch once the window is full or the input is exhausted
+            if pending and (not batch or len(pending) >= self.max_workers):
+                yield from self._batch_results(*pending.popleft(), entity_id)
+            if not batch and not pending:
+                return
+
+
+    def _record(self, identifier, score, entry, entity):
+        emdb_ids = self.emdb_ids(entry)
+        return {"identifier": identifier, "score": score, "entry": entry, "polymer_entity": entity,
+                "emdb_ids": emdb_ids, "map_urls": [self.emdb_map_url(emd) for emd in emdb_ids]}
+
+
+    def harvest(self, query, rows=100, limit=None, entity_id=1, batch_size=None):
+        """
+        Runs a search and yields, for every result, a record with the
+        identifier, search score, entry and polymer entity documents, the
+        EMDB ids and their map URLs. The entry and entity requests of all the
+        results run concurrently (bounded by max_workers and the rate limit);
+        with batch_size, they are fetched batch_size entries per GraphQL
+        request and hold only the ENTRY_FIELDS and ENTITY_FIELDS fields
+        (see fetch_entries), instead of the full REST documents.
+        """
+        items = self.iter_search(query, rows=rows, limit=limit)
+        if batch_size:
+            scores = {}
+
+            def identifiers():
+                # Remember the scores while the identifiers stream into the batches
+                for item in items:
+                    scores[item["identifier"]] = item.get("score")
+                    yield item["identifier"]
+
+            for identifier, entry, entity in self.fetch_entries(identifiers(), entity_id, batch_size):
+                yield self._record(identifier, scores.pop(identifier, None), entry, entity)
+            return
+
+        def fetch(item):
+            identifier = item["identifier"]
+            return self._record(identifier, item.get("score"), self.entry(identifier),
+                                self.polymer_entity(identifier, entity_id))
+
+        for _, record in self.map_many(fetch, items):
+            yield record
@@ -0,0 +1,366 @@
+# Based on simple_requests.ipynb and RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Import modules for gzip bodies, timing, randomised backoff, locking and the worker threads
+import re
+import gzip
+import json
+import time
+import random
+import threading
+import collections
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+# Import requests and its connection-pool adapter
+import requests
+from requests.adapters import HTTPAdapter
+
+# Import the on-disk HTTP cache session
+from .http_cache_module import CachedSession
+
+# Statuses worth retrying: rate limited or temporarily unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Methods sent again after a connection error or timeout: the first attempt may have reached
+# the server, and these only read (others are resent only when the caller allows it)
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# API version parts of a path (kept in the endpoint names)
+VERSION = re.compile(r"v\d+(\.\d+)*")
+
+# Headers of the notebook's small client (Accept-Encoding: compressed answers, decoded by requests)
+DEFAULT_HEADERS = {
+    "User-Agent": "advance-python-small-client/1.0",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+
+def endpoint_name(method, url):
+    # Metrics key of a request: method, host and path, with id-like path parts (digits, not v1/v2) as {id}
+    parts = urlsplit(url)
+    path = "/".join("{id}" if any(c.isdigit() for c in part) and not VERSION.fullmatch(part) else part
+                    for part in parts.path.split("/"))
+    return f"{method.upper()} {parts.netloc.lower()}{path}"
+
+
+# Class for spacing requests out to a maximum rate (token bucket, shared by all threads)
+class RateLimiter:
+    def __init__(self, rate=10.0, burst=None):
+        # rate requests per second on average, up to burst requests at once
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        # Block until a request may be sent (no limit when rate is None or 0)
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so the other threads can refill their view too
+            time.sleep(wait)
+
+
+# Class for the latency and throughput of one endpoint
+class EndpointStats:
+    def __init__(self, keep=10000):
+        # Calls, failed calls, extra attempts, answers from the cache
+        self.count, self.errors, self.retries, self.cached = 0, 0, 0, 0
+
+        # Decoded body bytes, and bytes on the wire (smaller when the answer was compressed)
+        self.bytes, self.wire_bytes = 0, 0
+
+        # Latencies of the last keep calls (retries included), and the active time window
+        self.seconds = 0.0
+        self.latencies = collections.deque(maxlen=keep)
+        self.first, self.last = None, None
+
+
+    def add(self, start, end, response=None, retries=0, error=False):
+        self.count += 1
+        self.retries += retries
+        self.errors += error
+        self.seconds += end - start
+        self.latencies.append(end - start)
+        self.first = start if self.first is None else min(self.first, start)
+        self.last = end if self.last is None else max(self.last, end)
+        if response is not None:
+            size = len(response.content)
+            self.bytes += size
+            if getattr(response, "from_cache", False):
+                self.cached += 1
+            elif response.headers.get("Content-Encoding") and response.headers.get("Content-Length", "").isdigit():
+                self.wire_bytes += int(response.headers["Content-Length"])
+            else:
+                self.wire_bytes += size
+
+
+    def as_dict(self):
+        # Counters, latency percentiles (ms) and throughput (calls per second while active)
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return latencies[int(q * (len(latencies) - 1))] * 1e3 if latencies else 0.0
+
+        window = (self.last - self.first) if self.count else 0.0
+        return {"count": self.count, "errors": self.errors, "retries": self.retries, "cached": self.cached,
+                "mean_ms": self.seconds / self.count * 1e3 if self.count else 0.0,
+                "p50_ms": percentile(0.5), "p95_ms": percentile(0.95), "max_ms": percentile(1.0),
+                "per_second": self.count / window if window > 0 else 0.0,
+                "bytes": self.bytes, "wire_bytes": self.wire_bytes}
+
+
+# Class for a reusable REST client: the notebook's GET/POST/PUT/DELETE on one pooled session
+class RESTClient:
+    def __init__(self, base_url=None, headers=None, max_workers=8, per_host=None, host_limits=None,
+                 rate=None, retries=4, backoff=0.5, timeout=30, session=None, cache=None, compress_min=None):
+        # Relative URLs are joined to base_url (e.g. "posts/1")
+        self.base_url = base_url.rstrip("/") + "/" if base_url else None
+
+        # Bounded concurrency: at most max_workers requests in flight, at most per_host
+        # (or host_limits[host], e.g. {"data.rcsb.org": 4}) to the same host
+        self.max_workers = max_workers
+        self.per_host = per_host or max_workers
+        self.host_limits = {host.lower(): limit for host, limit in (host_limits or {}).items()}
+        self.host_slots = {}
+
+        # Retry policy: retries attempts after the first, waiting backoff * 2**attempt (+ jitter)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+
+        # Request bodies of at least compress_min bytes are sent gzip-compressed (None: never)
+        self.compress_min = compress_min
+
+        # One pooled session: TCP/TLS connections are kept alive and reused by all threads;
+        # with an HTTPCache, repeated requests are answered from disk
+        if session is None:
+            session = CachedSession(cache) if cache is not None else requests.Session()
+        self.session = session
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        for host, limit in self.host_limits.items():
+            # Blocking pool: never more than limit connections open to this host
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limit, pool_block=True)
+            self.session.mount(f"https://{host}", adapter)
+            self.session.mount(f"http://{host}", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rest")
+
+        # Metrics: endpoint -> EndpointStats
+        self.stats = {}
+        self.lock = threading.Lock()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        # Stop the worker threads and close the pooled connections
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+    def url(self, path):
+        # Absolute URLs as they are, others relative to base_url
+        if self.base_url and not urlsplit(path).scheme:
+            return urljoin(self.base_url, path.lstrip("/"))
+        return path
+
+
+    def _host_slot(self, url):
+        # Semaphore bounding the requests in flight to the host of url
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.per_host))
+            return self.host_slots[host]
+
+
+    def _compress(self, kwargs):
+        # JSON or bytes body of at least compress_min bytes -> gzip data + Content-Encoding header
+        if self.compress_min is None:
+            return kwargs
+        body = kwargs.get("data")
+        if "json" in kwargs and kwargs["json"] is not None:
+            body = json.dumps(kwargs["json"]).encode()
+        if isinstance(body, str):
+            body = body.encode()
+        if not isinstance(body, bytes) or len(body) < self.compress_min:
+            return kwargs
+        kwargs = dict(kwargs)
+        headers = dict(kwargs.get("headers") or {})
+        if "json" in kwargs:
+            headers.setdefault("Content-Type", "application/json")
+        headers["Content-Encoding"] = "gzip"
+        kwargs.pop("json", None)
+        kwargs["data"] = gzip.compress(body, mtime=0)  # fixed mtime: same body, same bytes (and cache key)
+        kwargs["headers"] = headers
+        return kwargs
+
+
+    def _measure(self, endpoint, start, response=None, retries=0, error=False):
+        with self.lock:
+            stats = self.stats.setdefault(endpoint, EndpointStats())
+            stats.add(start, time.perf_counter(), response, retries, error)
+
+
+    def request(self, method, url, endpoint=None, retry_unsafe=False, **kwargs):
+        """
+        Sends one request through the rate limiter and the host's slot,
+        retrying 429/5xx answers with exponential backoff and jitter
+        (Retry-After is honoured). Connection errors and timeouts are
+        retried for GET, HEAD and OPTIONS only: a POST, PUT or DELETE may
+        have reached the server, so it is sent again only with
+        retry_unsafe=True (e.g. a search sent as POST). Returns the response;
+        raises requests.HTTPError for other error statuses. Latency, retries
+        and bytes are recorded under endpoint (by default method + host +
+        path, id-like parts as {id}).
+        """
+        url = self.url(url)
+        endpoint = endpoint or endpoint_name(method, url)
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs = self._compress(kwargs)
+        start = time.perf_counter()
+        # Cached answers skip the rate limiter and the network; a miss is handed to the
+        # session so it does not look the request up again
+        send = kwargs
+        if isinstance(self.session, CachedSession):
+            lookup = self.session.lookup(method, url, **kwargs)
+            if lookup is not None and lookup.answer is not None:
+                response = lookup.answer
+                self._measure(endpoint, start, response, error=not response.ok)
+                response.raise_for_status()
+                return response
+            if lookup is not None:
+                send = dict(kwargs, lookup=lookup)
+        retry_errors = retry_unsafe or method.upper() in SAFE_METHODS
+        slot = self._host_slot(url)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                with slot:
+                    response = self.session.request(method, url, **send)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries or not retry_errors:
+                    self._measure(endpoint, start, retries=attempt, error=True)
+                    raise
+                response = None
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt == self.retries):
+                self._measure(endpoint, start, response, retries=attempt, error=not response.ok)
+                response.raise_for_status()
+                return response
+
+            # Wait before the next attempt (the server may tell us how long)
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            if response is not None and response.headers.get("Retry-After", "").isdigit():
+                delay = max(delay, float(response.headers["Retry-After"]))
+            time.sleep(delay)
+
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+
+    def post(self, url, json=None, **kwargs):
+        # The payload is sent as JSON (no manual json.dumps as in the notebook)
+        return self.request("POST", url, json=json, **kwargs)
+
+
+    def put(self, url, json=None, **kwargs):
+        return self.request("PUT", url, json=json, **kwargs)
+
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+    def get_json(self, url, missing_ok=False, **kwargs):
+        # GET a JSON document; with missing_ok, a 404 gives None instead of an error
+        try:
+            return self.request("GET", url, **kwargs).json()
+        except requests.HTTPError as e:
+            if missing_ok and e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+
+    def map_many(self, func, items):
+        """
+        Applies func to every item with max_workers concurrent threads and
+        yields (item, result) in input order as the results arrive.
+        """
+        items = list(items)
+        yield from zip(items, self.executor.map(func, items))
+
+
+    def _many(self, calls, decode, return_exceptions):
+        # Run (method, url, kwargs) calls concurrently; decoded JSON, responses or exceptions, in input order
+        def call(args):
+            method, url, kwargs = args
+            try:
+                response = self.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                if return_exceptions:
+                    return e
+                raise
+            if not decode:
+                return response
+            return response.json() if response.content else None
+
+        return [result for _, result in self.map_many(call, calls)]
+
+
+    def get_many(self, urls, params=None, decode=True, return_exceptions=False, **kwargs):
+        """
+        GETs many URLs concurrently and returns their answers in the order of
+        urls: decoded JSON (None for empty bodies), or the responses with
+        decode=False. params is shared or a list (one per URL). A failing
+        request raises, or leaves its exception in place with
+        return_exceptions=True.
+        """
+        urls = list(urls)
+        params = params if isinstance(params, (list, tuple)) else [params] * len(urls)
+        calls = [("GET", url, dict(kwargs, params=p)) for url, p in zip(urls, params)]
+        return self._many(calls, decode, return_exceptions)
+
+
+    def post_many(self, url, payloads, decode=True, return_exceptions=False, **kwargs):
+        """
+        POSTs many JSON payloads concurrently, to one URL or to a list of URLs
+        (one per payload), and returns the answers in the order of payloads
+        (see get_many).
+        """
+        payloads = list(payloads)
+        urls = [url] * len(payloads) if isinstance(url, str) else list(url)
+        calls = [("POST", u, dict(kwargs, json=payload)) for u, payload in zip(urls, payloads)]
+        return self._many(calls, decode, return_exceptions)
+
+
+    def report(self):
+        # Metrics of every endpoint as a dictionary
+        with self.lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self.stats.items())}
+
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
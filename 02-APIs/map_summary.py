@@ -0,0 +1,67 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Summarise a collection of EM maps: python map_summary.py maps/ --cache map_summaries -w 4
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# Import the chunk-wise summaries and their on-disk cache
+from databanks import MapSummaryCache
+
+MAP_EXTENSIONS = (".map", ".mrc", ".ccp4")
+
+
+def find_maps(paths):
+    # Map files given directly or found (recursively) in the given folders
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(MAP_EXTENSIONS):
+                        yield os.path.join(folder, name)
+        else:
+            yield path
+
+
+def summarise(cache_args, path):
+    # Worker: one cache object per call (the cache state lives in its files)
+    cache = MapSummaryCache(**cache_args)
+    stats = cache.stats(path)
+    return path, stats, cache.report()["hits"] == 1
+
+
+def main():
+    # Parse command-line options
+    parser = argparse.ArgumentParser(description="Statistics, contour level and previews of CCP4/MRC maps, cached on disk.")
+    parser.add_argument("paths", nargs="+", help="map files or folders")
+    parser.add_argument("--cache", default="map_summaries", help="cache folder (default: map_summaries)")
+    parser.add_argument("--bins", type=int, default=256, help="histogram bins (default: 256)")
+    parser.add_argument("--sigma", type=float, default=3.0, help="contour level = mean + SIGMA * rms (default: 3)")
+    parser.add_argument("--preview-size", type=int, default=64, help="largest side of the block-averaged volume (default: 64)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="maps summarised in parallel (default: 1)")
+    parser.add_argument("--prune", action="store_true", help="drop the cache entries of maps that no longer exist")
+    args = parser.parse_args()
+
+    cache_args = {"folder": args.cache, "bins": args.bins, "contour_sigma": args.sigma, "preview_size": args.preview_size}
+    cache = MapSummaryCache(**cache_args)
+    if args.prune:
+        for path in cache.prune():
+            print("pruned:", path, file=sys.stderr)
+
+    start, hits, total = time.perf_counter(), 0, 0
+    maps = list(find_maps(args.paths))
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, stats, hit in pool.map(summarise, [cache_args] * len(maps), maps):
+            total += 1
+            hits += hit
+            print(f"{path}: {'x'.join(map(str, stats['shape']))}  min {stats['min']:.4g}  max {stats['max']:.4g}  "
+                  f"mean {stats['mean']:.4g}  rms {stats['rms']:.4g}  contour {stats['contour']:.4g}")
+    print(f"{total} maps ({hits} from the cache) in {time.perf_counter() - start:.1f} s, previews in {args.cache}",
+          file=sys.stderr)
+
+
+# Run the main function only if this script is executed directly (not imported)
+if __name__ == "__main__":
+    main()
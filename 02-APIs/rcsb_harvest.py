@@ -0,0 +1,80 @@
+# Based on RCSB_Mapping.ipynb (Marco Prenassi, CC BY 4.0)
+#
+# Harvest an RCSB search: python rcsb_harvest.py "ATOMIC FORCE" -o harvest.ndjson -w 16 --rate 10
+import sys
+import json
+import time
+import argparse
+
+# Import the pooled, concurrent RCSB client, the notebook's search and the HTTP cache
+from databanks import RCSBClient, HTTPCache, text_query
+
+
+def main():
+    # Parse command-line options
+    parser = argparse.ArgumentParser(description="Fetch every entry, polymer entity and EMDB map reference of an RCSB search.")
+    parser.add_argument("text", nargs="?", default="ATOMIC FORCE", help="full-text search (default: ATOMIC FORCE)")
+    parser.add_argument("--method", default="ELECTRON MICROSCOPY", help="exptl.method filter ('' for none)")
+    parser.add_argument("--query", default=None, help="JSON file with a complete search query (overrides text/method)")
+    parser.add_argument("-o", "--output", default=None, help="NDJSON output file (default: standard output)")
+    parser.add_argument("-n", "--limit", type=int, default=None, help="stop after this many results")
+    parser.add_argument("--rows", type=int, default=100, help="results per search page (default: 100)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="concurrent requests (default: 8)")
+    parser.add_argument("--batch", type=int, default=100, metavar="N",
+                        help="entries per GraphQL request (default: 100, 0 = two REST requests per entry)")
+    parser.add_argument("--maps", default=None, metavar="FOLDER",
+                        help="also download (and gunzip while downloading) the EMDB maps into FOLDER")
+    parser.add_argument("--rate", type=float, default=10.0, help="maximum requests per second (default: 10, 0 = no limit)")
+    parser.add_argument("--cache", default=None, metavar="FILE",
+                        help="answer repeated requests from this on-disk HTTP cache (SQLite file)")
+    parser.add_argument("--ttl", type=float, default=24 * 3600,
+                        help="seconds a cached answer is used before being revalidated (default: 86400)")
+    parser.add_argument("--offline", action="store_true", help="use only the cache, never the network (needs --cache)")
+    args = parser.parse_args()
+
+    if args.query:
+        with open(args.query) as f:
+            query = json.load(f)
+    else:
+        query = text_query(args.text, method=args.method)
+
+    if args.offline and not args.cache:
+        parser.error("--offline needs --cache")
+    cache = HTTPCache(args.cache, ttl=args.ttl, offline=args.offline) if args.cache else None
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    start, count = time.perf_counter(), 0
+    with RCSBClient(max_workers=args.workers, rate=args.rate, cache=cache) as client:
+        # One line per entry: identifiers, title, sequence and EMDB maps
+        for record in client.harvest(query, rows=args.rows, limit=args.limit, batch_size=args.batch):
+            entry, entity = record["entry"] or {}, record["polymer_entity"] or {}
+            out.write(json.dumps({
+                "identifier": record["identifier"],
+                "score": record["score"],
+                "title": entry.get("struct", {}).get("title"),
+                "sequence": entity.get("entity_poly", {}).get("pdbx_seq_one_letter_code"),
+                "emdb_ids": record["emdb_ids"],
+                "map_urls": record["map_urls"],
+            }) + "\n")
+            count += 1
+
+            # Streamed map download, resumed on the next run if interrupted
+            if args.maps:
+                for emd_id in record["emdb_ids"]:
+                    print("map:", client.download_map(emd_id, args.maps), file=sys.stderr)
+
+        # Latency and throughput of every endpoint used
+        for endpoint, stats in client.report().items():
+            print(f"{endpoint}: {stats['count']} requests, p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, "
+                  f"{stats['per_second']:.1f}/s, {stats['retries']} retries, {stats['errors']} errors", file=sys.stderr)
+    if args.output:
+        out.close()
+    print(f"{count} entries in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    if cache is not None:
+        print("cache:", cache.report(), file=sys.stderr)
+        cache.close()
+
+
+# Run the main function only if this script is executed directly (not imported)
+if __name__ == "__main__":
+    main()
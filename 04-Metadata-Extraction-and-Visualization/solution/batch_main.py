@@ -0,0 +1,95 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Batch entry point: python batch_main.py imgs/ "share/**/*.tif" -w 8 -c 16
+import os
+import argparse
+
+# Import the file discovery and the parallel batch driver
+from semmeta.batch_module import find_images, run_batch
+from semmeta.cache_module import MetadataCache
+from semmeta.catalog_module import SEMCatalog
+from semmeta.ndjson_module import NDJSONWriter, compact_ndjson
+from semmeta.similarity_module import SimilarityIndex
+from semmeta.profiling_module import Profiler
+
+
+def main():
+    # Parse command-line options
+    parser = argparse.ArgumentParser(description="Run the SEM metadata pipeline over many images.")
+    parser.add_argument("paths", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="output", help="output directory (default: output)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("-c", "--chunksize", type=int, default=8, help="images sent to a worker at a time (default: 8)")
+    parser.add_argument("--render", action="store_true", help="also save the image + table PNG for each image")
+    parser.add_argument("--thumbnail", type=int, default=None, metavar="SIZE",
+                        help="with --render, save only a SIZE x SIZE thumbnail of each image")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="with --render, cache reduced copies of each image in <output>/pyramid")
+    parser.add_argument("--features", action="store_true",
+                        help="add pixel statistics and focus/noise metrics (PX_* fields) to the cleaned metadata")
+    parser.add_argument("--similarity", action="store_true",
+                        help="add each image to the similarity index <output>/similarity_index.npz (see similar_main.py)")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="REPORT",
+                        help="record per-stage timings and save them as JSON (default: <output>/profile.json)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, also record the peak memory of each stage (slower)")
+    parser.add_argument("--pil", action="store_true", help="extract through PIL instead of the header-only reader")
+    parser.add_argument("--no-raw", action="store_true", help="do not write the <name>-<hash>_raw.json files")
+    parser.add_argument("--catalog", default=None, help="SQLite catalog to append the cleaned metadata to")
+    parser.add_argument("--ndjson", default=None, help="also stream the cleaned metadata to this NDJSON file (one image per line)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-process the images given, even if unchanged (other cache entries are kept)")
+    parser.add_argument("--hash", action="store_true", help="confirm changed mtimes with a content hash")
+    args = parser.parse_args()
+
+    # Find every image with a supported SEM extension
+    images = find_images(args.paths)
+    if not images:
+        raise SystemExit("No SEM images found in: " + ", ".join(args.paths))
+    print(f"Found {len(images)} SEM images")
+
+    # Cache of already processed images, stored next to the outputs
+    cache = MetadataCache(os.path.join(args.output, ".semmeta_cache.json"), use_hash=args.hash)
+
+    # Optional queryable catalog of the cleaned metadata
+    catalog = SEMCatalog(args.catalog) if args.catalog else None
+
+    # Optional NDJSON export (appended to, so incremental runs add their new images; compacted at the end)
+    ndjson = NDJSONWriter(args.ndjson, append=True) if args.ndjson else None
+
+    # Optional perceptual-hash index for "find similar images" queries
+    index = SimilarityIndex(os.path.join(args.output, "similarity_index.npz")) if args.similarity else None
+
+    # Optional per-stage timings, recorded in the workers and merged here
+    profiler = Profiler(memory=args.profile_memory) if args.profile is not None else None
+
+    # Spread the work over the process pool and report failures at the end
+    summary = run_batch(images, output_dir=args.output, workers=args.workers,
+                        chunksize=args.chunksize, header_only=not args.pil,
+                        render=args.render, cache=cache, write_raw=not args.no_raw,
+                        catalog=catalog, thumbnail=args.thumbnail,
+                        pyramid_dir=os.path.join(args.output, "pyramid") if args.pyramid else None,
+                        ndjson=ndjson, features=args.features, index=index,
+                        profiler=profiler, force=args.force)
+    if args.profile is not None:
+        report = args.profile or os.path.join(args.output, "profile.json")
+        profiler.print_summary()
+        profiler.write_report(report)
+        print(f"Profile report: {report}")
+    if index is not None:
+        print(f"Similarity index: {len(index)} images")
+    if ndjson is not None:
+        ndjson.close()
+        # Re-processed images replace their older lines
+        dropped = compact_ndjson(args.ndjson)
+        print(f"NDJSON {args.ndjson}: {ndjson.count} records appended, {dropped} outdated removed")
+    if catalog is not None:
+        print(f"Catalog {args.catalog}: {len(catalog)} images")
+        catalog.close()
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+# Run the main function only if this script is executed directly (not imported)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: batch runs over microscope sessions (same file names in several folders),
+# cold run vs incremental re-run through the cache, a killed worker and an interrupted run
+# Run from the solution folder:  python benchmarks/bench_batch.py [images per session]
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import signal
+import tempfile
+import threading
+import multiprocessing
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from semmeta.batch_module import find_images, run_batch
+from semmeta.cache_module import MetadataCache
+from semmeta.pipeline_module import output_paths
+from semmeta.profiling_module import Profiler
+from synthetic_corpus import make_corpus
+
+
+class InterruptAfter(Profiler):
+    # Profiler whose merge stops the run (like Ctrl-C) after a number of images
+    def __init__(self, images):
+        super().__init__()
+        self.images = images
+
+    def merge(self, samples):
+        self.images -= 1
+        if self.images < 0:
+            raise KeyboardInterrupt
+
+
+def kill_worker(output, started):
+    # Killer thread: a worker process dies (like an OOM kill) once a few images are written
+    deadline = time.monotonic() + 30
+    while len(glob.glob(os.path.join(output, "*_cleaned.json"))) < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    children = multiprocessing.active_children()
+    if children:
+        os.kill(children[0].pid, signal.SIGKILL)
+        started.append(children[0].pid)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    workdir = tempfile.mkdtemp(prefix="semmeta-batch-")
+    try:
+        # Two sessions written with the same file names (different seeds: different parameters)
+        share, output = os.path.join(workdir, "share"), os.path.join(workdir, "output")
+        for seed, session in enumerate(("session_a", "session_b")):
+            make_corpus(os.path.join(share, session), count, size=(512, 384), seed=seed)
+        images = find_images([share])
+        assert len(images) == 2 * count
+
+        cache = MetadataCache(os.path.join(output, ".semmeta_cache.json"))
+        cold = run_batch(images, output_dir=output, workers=2, cache=cache, verbose=False)
+        assert cold["processed"] == 2 * count and cold["failed"] == 0, cold
+
+        # Every image has its own outputs: nothing was overwritten by its namesake
+        cleaned = [output_paths(image, output, unique=True)[1] for image in images]
+        assert len(set(cleaned)) == len(images) and all(os.path.isfile(path) for path in cleaned)
+        assert len(glob.glob(os.path.join(output, "*_cleaned.json"))) == len(images)
+        a, b = (json.load(open(output_paths(os.path.join(share, session, os.path.basename(images[0])),
+                                            output, unique=True)[1])) for session in ("session_a", "session_b"))
+        assert a != b
+
+        # Incremental re-run: everything is fresh
+        cache = MetadataCache(os.path.join(output, ".semmeta_cache.json"))
+        warm = run_batch(images, output_dir=output, workers=2, cache=cache, verbose=False)
+        assert warm["files"] == 0 and cache.report()["hits"] == len(images), cache.report()
+
+        # Forcing one session redoes only that session: the other one stays cached
+        session_a = find_images([os.path.join(share, "session_a")])
+        forced = run_batch(session_a, output_dir=output, workers=2, cache=cache, verbose=False, force=True)
+        assert forced["processed"] == count
+        cache = MetadataCache(os.path.join(output, ".semmeta_cache.json"))
+        again = run_batch(images, output_dir=output, workers=2, cache=cache, verbose=False)
+        assert again["files"] == 0 and len(cache.entries) == len(images), again
+
+        # New options make every entry stale: the PX_* fields are added to all the images
+        cache = MetadataCache(os.path.join(output, ".semmeta_cache.json"))
+        featured = run_batch(images, output_dir=output, workers=2, cache=cache, verbose=False, features=True)
+        assert featured["processed"] == len(images), featured
+        assert all(any(key.startswith("PX_") for key in json.load(open(path))) for path in cleaned)
+        cache = MetadataCache(os.path.join(output, ".semmeta_cache.json"))
+        assert run_batch(images, output_dir=output, workers=2, cache=cache, verbose=False, features=True)["files"] == 0
+
+        # A killed worker does not stop the run: its images are retried, nothing is lost
+        crash_output = os.path.join(workdir, "crash")
+        killed = []
+        killer = threading.Thread(target=kill_worker, args=(crash_output, killed))
+        killer.start()
+        crashed = run_batch(images, output_dir=crash_output, workers=2, chunksize=2, verbose=False)
+        killer.join()
+        assert killed and crashed["processed"] + crashed["failed"] == len(images) and crashed["failed"] <= 1, crashed
+
+        # An interrupted run still saves the cache of the images it finished
+        stop_output = os.path.join(workdir, "interrupted")
+        cache = MetadataCache(os.path.join(stop_output, ".semmeta_cache.json"))
+        try:
+            run_batch(images, output_dir=stop_output, workers=1, cache=cache, verbose=False,
+                      profiler=InterruptAfter(count))
+            raise AssertionError("the run was not interrupted")
+        except KeyboardInterrupt:
+            pass
+        cache = MetadataCache(os.path.join(stop_output, ".semmeta_cache.json"))
+        resumed = run_batch(images, output_dir=stop_output, workers=2, cache=cache, verbose=False)
+        assert resumed["files"] == len(images) - count, resumed
+        print("ok")
+        print(f"{len(images)} images in 2 sessions: cold run {cold['seconds']:.2f} s, "
+              f"re-run {warm['seconds'] * 1e3:.0f} ms ({warm['cache']['hits']} unchanged)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: column types of the catalog, SQLite catalog query vs scanning a directory of cleaned JSON files
+# Run from the solution folder:  python benchmarks/bench_catalog.py [number of images]
+import os
+import sys
+import json
+import glob
+import time
+import random
+import tempfile
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta.catalog_module import SEMCatalog, split_value
+
+
+def make_corpus(folder, count, seed=0):
+    # Copies of the cleaned JSON files in output/ with varied WD and detector
+    templates = [json.load(open(path)) for path in sorted(glob.glob(os.path.join("output", "*_cleaned.json")))]
+    if not templates:
+        raise SystemExit("no cleaned JSON files in ./output (run from the solution folder)")
+    rng = random.Random(seed)
+    records = []
+    for idx in range(count):
+        data = dict(templates[idx % len(templates)])
+        data["AP_WD"] = {"value": round(rng.uniform(1e-3, 1e-2), 6), "unit": "m"}
+        data["DP_IMPLIED_DETECTOR"] = rng.choice(["InLens", "SE2", "BSD"])
+        path = os.path.join(folder, f"image_{idx:06d}_cleaned.json")
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        records.append((f"image_{idx:06d}.tif", data))
+    return records
+
+
+def scan_json(folder):
+    # Baseline: open every JSON file and test the condition in Python
+    matches = []
+    for path in sorted(glob.glob(os.path.join(folder, "*_cleaned.json"))):
+        with open(path) as f:
+            data = json.load(f)
+        wd, unit, _ = split_value(data.get("AP_WD"))
+        _, _, detector = split_value(data.get("DP_IMPLIED_DETECTOR"))
+        if wd is not None and wd < 4e-3 and detector == "InLens":
+            matches.append(path)
+    return matches
+
+
+def check_types(folder):
+    # A first value that is None or text must not turn the later numbers of a key into text
+    with SEMCatalog(os.path.join(folder, "types.sqlite")) as catalog:
+        catalog.append("flat.tif", {"PX_SNR": None, "AP_WD": "N/A"})
+        catalog.append("a.tif", {"PX_SNR": 12.0, "AP_WD": {"value": 0.003, "unit": "m"}})
+        catalog.append("b.tif", {"PX_SNR": 3.0, "AP_WD": "WD = 5 mm"})
+        assert [r["path"] for r in catalog.query(("PX_SNR", ">", 5))] == [os.path.abspath("a.tif")]
+        assert [r["AP_WD"] for r in catalog.query(fields=("AP_WD",))] == [(0.003, "m"), (0.005, "m"), "N/A"]
+        types = catalog.connection.execute('SELECT typeof("AP_WD") FROM images ORDER BY path').fetchall()
+        assert types == [("real",), ("real",), ("text",)], types
+        # Text never matches a numeric condition
+        assert len(catalog.query(("AP_WD", ">", 0))) == 2
+    print("ok")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as folder:
+        check_types(folder)
+        records = make_corpus(folder, count)
+
+        # Build the catalog with batched appends
+        start = time.perf_counter()
+        catalog = SEMCatalog(os.path.join(folder, "catalog.sqlite"))
+        for idx in range(0, len(records), 256):
+            catalog.append_many(records[idx: idx + 256])
+        t_build = time.perf_counter() - start
+
+        # Query: AP_WD < 4 mm and InLens detector
+        start = time.perf_counter()
+        found_db = catalog.query(("AP_WD", "<", 4e-3), ("DP_IMPLIED_DETECTOR", "=", "InLens"))
+        t_query = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found_json = scan_json(folder)
+        t_scan = time.perf_counter() - start
+        catalog.close()
+
+        assert len(found_db) == len(found_json)
+        print(f"{count} images, {len(found_db)} matches")
+        print(f"  catalog build (batched) : {t_build:8.3f} s")
+        print(f"  catalog query           : {t_query * 1e3:8.2f} ms")
+        print(f"  JSON directory scan     : {t_scan * 1e3:8.2f} ms  x{t_scan / t_query:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Micro-benchmark: EXIF table + tag lookup cost per image, before and after memoisation
+# Run from the solution folder:  python benchmarks/bench_exif_lookup.py [batch size]
+import os
+import sys
+import glob
+import time
+
+import numpy as np
+from PIL import ExifTags
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMMetaData
+
+
+def exif_before(semmeta, img):
+    # Previous implementation: tables rebuilt on every access, array scans per tag, two passes
+    exif_dict = {k: v for v, k in ExifTags.TAGS.items()}
+    exif_keys = [key for key in exif_dict]
+    exif_number = [exif_dict[k] for k in exif_keys]
+    image_tags = np.array(list(img.tag))
+    found = [(img.tag[idx][:], word) for idx, word in zip(exif_number, exif_keys) if idx in image_tags]
+    none = [(word, None) for num, word in zip(exif_number, exif_keys) if num not in image_tags]
+    return semmeta.ExifMetaDict(found, none)
+
+
+def exif_after(semmeta, img):
+    # Current implementation: cached tables, hash-set lookup, one pass
+    semmeta.ImageMetadata(img)
+    exif_keys, exif_number = semmeta.SEMEXIF
+    found, none = semmeta.GetExifMetadata(img, exif_keys, exif_number)
+    return semmeta.ExifMetaDict(found, none)
+
+
+def main():
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+
+    # Open the images once so that only the EXIF step is measured
+    semmeta = SEMMetaData()
+    images = [semmeta.OpenCheckImage(paths[idx % len(paths)]) for idx in range(batch)]
+    for img in images[:len(paths)]:
+        assert exif_before(semmeta, img) == exif_after(semmeta, img)
+
+    for label, func in (("before", exif_before), ("after", exif_after)):
+        start = time.perf_counter()
+        for img in images:
+            func(semmeta, img)
+        elapsed = time.perf_counter() - start
+        print(f"{label:7s}: {elapsed / batch * 1e6:8.1f} µs/image over {batch} images")
+
+
+if __name__ == "__main__":
+    main()
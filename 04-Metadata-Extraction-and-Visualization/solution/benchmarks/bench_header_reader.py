@@ -0,0 +1,51 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Benchmark: PIL extraction path vs header-only TIFF reader on the images in imgs/
+# Run from the solution folder:  python benchmarks/bench_header_reader.py [repeats]
+import os
+import sys
+import glob
+import timeit
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMMetaData
+
+
+def pil_path(semmeta, image):
+    # Current pipeline: PIL open -> img.tag -> EXIF lists -> dictionaries
+    img = semmeta.OpenCheckImage(image)
+    semmeta.ImageMetadata(img)
+    exif_keys, exif_number = semmeta.SEMEXIF
+    found_exif_metadata, none_exif_metadata = semmeta.GetExifMetadata(img, exif_keys, exif_number)
+    allexif_metadict = semmeta.ExifMetaDict(found_exif_metadata, none_exif_metadata)
+    instrument_meta_dict = semmeta.InsMetaDict(semmeta.GetInsMetadata)
+    return {**allexif_metadict, **instrument_meta_dict}
+
+
+def main():
+    # Number of repetitions per image (default 200)
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    images = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not images:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+
+    semmeta = SEMMetaData()
+    for image in images:
+        # Both paths must produce the same dictionary
+        assert pil_path(semmeta, image) == semmeta.HeaderMetaDict(image)
+
+        t_pil = timeit.timeit(lambda: pil_path(semmeta, image), number=repeats) / repeats
+        t_hdr = timeit.timeit(lambda: semmeta.HeaderMetaDict(image), number=repeats) / repeats
+        t_mm = timeit.timeit(lambda: semmeta.HeaderMetaDict(image, use_mmap=True), number=repeats) / repeats
+
+        print(f"{os.path.basename(image)}")
+        print(f"  PIL path        : {t_pil * 1e3:8.3f} ms/image")
+        print(f"  header (seek)   : {t_hdr * 1e3:8.3f} ms/image  x{t_pil / t_hdr:.1f}")
+        print(f"  header (mmap)   : {t_mm * 1e3:8.3f} ms/image  x{t_pil / t_mm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: tag 34118 parser vs the previous fixed-offset parity parser
+# Run from the solution folder:  python benchmarks/bench_instrument_block.py [repeats]
+import os
+import sys
+import glob
+import timeit
+
+from PIL import Image
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMMetaData, SEMVisualizer
+from semmeta.instrument_block_module import iter_instrument_block
+
+
+def parity_parser(text):
+    # Previous implementation: skip 35 lines, then pair lines by index parity
+    lines = text.split("\r\n")[35:]
+    ins_keys, ins_values = [], []
+    for idx, val in enumerate(lines):
+        if idx % 2 == 0:
+            ins_keys.append(val)
+        else:
+            ins_values.append(val)
+    return {k: v for k, v in zip(ins_keys, ins_values)}
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+
+    semmeta = SEMMetaData()
+    fields = SEMVisualizer().variables
+    for path in paths:
+        text = Image.open(path).tag[semmeta.semInsTag[0]][0]
+
+        # Same entries, same order as the previous parser; selected keys match too
+        full = semmeta.InsMetaDict(text)
+        assert full == parity_parser(text) and list(full) == list(parity_parser(text))
+        selected = semmeta.InsMetaDict(text, keys=fields)
+        assert selected == {key: full[key] for key in fields if key in full}
+        assert semmeta.InstrumentFields(path, fields) == selected
+
+        # The declared entry count bounds the pairs: a truncated block is an error, not a shifted dict
+        assert len(full) == int(text.split("\r\n")[34])
+        truncated = text[:text.index("\r\n", len(text) // 2)]
+        assert semmeta.InsMetaDict(truncated) == {} and semmeta.InsMetaDict(truncated, keys=fields) == {}
+
+        # Lines after the declared entries are not part of the block, for either path
+        trailing = text + "AP_EXTRA\r\nExtra = 1\r\n"
+        assert semmeta.InsMetaDict(trailing) == full
+        assert semmeta.InsMetaDict(trailing, keys=["AP_EXTRA", fields[0]]) == {fields[0]: full[fields[0]]}
+
+        # Pairs come out before the rest of the block is read: a bad key near the end fails late
+        shifted = text.replace("SV_OPERATOR\r\n", "Operator label\r\n")
+        pairs = iter_instrument_block(shifted)
+        assert next(pairs) == next(iter(full.items())) and semmeta.InsMetaDict(shifted) == {}
+
+        # Only CR LF ends a line: separators inside a value stay in it
+        odd = text.replace("SUPRA 40-25-40", "SUPRA\x1c40\x8525-40")
+        assert semmeta.InsMetaDict(odd)["SV_SERIAL_NUMBER"] == "Serial No. = SUPRA\x1c40\x8525-40"
+
+        # The figure table of an image without cleaned metadata is read from its header
+        visualizer = SEMVisualizer(image_path=path)
+        visualizer.load_metadata()
+        assert visualizer.metadata == selected and visualizer.extract_variables()[0][1] != "N/A"
+
+        t_old = timeit.timeit(lambda: parity_parser(text), number=repeats) / repeats
+        t_new = timeit.timeit(lambda: semmeta.InsMetaDict(text), number=repeats) / repeats
+        t_sel = timeit.timeit(lambda: semmeta.InsMetaDict(text, keys=fields), number=repeats) / repeats
+
+        print(f"{os.path.basename(path)} ({len(full)} entries): OK")
+        print(f"  parity parser       : {t_old * 1e6:8.1f} µs")
+        print(f"  single-pass parser  : {t_new * 1e6:8.1f} µs  x{t_old / t_new:.1f}")
+        print(f"  {len(fields)} selected keys     : {t_sel * 1e6:8.1f} µs  x{t_old / t_sel:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: per-file cleaned JSON vs streaming NDJSON export (json and orjson),
+# compaction of re-processed images
+# Run from the solution folder:  python benchmarks/bench_ndjson.py [number of records]
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+import tracemalloc
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import JsonCleaner, NDJSONWriter, compact_ndjson, iter_metadata, iter_ndjson
+from semmeta import ndjson_module
+
+
+def raw_records(templates, count):
+    # Lazily repeat the raw metadata of the sample images (fresh dicts each time)
+    for idx in range(count):
+        record = dict(templates[idx % len(templates)])
+        record["image"] = f"image_{idx:06d}.tif"
+        yield record
+
+
+def per_file(templates, count, folder):
+    # Previous path: one cleaner call and one indented JSON file per image
+    cleaner = JsonCleaner()
+    for record in raw_records(templates, count):
+        cleaner.process_dict(record)
+        cleaner.save_cleaned(os.path.join(folder, record["image"] + ".json"))
+
+
+def streaming(templates, count, path, fast):
+    # Streaming path: generator -> clean_stream -> buffered NDJSON sink
+    with NDJSONWriter(path, fast=fast) as sink:
+        return sink.write_many(JsonCleaner().clean_stream(raw_records(templates, count)))
+
+
+def measure(func, *args):
+    # Time of one call
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def peak_memory(func, *args):
+    # Peak traced memory of one call (tracing is slow, so it is kept out of the timings)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+    skipped = []
+    templates = [{k: v for k, v in record.items() if k != "image"}
+                 for record in iter_metadata(paths + [os.path.abspath(__file__)], skipped=skipped)]
+    assert skipped == [os.path.abspath(__file__)] and len(templates) == len(paths)
+
+    with tempfile.TemporaryDirectory() as folder:
+        results = [("per-file JSON (indent=2)", measure(per_file, templates, count, folder)),
+                   ("NDJSON, json", measure(streaming, templates, count, os.path.join(folder, "json.ndjson"), False))]
+        if ndjson_module.orjson is not None:
+            results.append(("NDJSON, orjson", measure(streaming, templates, count, os.path.join(folder, "orjson.ndjson"), True)))
+
+        # Streaming memory does not grow with the number of records
+        sink = os.path.join(folder, "peak.ndjson")
+        peaks = [(n, peak_memory(streaming, templates, n, sink, True)) for n in (count // 20, count // 5)]
+
+        # The NDJSON file holds the cleaned records, in order
+        for record, other in zip(iter_ndjson(os.path.join(folder, "json.ndjson"), fast=False),
+                                 JsonCleaner().clean_stream(raw_records(templates, count))):
+            assert record == json.loads(json.dumps(other))
+
+        # Incremental runs append re-processed images: compaction keeps their last record only
+        appended = os.path.join(folder, "appended.ndjson")
+        for run, names in enumerate((["a", "b", "c"], ["b"], ["c", "d"])):
+            with NDJSONWriter(appended, append=True) as sink:
+                sink.write_many({"image": name, "run": run} for name in names)
+        assert compact_ndjson(appended) == 2 and compact_ndjson(appended) == 0
+        assert list(iter_ndjson(appended)) == [{"image": "a", "run": 0}, {"image": "b", "run": 1},
+                                               {"image": "c", "run": 2}, {"image": "d", "run": 2}]
+        print("ok")
+
+    print(f"{count} records")
+    base = results[0][1]
+    for label, elapsed in results:
+        print(f"  {label:26s}: {count / elapsed:8.0f} records/s  x{base / elapsed:.1f}")
+    for n, peak in peaks:
+        print(f"  streaming peak memory, {n:6d} records: {peak / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
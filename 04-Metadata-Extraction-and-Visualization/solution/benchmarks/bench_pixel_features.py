@@ -0,0 +1,70 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: pixel features on memory-mapped strips vs PIL-decoded pixels
+# Run from the solution folder:  python benchmarks/bench_pixel_features.py [repeats]
+import os
+import sys
+import glob
+import timeit
+
+import numpy as np
+from PIL import Image
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMMetaData
+from semmeta.pixel_features_module import pixel_array, pixel_features
+
+
+def laplacian_loop(pixels):
+    # Reference: 4-neighbour Laplacian with explicit Python loops (small crops only)
+    rows, cols = pixels.shape
+    values = []
+    for y in range(1, rows - 1):
+        for x in range(1, cols - 1):
+            values.append(float(pixels[y, x - 1]) + float(pixels[y, x + 1]) + float(pixels[y - 1, x])
+                          + float(pixels[y + 1, x]) - 4 * float(pixels[y, x]))
+    return np.var(values)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+
+    semmeta = SEMMetaData()
+    for path in paths:
+        metadata = semmeta.HeaderMetaDict(path)
+
+        # The memory map holds exactly the pixels PIL decodes
+        mapped = pixel_array(path, metadata)
+        decoded = np.asarray(Image.open(path))
+        assert isinstance(mapped, np.memmap) and np.array_equal(mapped, decoded)
+
+        # Vectorised statistics agree with straightforward computations
+        features = pixel_features(mapped)
+        assert np.isclose(features["PX_MEAN"], decoded.mean()) and np.isclose(features["PX_STD"], decoded.std())
+        assert sum(features["PX_HISTOGRAM"]) == decoded.size
+        crop = decoded[:64, :64]
+        assert np.isclose(pixel_features(crop)["PX_SHARPNESS"], laplacian_loop(crop), rtol=1e-6)
+
+        t_pil = timeit.timeit(lambda: np.asarray(Image.open(path)), number=repeats) / repeats
+        t_map = timeit.timeit(lambda: pixel_array(path, metadata), number=repeats) / repeats
+        t_feat = timeit.timeit(lambda: pixel_features(mapped), number=repeats) / repeats
+        t_loop = timeit.timeit(lambda: laplacian_loop(crop), number=1) * mapped.size / crop.size
+
+        summary = ", ".join(f"{key[3:].lower()} {value:.4g}" for key, value in features.items()
+                            if key != "PX_HISTOGRAM" and value is not None)
+        print(f"{os.path.basename(path)} {mapped.shape}: OK")
+        print(f"  {summary}")
+        print(f"  PIL decode          : {t_pil * 1e3:8.2f} ms")
+        print(f"  memory map (strips) : {t_map * 1e3:8.2f} ms  x{t_pil / t_map:.0f}")
+        print(f"  all features (NumPy): {t_feat * 1e3:8.2f} ms")
+        print(f"  Laplacian, Python loop (extrapolated): {t_loop * 1e3:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Benchmark: full-resolution loading vs reduced previews and the cached image pyramid
+# Run from the solution folder:  python benchmarks/bench_preview.py [scale of the test image]
+import os
+import sys
+import glob
+import time
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import ImagePyramid, FigureRenderer, load_preview
+
+
+def timed(func, repeats=5):
+    # Best time of a few calls, and the result of the last one
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Large detector format: the sample image tiled scale x scale times
+        with Image.open(paths[0]) as img:
+            pixels = np.tile(np.asarray(img.convert("L")), (scale, scale))
+        big = os.path.join(folder, "large.tif")
+        Image.fromarray(pixels).save(big)
+        height, width = pixels.shape
+
+        def full():
+            with Image.open(big) as img:
+                img.load()
+                return img.copy()
+
+        pyramid_dir = os.path.join(folder, "pyramid")
+        t_build, _ = timed(lambda: ImagePyramid(big, pyramid_dir).build(), repeats=1)
+        assert ImagePyramid(big, pyramid_dir).is_fresh()
+
+        # A same-named image of another folder gets its own levels: both pyramids stay fresh
+        other = os.path.join(folder, "session_b", "large.tif")
+        os.makedirs(os.path.dirname(other))
+        Image.fromarray(255 - pixels).save(other)
+        ImagePyramid(other, pyramid_dir).build()
+        assert ImagePyramid(big, pyramid_dir).is_fresh() and ImagePyramid(other, pyramid_dir).is_fresh()
+        assert not np.array_equal(load_preview(other, max_size=256, pyramid_dir=pyramid_dir),
+                                  load_preview(big, max_size=256, pyramid_dir=pyramid_dir))
+
+        t_full, img_full = timed(full)
+        t_prev, img_prev = timed(lambda: load_preview(big, max_size=1024))
+        t_pyr, img_pyr = timed(lambda: load_preview(big, max_size=1024, pyramid_dir=pyramid_dir))
+        t_thumb, img_thumb = timed(lambda: load_preview(big, max_size=256, pyramid_dir=pyramid_dir))
+
+        # Whole figure: full-resolution pixels vs the reduced preview
+        png = os.path.join(folder, "large.png")
+        rows = [("AP_WD", "3.198", "mm")] * 6
+        t_fig_full, _ = timed(lambda: FigureRenderer(preview_size=None).render(big, rows, png), repeats=2)
+        t_fig_prev, _ = timed(lambda: FigureRenderer(pyramid_dir=pyramid_dir).render(big, rows, png), repeats=2)
+
+        # The pyramid gives the same picture as reducing the full image in one go
+        assert img_pyr.size == img_prev.size
+        assert np.abs(np.asarray(img_pyr, dtype=float) - np.asarray(img_prev, dtype=float)).max() <= 1
+
+    print(f"{width}x{height} image")
+    for label, seconds, result in (("full resolution", t_full, img_full),
+                                   ("reduced preview", t_prev, img_prev),
+                                   ("pyramid preview", t_pyr, img_pyr),
+                                   ("pyramid thumbnail", t_thumb, img_thumb)):
+        nbytes = np.asarray(result).nbytes
+        print(f"  {label:18s}: {seconds * 1e3:8.1f} ms  {result.size[0]:5d}x{result.size[1]:<5d} {nbytes / 1e6:6.1f} MB")
+    print(f"  pyramid build     : {t_build * 1e3:8.1f} ms (once per image)")
+    print(f"  figure, full res. : {t_fig_full * 1e3:8.1f} ms")
+    print(f"  figure, preview   : {t_fig_prev * 1e3:8.1f} ms  x{t_fig_full / t_fig_prev:.1f}")
+
+
+if __name__ == "__main__":
+    main()
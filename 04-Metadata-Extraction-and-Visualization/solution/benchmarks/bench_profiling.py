@@ -0,0 +1,94 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: nested peak memory, percentiles and worker memory of the profiler,
+# and the cost of the @profiled stage timers when profiling is disabled and enabled
+# Run from the solution folder:  python benchmarks/bench_profiling.py [repeats]
+import os
+import sys
+import glob
+import shutil
+import timeit
+import tempfile
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMMetaData, JsonCleaner
+from semmeta.batch_module import run_batch
+from semmeta.profiling_module import PROFILER, Profiler, profiled
+
+
+def plain():
+    return None
+
+
+@profiled
+def timed():
+    return None
+
+
+def check_profiler(paths):
+    # A large allocation before an inner stage still counts in the outer stage's peak
+    profiler = Profiler()
+    profiler.enable(memory=True)
+    with profiler.stage("outer"):
+        big = bytearray(8 << 20)
+        del big
+        with profiler.stage("inner"):
+            small = bytearray(1 << 20)
+            del small
+    profiler.disable()
+    report = profiler.report()
+    assert report["outer"]["peak_memory_bytes"] >= 8 << 20, report["outer"]
+    assert (1 << 20) <= report["inner"]["peak_memory_bytes"] < 2 << 20, report["inner"]
+
+    # Percentiles use the (n - 1) rank: p50 of two values is the lower one
+    profiler = Profiler(enabled=True)
+    profiler.merge({"stage": [(0.1, 0, None, None, None), (0.3, 0, None, None, None)]})
+    assert profiler.report()["stage"]["wall_s"]["p50"] == 0.1
+
+    # Batch workers record peak memory when the profiler asks for it
+    output = tempfile.mkdtemp(prefix="semmeta-profile-")
+    try:
+        profiler = Profiler(memory=True)
+        run_batch(paths, output_dir=output, workers=1, verbose=False, profiler=profiler)
+        assert profiler.report()["process_image"]["peak_memory_bytes"] > 0
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+    print("ok")
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+    check_profiler(paths)
+    semmeta, cleaner = SEMMetaData(), JsonCleaner()
+
+    def extract_and_clean():
+        for path in paths:
+            cleaner.process_dict(semmeta.HeaderMetaDict(path))
+
+    # Per-call overhead of the decorator on an empty function
+    t_plain = timeit.timeit(plain, number=100000) / 100000
+    t_off = timeit.timeit(timed, number=100000) / 100000
+
+    # Whole extract + clean step with profiling off and on
+    t_pipe_off = timeit.timeit(extract_and_clean, number=repeats) / repeats
+    PROFILER.enable()
+    t_on = timeit.timeit(timed, number=10000) / 10000
+    t_pipe_on = timeit.timeit(extract_and_clean, number=repeats) / repeats
+    PROFILER.disable()
+    assert PROFILER.report()["SEMMetaData.HeaderMetaDict"]["count"] == repeats * len(paths)
+
+    print(f"empty call             : {t_plain * 1e9:8.0f} ns")
+    print(f"@profiled, disabled    : {t_off * 1e9:8.0f} ns  (+{(t_off - t_plain) * 1e9:.0f} ns per stage)")
+    print(f"@profiled, enabled     : {t_on * 1e9:8.0f} ns")
+    print(f"extract + clean, off   : {t_pipe_off * 1e3:8.2f} ms for {len(paths)} images")
+    print(f"extract + clean, on    : {t_pipe_on * 1e3:8.2f} ms  (+{(t_pipe_on / t_pipe_off - 1) * 100:.1f} %)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Benchmark: pyplot figure per image vs one reused headless figure (FigureRenderer)
+# Run from the solution folder:  python benchmarks/bench_render.py [number of renders]
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+
+import numpy as np
+from PIL import Image
+import matplotlib
+matplotlib.use("Agg")
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SEMVisualizer, FigureRenderer
+
+
+def rss_mb():
+    # Resident memory of this process (Linux)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def run(paths, metadata, count, folder, renderer):
+    # Render count figures, returning the time per figure and the memory growth
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    for idx in range(count):
+        path = paths[idx % len(paths)]
+        visualizer = SEMVisualizer(image_path=path, metadata=metadata[path])
+        visualizer.show_image_with_table(output_dir=folder, show=False, renderer=renderer)
+    elapsed = time.perf_counter() - start
+    return elapsed / count, rss_mb() - start_rss
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+    metadata = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(os.path.join("output", f"{name}_cleaned.json")) as f:
+            metadata[path] = json.load(f)
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Same picture from both paths (up to anti-aliasing of the text)
+        pyplot_dir, reused_dir = os.path.join(folder, "pyplot"), os.path.join(folder, "reused")
+        renderer = FigureRenderer()
+        for path in paths:
+            SEMVisualizer(image_path=path, metadata=metadata[path]).show_image_with_table(pyplot_dir, show=False)
+            SEMVisualizer(image_path=path, metadata=metadata[path]).show_image_with_table(reused_dir, renderer=renderer)
+            name = os.path.basename(os.path.splitext(path)[0]) + ".png"
+            a = np.asarray(Image.open(os.path.join(pyplot_dir, name)).convert("L"), dtype=float)
+            b = np.asarray(Image.open(os.path.join(reused_dir, name)).convert("L"), dtype=float)
+            assert a.shape == b.shape and np.abs(a - b).mean() < 1.0, name
+
+        t_pyplot, m_pyplot = run(paths, metadata, count, folder, None)
+        t_reused, m_reused = run(paths, metadata, count, folder, renderer)
+        t_thumb, m_thumb = run(paths, metadata, count, folder, FigureRenderer(thumbnail=256))
+
+    print(f"{count} renders")
+    print(f"  pyplot figure per image : {t_pyplot * 1e3:8.1f} ms/image  memory {m_pyplot:+7.1f} MB")
+    print(f"  reused Agg figure       : {t_reused * 1e3:8.1f} ms/image  memory {m_reused:+7.1f} MB  x{t_pyplot / t_reused:.1f}")
+    print(f"  thumbnails only         : {t_thumb * 1e3:8.1f} ms/image  memory {m_thumb:+7.1f} MB  x{t_pyplot / t_thumb:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Benchmark: perceptual hashing and top-k queries of the similarity index
+# Run from the solution folder:  python benchmarks/bench_similarity.py [index size]
+import os
+import sys
+import glob
+import timeit
+import tempfile
+
+import numpy as np
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semmeta import SimilarityIndex, perceptual_hash
+
+
+def query_loop(paths, hashes, phash, k):
+    # Reference: Python loop over integer hashes with bin().count('1')
+    query = int(phash, 16)
+    distances = [(bin(value ^ query).count("1"), path) for path, value in zip(paths, hashes)]
+    return sorted(distances)[:k]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    paths = sorted(glob.glob(os.path.join("imgs", "*.tif")))
+    if not paths:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+    t_hash = timeit.timeit(lambda: perceptual_hash(paths[0]), number=20) / 20
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Archive of random hashes plus the real images
+        rng = np.random.default_rng(0)
+        index = SimilarityIndex(os.path.join(folder, "similarity_index.npz"))
+        fake = [rng.bytes(32).hex() for _ in range(size)]
+        for idx, phash in enumerate(fake):
+            index.add(f"archive/image_{idx:07d}.tif", phash)
+        for path in paths:
+            index.add(path, perceptual_hash(path))
+
+        # Incremental updates survive a save / load round trip
+        index.save()
+        index = SimilarityIndex(index.index_path)
+        assert len(index) == size + len(paths)
+
+        query = index.hash_of(paths[-1])
+        found = index.query(query, k=5)
+        assert found[0] == (os.path.abspath(paths[-1]), 0)
+
+        int_hashes = [int(index.hash_of(path), 16) for path in index.paths]
+        expected = query_loop(index.paths, int_hashes, query, 5)
+        assert [d for d, _ in expected] == [d for _, d in found]
+
+        t_query = timeit.timeit(lambda: index.query(query, k=5), number=20) / 20
+        t_loop = timeit.timeit(lambda: query_loop(index.paths, int_hashes, query, 5), number=2) / 2
+
+    print(f"perceptual hash        : {t_hash * 1e3:8.2f} ms/image")
+    print(f"top-5 query, {len(int_hashes)} images")
+    print(f"  NumPy (XOR + popcount): {t_query * 1e3:8.2f} ms")
+    print(f"  Python loop           : {t_loop * 1e3:8.2f} ms  x{t_loop / t_query:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Check + benchmark: arrival-to-catalog latency of the watch-folder daemon (inotify and polling)
+# and recovery from a killed worker process
+# Run from the solution folder:  python benchmarks/bench_watch.py [count]
+import os
+import sys
+import time
+import shutil
+import signal
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from semmeta.watch_module import IngestDaemon
+from semmeta.catalog_module import SEMCatalog
+from synthetic_corpus import make_corpus
+
+
+def write_slowly(source, target, pieces=4, pause=0.05):
+    # Copy a file in a few pieces, like a microscope writing over the network
+    data = open(source, 'rb').read()
+    step = len(data) // pieces + 1
+    with open(target, 'wb') as f:
+        for offset in range(0, len(data), step):
+            f.write(data[offset:offset + step])
+            f.flush()
+            time.sleep(pause)
+
+
+def catalog_paths(db_path):
+    # Paths already in the catalog, read through a separate connection
+    with sqlite3.connect(db_path) as connection:
+        return {row[0] for row in connection.execute("SELECT path FROM images")}
+
+
+def arrive(mode, sources, share, db_path, daemon, delays, errors):
+    # Writer thread: files arrive one by one (some in new sub-folders) while the daemon runs
+    try:
+        time.sleep(0.3)
+        for idx, source in enumerate(sources):
+            folder = share if idx % 2 == 0 else os.path.join(share, "session", str(idx // 4))
+            os.makedirs(folder, exist_ok=True)
+            target = os.path.abspath(os.path.join(folder, os.path.basename(source)))
+            start = time.monotonic()
+            write_slowly(source, target)
+            while target not in catalog_paths(db_path):
+                assert time.monotonic() - start < 10, f"{mode}: {target} never reached the catalog"
+                time.sleep(0.005)
+            delays.append(time.monotonic() - start)
+
+        # Re-opening a file without changing it sends events but is de-duplicated by the cache
+        first = os.path.join(share, os.path.basename(sources[0]))
+        processed = daemon.processed
+        open(first, 'ab').close()
+        time.sleep(1.0)
+        assert daemon.processed == processed, "an unchanged image was processed again"
+
+        # A burst larger than the queue: the watcher waits (backpressure) and nothing is lost
+        burst = os.path.join(share, "burst")
+        os.makedirs(burst)
+        processed = daemon.processed
+        for idx, source in enumerate(sources):
+            shutil.copy(source, os.path.join(burst, f"burst_{idx:03d}.tif"))
+        deadline = time.monotonic() + 30
+        while daemon.processed < processed + len(sources):
+            assert time.monotonic() < deadline, "images of the burst were lost"
+            time.sleep(0.01)
+        processed = daemon.processed
+
+        # A modified image (bytes appended after the TIFF data) is processed again;
+        # polling only sees new files (an in-place change leaves the directory mtime alone)
+        if mode == "polling":
+            return
+        with open(first, 'ab') as f:
+            f.write(b"\0" * 16)
+        deadline = time.monotonic() + 5
+        while daemon.processed == processed:
+            assert time.monotonic() < deadline, "a modified image was not processed again"
+            time.sleep(0.01)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        daemon.stop()
+
+
+def run(mode, sources, workdir):
+    share, output = os.path.join(workdir, mode, "share"), os.path.join(workdir, mode, "output")
+    os.makedirs(share)
+    db_path = os.path.join(output, "catalog.db")
+    catalog = SEMCatalog(db_path)
+    daemon = IngestDaemon(share, output_dir=output, workers=2, queue_size=4, catalog=catalog,
+                          use_inotify=False if mode == "polling" else True,
+                          poll_interval=0.1, verbose=False)
+
+    # The daemon runs in the main thread (it owns the SQLite connection and the signals)
+    delays, errors = [], []
+    writer = threading.Thread(target=arrive, args=(mode, sources, share, db_path, daemon, delays, errors))
+    writer.start()
+    summary = daemon.run()
+    writer.join()
+    catalog.close()
+    if errors:
+        raise errors[0]
+    assert summary["processed"] == 2 * len(sources) + (mode == "inotify") and summary["failed"] == 0, summary
+    # The first image also creates the ~1000 catalog columns (once per catalog)
+    first, rest = delays[0], sorted(delays[1:])
+    print(f"{mode:8s}: {len(delays)} files, write start to catalog row p50 {rest[len(rest) // 2] * 1e3:5.0f} ms,"
+          f" max {rest[-1] * 1e3:5.0f} ms (first image {first * 1e3:5.0f} ms);"
+          f" ready to catalog p50 {summary['latency_s']['p50'] * 1e3:5.0f} ms")
+    return rest
+
+
+def kill_worker(daemon, total, errors):
+    # Killer thread: a worker process dies (like an OOM kill) while images are running
+    try:
+        deadline = time.monotonic() + 30
+        while daemon.processed < 2:
+            assert time.monotonic() < deadline, "the daemon never started processing"
+            time.sleep(0.005)
+        os.kill(multiprocessing.active_children()[0].pid, signal.SIGKILL)
+        while daemon.processed + daemon.failed < total:
+            assert time.monotonic() < deadline, "images were lost with the killed worker"
+            time.sleep(0.01)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        daemon.stop()
+
+
+def run_crash(sources, workdir):
+    # Images already in the folder at start-up; one worker is killed while they are processed
+    share, output = os.path.join(workdir, "crash", "share"), os.path.join(workdir, "crash", "output")
+    os.makedirs(share)
+    for source in sources:
+        shutil.copy(source, share)
+    daemon = IngestDaemon(share, output_dir=output, workers=2, queue_size=4, verbose=False)
+    errors = []
+    killer = threading.Thread(target=kill_worker, args=(daemon, len(sources), errors))
+    killer.start()
+    summary = daemon.run()
+    killer.join()
+    if errors:
+        raise errors[0]
+    # Images lost together are retried alone: only an image crashing alone could count as failed
+    assert summary["crashes"] >= 1 and summary["failed"] <= 1, summary
+    assert summary["processed"] + summary["failed"] == len(sources), summary
+    print(f"crash   : worker killed, pool restarted {summary['crashes']} time(s),"
+          f" {summary['processed']} of {len(sources)} images processed")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    workdir = tempfile.mkdtemp(prefix="semmeta-watch-")
+    try:
+        sources = make_corpus(os.path.join(workdir, "corpus"), count, seed=1)
+        for mode in ("inotify", "polling"):
+            delays = run(mode, sources, workdir)
+            # Writing takes ~0.2 s here, settling 0.25 s: every image lands within a second
+            assert delays[-1] < 1.0, f"{mode}: an image took more than one second"
+        run_crash(sources, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
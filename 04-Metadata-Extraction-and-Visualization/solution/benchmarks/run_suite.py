@@ -0,0 +1,183 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Benchmark suite: per-stage timings and batch throughput on synthetic SEM TIFF corpora,
+# saved as JSON so that runs of different commits can be compared
+# Run from the solution folder:
+#   python benchmarks/run_suite.py --count 64 --sizes 1024x768 2048x1536 --workers 1 2 4
+#   python benchmarks/run_suite.py --compare benchmarks/results/OLD.json
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+# Make the semmeta package importable when running this file directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib
+matplotlib.use("Agg")
+
+from semmeta import SEMMetaData, JsonCleaner
+from semmeta.pipeline_module import process_image
+from semmeta.batch_module import run_batch
+from semmeta.render_module import FigureRenderer
+from semmeta.profiling_module import PROFILER
+from synthetic_corpus import make_corpus, load_sources
+
+
+def git_commit():
+    # Commit (and dirty flag) of the tree being measured, None outside git
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                      stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "."],
+                                stderr=subprocess.DEVNULL) != 0
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_stages(images, output_dir, header_only, features, similarity, render):
+    """
+    Runs process_image on every image in this process with PROFILER enabled
+    and returns its per-stage report (count, wall/CPU p50/p95/max, I/O).
+    """
+    semmeta, cleaner = SEMMetaData(), JsonCleaner()
+    renderer = FigureRenderer() if render else None
+    PROFILER.drain()
+    PROFILER.enable()
+    try:
+        for image in images:
+            process_image(image, output_dir=output_dir, semmeta=semmeta, cleaner=cleaner,
+                          header_only=header_only, render=render, show=False, renderer=renderer,
+                          features=features, similarity=similarity)
+    finally:
+        PROFILER.disable()
+    report = PROFILER.report()
+    PROFILER.drain()
+    return report
+
+
+def time_batch(images, output_dir, workers, repeats, render, features):
+    # Best of `repeats` cold runs of run_batch (fresh output folder each time)
+    best = None
+    for _ in range(repeats):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        summary = run_batch(images, output_dir=output_dir, workers=workers, verbose=False,
+                            render=render, features=features)
+        if summary["failed"]:
+            raise SystemExit(f"batch run failed: {summary['failures'][0]}")
+        if best is None or summary["seconds"] < best["seconds"]:
+            best = summary
+    return {"workers": workers, "files": best["files"], "seconds": best["seconds"],
+            "files_per_s": best["files_per_s"], "mb_per_s": best["mb_per_s"]}
+
+
+def run_suite(args, workdir):
+    """
+    Builds one synthetic corpus per resolution and measures it.
+    Returns the JSON-serialisable result of the whole run.
+    """
+    sources = load_sources()
+    result = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"count": args.count, "sizes": args.sizes, "workers": args.workers,
+                   "repeats": args.repeats, "seed": args.seed, "render": args.render},
+        "corpora": {},
+    }
+    for size in args.sizes:
+        width, height = map(int, size.split("x"))
+        folder = os.path.join(workdir, size)
+        start = time.perf_counter()
+        images = make_corpus(folder, args.count, size=(width, height), seed=args.seed, sources=sources)
+        print(f"\n{size}: {len(images)} synthetic images in {time.perf_counter() - start:.1f} s")
+
+        # Stage timings of the two extraction paths (header-only and full PIL)
+        stages = {}
+        for label, header_only in (("header", True), ("pil", False)):
+            stages[label] = time_stages(images, os.path.join(workdir, "out-stages"), header_only,
+                                        features=True, similarity=True, render=args.render)
+            total = stages[label]["process_image"]["wall_s"]
+            print(f"  stages ({label:6s}): process_image p50 {total['p50'] * 1e3:7.2f} ms,"
+                  f" p95 {total['p95'] * 1e3:7.2f} ms")
+
+        # End-to-end throughput of the process pool at each worker count
+        batch = []
+        for workers in args.workers:
+            entry = time_batch(images, os.path.join(workdir, "out-batch"), workers, args.repeats,
+                               args.render, features=True)
+            batch.append(entry)
+            print(f"  batch  {workers:2d} workers: {entry['files_per_s']:8.1f} files/s,"
+                  f" {entry['mb_per_s']:7.1f} MB/s")
+
+        result["corpora"][size] = {"files": len(images),
+                                   "bytes": sum(os.path.getsize(image) for image in images),
+                                   "stages": stages, "batch": batch}
+    return result
+
+
+def compare(old, new):
+    # Print new/old ratios of the stage p50 times and of the batch throughput
+    print(f"\nComparison {old.get('commit')} -> {new.get('commit')}  (stage p50 ratio < 1 and files/s ratio > 1 are faster)")
+    for size, corpus in new["corpora"].items():
+        previous = old.get("corpora", {}).get(size)
+        if previous is None:
+            continue
+        print(f"\n{size}")
+        for label, stages in corpus["stages"].items():
+            for name, entry in sorted(stages.items()):
+                before = previous["stages"].get(label, {}).get(name)
+                if before and before["wall_s"]["p50"] > 0:
+                    ratio = entry["wall_s"]["p50"] / before["wall_s"]["p50"]
+                    print(f"  {label:6s} {name:40s} p50 x{ratio:5.2f}")
+        throughput = {entry["workers"]: entry["files_per_s"] for entry in previous["batch"]}
+        for entry in corpus["batch"]:
+            if throughput.get(entry["workers"]):
+                print(f"  batch {entry['workers']:2d} workers {'':33s} files/s x"
+                      f"{entry['files_per_s'] / throughput[entry['workers']]:5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark semmeta on synthetic SEM TIFF corpora.")
+    parser.add_argument("--count", type=int, default=64, help="images per corpus (default: 64)")
+    parser.add_argument("--sizes", nargs="+", default=["1024x768", "2048x1536"],
+                        help="image resolutions WIDTHxHEIGHT (default: 1024x768 2048x1536)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4],
+                        help="worker counts for the batch throughput (default: 1 2 4)")
+    parser.add_argument("--repeats", type=int, default=3, help="batch runs per worker count, best kept (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic corpus (default: 0)")
+    parser.add_argument("--render", action="store_true", help="include the figure rendering")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results"),
+                        help="folder of the JSON results (default: benchmarks/results)")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="compare this run with a previous result")
+    args = parser.parse_args()
+
+    # The corpora and outputs live in a temporary folder, removed at the end
+    workdir = tempfile.mkdtemp(prefix="semmeta-bench-")
+    try:
+        result = run_suite(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Synthetic Zeiss-style SEM TIFFs, seeded from the real images in imgs/
+# Run from the solution folder:  python benchmarks/synthetic_corpus.py FOLDER [count] [WIDTHxHEIGHT]
+import os
+import re
+import sys
+import glob
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+# Decimal numbers in the 'Label = value unit' lines of the 34118 block
+NUMBER = re.compile(r'(?<== )(-?\d+\.\d+)')
+
+
+def vary_block(text, rng, spread=0.2):
+    """
+    Returns a copy of a tag 34118 block with every decimal value scaled by a
+    random factor in [1 - spread, 1 + spread], keeping its number of decimals,
+    so that every synthetic image has its own (but realistic) parameters.
+    """
+    def scale(match):
+        digits = match.group(1)
+        decimals = len(digits) - digits.index('.') - 1
+        return f"{float(digits) * rng.uniform(1 - spread, 1 + spread):.{decimals}f}"
+    return NUMBER.sub(scale, text)
+
+
+def load_sources(paths=None):
+    # (grey levels, palette, 34118 block) of each real image
+    sources = []
+    for path in paths or sorted(glob.glob(os.path.join("imgs", "*.tif"))):
+        with Image.open(path) as img:
+            sources.append((np.asarray(img), img.getpalette(), img.tag_v2.get(34118, "")))
+    if not sources:
+        raise SystemExit("no .tif images found in ./imgs (run from the solution folder)")
+    return sources
+
+
+def make_image(source, size, rng):
+    """
+    One synthetic image: the source pixels resampled to size (width, height),
+    randomly shifted and with detector noise added, as an 8-bit palette TIFF
+    page with a varied 34118 block.
+    """
+    pixels, palette, block = source
+    resized = np.asarray(Image.fromarray(pixels).resize(size, Image.BILINEAR), dtype=np.float32)
+    shift = rng.integers(0, min(size) // 4, size=2)
+    noisy = np.roll(resized, tuple(shift), axis=(0, 1)) + rng.normal(0, 8, resized.shape)
+    img = Image.fromarray(np.clip(noisy, 0, 254).astype(np.uint8), 'P')
+    if palette:
+        img.putpalette(palette)
+
+    # Tag 34118 is written as ASCII, like the microscope does
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    if block:
+        ifd[34118] = vary_block(block, rng)
+        ifd.tagtype[34118] = 2
+    return img, ifd
+
+
+def make_corpus(folder, count, size=(1024, 768), seed=0, sources=None):
+    """
+    Writes count synthetic SEM TIFFs of size (width, height) into folder,
+    reproducibly for a given seed. Returns the list of paths.
+    """
+    os.makedirs(folder, exist_ok=True)
+    sources = sources or load_sources()
+    rng = np.random.default_rng(seed)
+    paths = []
+    for idx in range(count):
+        img, ifd = make_image(sources[idx % len(sources)], size, rng)
+        path = os.path.join(folder, f"synthetic_{size[0]}x{size[1]}_{idx:05d}.tif")
+        img.save(path, tiffinfo=ifd)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        raise SystemExit("usage: python benchmarks/synthetic_corpus.py FOLDER [count] [WIDTHxHEIGHT]")
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    width, height = map(int, (sys.argv[3] if len(sys.argv) > 3 else "1024x768").split("x"))
+    written = make_corpus(sys.argv[1], count, size=(width, height))
+    print(f"Wrote {len(written)} images to {sys.argv[1]}")
@@ -1,69 +1,64 @@
 # Written by ahmed khalil ahmed.khalil@areasciencepark.it
 #
 import os
-import sys
+import argparse
 
 # Import SEM processing classes: metadata extractor, cleaner, and visualizer
-from semmeta import SEMMeta, CLEANER, SEMVisualizer
+from semmeta import SEMMeta, CLEANER
+from semmeta.pipeline_module import process_image, output_paths, processing_options
+from semmeta.cache_module import MetadataCache
+from semmeta.profiling_module import PROFILER
 
 # Define the main function of the script
 def main():
     # Ensure the user provides an image path as a command-line argument
-    if len(sys.argv) < 2:
-        raise SystemExit(f"usage: {sys.argv[0]} <SEM image path>")
+    parser = argparse.ArgumentParser(description="Extract, clean and visualize the metadata of a SEM image.")
+    parser.add_argument("semimage", help="SEM image path")
+    parser.add_argument("--features", action="store_true", help="add pixel statistics (PX_* fields) to the cleaned metadata")
+    parser.add_argument("--force", action="store_true", help="re-process the image even if it is unchanged")
+    parser.add_argument("--profile", nargs="?", const=os.path.join("output", "profile.json"), default=None,
+                        metavar="REPORT", help="record per-stage time, I/O and peak memory as JSON (default: output/profile.json)")
+    parser.add_argument("--cprofile", default=None, metavar="FILE", help="with --profile, also dump cProfile statistics to FILE")
+    args = parser.parse_args()
 
     # Get the SEM image path from command-line arguments
-    semimage = sys.argv[1]
-
-    # Extract the image name (without extension) for output naming
-    image_name = os.path.splitext(os.path.basename(semimage))[0]
-
-    # Create the output directory if it doesn't exist
-    os.makedirs("output", exist_ok=True)
+    semimage = args.semimage
 
     # Check if the file exists and has a supported SEM extension
     if os.path.isfile(semimage) and semimage.endswith(SEMMeta.semext):
         print(f"\nProcessing SEM IMAGE:", semimage)
 
-        # Attempt to open and validate the SEM image
-        img = SEMMeta.OpenCheckImage(semimage)
-
-        if img:
-            print("Good image for processing", semimage)
-
-            # Extract raw EXIF metadata and tag identifiers
-            image_metadata, image_tags = SEMMeta.ImageMetadata(img)
-            exif_keys, exif_number = SEMMeta.SEMEXIF
-            found_exif_metadata, none_exif_metadata = SEMMeta.GetExifMetadata(img, exif_keys, exif_number)
-
-            # Merge found and missing EXIF metadata into a dictionary
-            allexif_metadict = SEMMeta.ExifMetaDict(found_exif_metadata, none_exif_metadata)
-
-            # Extract instrument-specific metadata (e.g., from filename or headers)
-            instrument_metadata = SEMMeta.GetInsMetadata
-            instrument_meta_dict = SEMMeta.InsMetaDict(instrument_metadata)
-
-            # Merge EXIF and instrument metadata into a single dictionary
-            SEM_FULLMD_Dict = {**allexif_metadict, **instrument_meta_dict}
-
-            # Define output paths for raw and cleaned metadata JSON files
-            output_path_raw = os.path.join("output", f"{image_name}_raw.json")
-            output_path_cleaned = os.path.join("output", f"{image_name}_cleaned.json")
-
-            # Save raw metadata to JSON
-            SEMMeta.WriteSEMJson(output_path_raw, SEM_FULLMD_Dict)
-
-            # Clean the raw metadata and save the cleaned version
-            cleaned_data = CLEANER.process(output_path_raw)
-            CLEANER.save_cleaned(output_path_cleaned)
-
-            # Visualize the SEM image alongside its cleaned metadata table
-            visualizer = SEMVisualizer(json_path=output_path_cleaned, image_path=semimage)
-            visualizer.show_image_with_table()
-
-        else:
+        # Skip images that did not change since the last run
+        cache = MetadataCache(os.path.join("output", ".semmeta_cache.json"))
+        options = processing_options(features=args.features)
+        if not args.force and cache.is_fresh(semimage, options=options):
+            print("Unchanged since last run, outputs are up to date (use --force to redo)")
+            return
+
+        # Optional per-stage profiling (a no-op otherwise)
+        if args.profile:
+            PROFILER.enable(memory=True, cprofile=args.cprofile is not None)
+
+        try:
+            # Run extract -> raw JSON -> clean -> visualize on the image
+            process_image(semimage, output_dir="output", semmeta=SEMMeta, cleaner=CLEANER,
+                          features=args.features)
+
+            # Remember the image and its outputs for the next run
+            cache.update(semimage, output_paths(semimage, "output"), options=options)
+            cache.save()
+        except ValueError:
             # Handle case where image could not be opened or validated
             print("Bad image for processing", semimage)
+
+        # Save the profiling report (and the cProfile statistics)
+        if args.profile:
+            PROFILER.disable()
+            PROFILER.print_summary()
+            PROFILER.write_report(args.profile)
+            if args.cprofile:
+                PROFILER.dump_cprofile(args.cprofile)
+            print("Profile report:", args.profile)
     else:
         # Handle case where file is missing or has an unsupported extension
         print("Invalid image path or unsupported format:", semimage)
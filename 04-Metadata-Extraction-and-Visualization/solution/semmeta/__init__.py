@@ -8,10 +8,31 @@
 from .metadata_extractor_module import SEMMetaData
 from .json_cleaner_module import JsonCleaner
 from .visualizer_module import SEMVisualizer
+from .tiff_header_module import TiffHeaderReader
+from .pipeline_module import process_image, iter_metadata, export_ndjson
+from .batch_module import find_images, run_batch
+from .cache_module import MetadataCache
+from .json_writer_module import BackgroundJsonWriter
+from .catalog_module import SEMCatalog
+from .value_parser_module import ValueParser, PARSER
+from .render_module import FigureRenderer, render_many
+from .preview_module import ImagePyramid, load_preview
+from .ndjson_module import NDJSONWriter, iter_ndjson, compact_ndjson
+from .pixel_features_module import image_features, pixel_features
+from .similarity_module import SimilarityIndex, perceptual_hash
+from .watch_module import FolderWatcher, IngestDaemon
+from .worker_module import WorkerPool
 
 # Instantiate reusable objects (optional)
 SEMMeta = SEMMetaData()
 CLEANER = JsonCleaner()
 
 # Allow users to cleanly import these classes and objects directly
-__all__ = ['SEMMetaData', 'JsonCleaner', 'SEMVisualizer', 'SEMMeta', 'CLEANER']
+__all__ = ['SEMMetaData', 'JsonCleaner', 'SEMVisualizer', 'TiffHeaderReader',
+           'process_image', 'iter_metadata', 'export_ndjson', 'find_images',
+           'run_batch', 'MetadataCache',
+           'BackgroundJsonWriter', 'SEMCatalog', 'ValueParser', 'PARSER',
+           'FigureRenderer', 'render_many', 'ImagePyramid', 'load_preview',
+           'NDJSONWriter', 'iter_ndjson', 'compact_ndjson', 'image_features', 'pixel_features',
+           'SimilarityIndex', 'perceptual_hash', 'FolderWatcher', 'IngestDaemon', 'WorkerPool',
+           'SEMMeta', 'CLEANER']
@@ -0,0 +1,243 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for file discovery (os, glob), timing and error reporting
+import os
+import glob
+import time
+import traceback
+from collections import deque
+
+# Import the process pool (surviving worker crashes) used to spread images over several workers
+from .worker_module import WorkerPool
+
+# Import the SEM processing classes and the single-image pipeline
+from .metadata_extractor_module import SEMMetaData
+from .json_cleaner_module import JsonCleaner
+from .pipeline_module import process_image, output_paths, processing_options
+from .json_writer_module import BackgroundJsonWriter
+from .render_module import FigureRenderer
+from .profiling_module import PROFILER
+
+
+# Per-process objects, created once in each worker by init_worker
+# (the package-level SEMMeta/CLEANER singletons are never shared across workers)
+_WORKER = {}
+
+
+def find_images(paths, semext=SEMMetaData().semext):
+    """
+    Expands directories (recursively), glob patterns and plain files
+    into a sorted list of unique image paths with a supported extension.
+    """
+    found = set()
+    for path in paths:
+        # Directory: walk the whole tree
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.update(os.path.join(root, name) for name in files if name.endswith(semext))
+        # Glob pattern: '**' matches nested folders
+        elif glob.has_magic(path):
+            found.update(p for p in glob.glob(path, recursive=True)
+                         if os.path.isfile(p) and p.endswith(semext))
+        # Single file
+        elif os.path.isfile(path) and path.endswith(semext):
+            found.add(path)
+    return sorted(found)
+
+
+def init_worker(render, thumbnail, pyramid_dir, profile, memory=False):
+    """
+    Process pool initializer of the batch driver and the watch daemon:
+    sets up the per-worker objects used by run_one.
+    """
+    # Each worker owns its extractor and cleaner, so no state leaks between processes
+    _WORKER['semmeta'] = SEMMetaData()
+    _WORKER['cleaner'] = JsonCleaner()
+
+    # JSON files are written by a background thread while the worker goes on
+    _WORKER['writer'] = BackgroundJsonWriter()
+
+    # Workers never open windows: one headless figure (Agg canvas) reused for every image
+    _WORKER['renderer'] = FigureRenderer(thumbnail=thumbnail, pyramid_dir=pyramid_dir) if render else None
+
+    # Stage timings (and peak memory, if asked) are recorded in the worker and sent back with each result
+    if profile:
+        PROFILER.enable(memory=memory)
+
+
+def run_one(job):
+    """
+    Processes one image inside a worker set up by init_worker. job is
+    (image, output_dir, header_only, render, write_raw, return_data, features, similarity).
+    Returns (image, size in bytes, error message or None, cleaned metadata or None,
+    stage timings or None).
+    """
+    image, output_dir, header_only, render, write_raw, return_data, features, similarity = job
+    writer = _WORKER['writer']
+    try:
+        size = os.path.getsize(image)
+        cleaned_data = process_image(image, output_dir=output_dir,
+                      semmeta=_WORKER['semmeta'], cleaner=_WORKER['cleaner'],
+                      header_only=header_only, render=render, show=False,
+                      write_raw=write_raw, writer=writer, renderer=_WORKER['renderer'],
+                      features=features, similarity=similarity, unique_names=True)
+
+        # The JSON writes overlap with cleaning and rendering; wait for them
+        # before reporting success (workers exit without running cleanup hooks)
+        writer.flush()
+
+        # Send the cleaned metadata back only when the parent needs it (catalog)
+        return (image, size, None, cleaned_data if return_data else None,
+                PROFILER.drain() if PROFILER.enabled else None)
+    except Exception as e:
+        # Report the failure and keep going with the rest of the batch
+        return (image, 0, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}", None,
+                PROFILER.drain() if PROFILER.enabled else None)
+
+
+def _run_chunk(jobs):
+    # Several images per round trip to the worker (fewer, larger messages)
+    return [run_one(job) for job in jobs]
+
+
+def expected_outputs(image, output_dir, render, write_raw):
+    """
+    Files a successful run_one writes for an image with these options
+    (named per source path: see output_paths(unique=True)).
+    """
+    raw, cleaned, png = output_paths(image, output_dir, unique=True)
+    return [raw] * write_raw + [cleaned] + [png] * render
+
+
+def run_batch(images, output_dir="output", workers=None, chunksize=8,
+              header_only=True, render=False, verbose=True, cache=None, write_raw=True,
+              catalog=None, catalog_batch=256, thumbnail=None, pyramid_dir=None, ndjson=None,
+              features=False, index=None, profiler=None, force=False):
+    """
+    Runs the pipeline over a list of images with a process pool.
+    Outputs are named <name>-<hash of the image path>_cleaned.json (and
+    _raw.json, .png), so same-named images of different folders do not clash.
+    With a MetadataCache, unchanged images are skipped and the cache is
+    updated and saved at the end of the run (also when it is interrupted);
+    force=True processes every given image again (the cache entries of
+    other images are kept).
+    Images are sent to the workers chunksize at a time and their results are
+    stored as they finish. A worker that dies (killed, or crashed by a
+    corrupt file) does not stop the run: the images it was processing are
+    retried, and the one crashing the worker on its own is reported as failed.
+    With a SEMCatalog, cleaned metadata is appended in batches of catalog_batch rows.
+    With an NDJSONWriter, each cleaned record is appended as one line as it arrives.
+    With features=True, the pixel statistics (PX_* fields) are added to the cleaned metadata.
+    With a SimilarityIndex, the perceptual hash of each image is added to it
+    (and to the cleaned metadata as PX_DHASH); the index is saved at the end.
+    With a Profiler, the stage timings of all workers are merged into it
+    (with their peak memory if the Profiler was created with memory=True).
+    With render=True and thumbnail=<size>, the PNG is a thumbnail of the image only;
+    with pyramid_dir, the images are drawn from image pyramids cached there.
+    Returns a summary dictionary with counts, failures and throughput.
+    """
+    # Incremental run: forget deleted files and keep only new or modified images
+    # (or images missing one of the outputs requested for this run)
+    signatures = {}
+    options = processing_options(header_only, render, thumbnail, features)
+    if cache is not None:
+        # Deleted images also leave the catalog and the similarity index
+        for deleted in cache.prune():
+            if catalog is not None:
+                catalog.remove(deleted)
+            if index is not None:
+                index.remove(deleted)
+
+        # Images processed before the index was enabled are redone once
+        images = [image for image in images
+                  if force or not cache.is_fresh(image, expected_outputs(image, output_dir, render, write_raw), options)
+                  or (index is not None and image not in index)]
+        signatures = {image: cache.signature(image) for image in images}
+
+    return_data = catalog is not None or ndjson is not None or index is not None
+    jobs = [(image, output_dir, header_only, render, write_raw, return_data, features, index is not None)
+            for image in images]
+    failures = []
+    pending = []
+    done, nbytes = 0, 0
+
+    def store(result):
+        nonlocal done, nbytes, pending
+        image, size, error, cleaned_data, samples = result
+        if samples:
+            profiler.merge(samples)
+        if error is None:
+            done += 1
+            nbytes += size
+
+            # Batched catalog appends: one transaction per catalog_batch images
+            if catalog is not None:
+                pending.append((image, cleaned_data))
+                if len(pending) >= catalog_batch:
+                    catalog.append_many(pending)
+                    pending = []
+
+            # Streaming export: the record is written and then dropped
+            if ndjson is not None:
+                ndjson.write({"image": image, **cleaned_data})
+
+            # Incremental similarity index: one hash per processed image
+            if index is not None:
+                index.add(image, cleaned_data["PX_DHASH"])
+            if cache is not None:
+                cache.update(image, expected_outputs(image, output_dir, render, write_raw),
+                             signatures[image], options)
+        else:
+            failures.append((image, error))
+            if verbose:
+                print("[ERROR]", image, "->", error.splitlines()[0])
+
+    start = time.perf_counter()
+    chunks = deque(jobs[idx:idx + chunksize] for idx in range(0, len(jobs), chunksize))
+    try:
+        with WorkerPool(workers, init_worker, (render, thumbnail, pyramid_dir, profiler is not None,
+                                                profiler is not None and profiler.memory), verbose=verbose) as pool:
+            while chunks or pool.busy:
+                # Two chunks per worker keep the pool busy while results are being stored
+                while chunks and pool.ready(2 * pool.workers):
+                    chunk = chunks.popleft()
+                    pool.submit(_run_chunk, chunk, chunk)
+                for chunk, results in pool.results():
+                    if results is not None:
+                        for result in results:
+                            store(result)
+                    elif len(chunk) > 1:
+                        # The chunk crashed its worker: each image goes again on its own
+                        chunks.extendleft([job] for job in reversed(chunk))
+                    else:
+                        store((chunk[0][0], 0, "worker process crashed", None, None))
+    finally:
+        # Whatever was stored so far is kept, even if the run is interrupted
+        if catalog is not None and pending:
+            catalog.append_many(pending)
+
+        # Persist the cache so the next run can skip what was done here
+        if cache is not None:
+            cache.save()
+        if index is not None:
+            index.save()
+    elapsed = time.perf_counter() - start
+
+    # End-of-run throughput summary
+    summary = {
+        "files": len(images),
+        "processed": done,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "files_per_s": done / elapsed if elapsed > 0 else 0.0,
+        "mb_per_s": nbytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+    }
+    if cache is not None:
+        summary["cache"] = cache.report()
+    if verbose:
+        if cache is not None:
+            print("\nCache: {hits} unchanged (skipped), {misses} new or modified, {removed} deleted".format(**summary["cache"]))
+        print(f"\nProcessed {done}/{len(images)} images ({len(failures)} failed) in {elapsed:.2f} s")
+        print(f"Throughput: {summary['files_per_s']:.1f} files/s, {summary['mb_per_s']:.1f} MB/s")
+    return summary
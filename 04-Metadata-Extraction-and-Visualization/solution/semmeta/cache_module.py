@@ -0,0 +1,125 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for file system access, JSON persistence and content hashing
+import os
+import json
+import hashlib
+
+
+def path_key(path):
+    # Short BLAKE2b of an absolute path: tells apart images that share a name in different folders
+    return hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+
+
+# Class for remembering which images were already processed (incremental runs)
+class MetadataCache:
+    def __init__(self, cache_path, use_hash=False):
+        # Store the path of the JSON file holding the cache
+        self.cache_path = cache_path
+
+        # Optionally confirm changes with a content hash (slower, survives touch/copy)
+        self.use_hash = use_hash
+
+        # Cache entries: absolute image path -> {size, mtime_ns, hash, outputs, options}
+        self.entries = {}
+
+        # Counters reported at the end of a run
+        self.hits, self.misses, self.removed = 0, 0, 0
+
+        # Load the previous state if the cache file exists
+        self.load()
+
+
+    def load(self):
+        # Read the cache file, starting empty if it is missing or unreadable
+        try:
+            with open(self.cache_path, 'r') as f:
+                self.entries = json.load(f)
+        except (IOError, ValueError):
+            self.entries = {}
+
+
+    def save(self):
+        # Write to a temporary file first, then replace, so a crash never corrupts the cache
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+    @staticmethod
+    def content_hash(image, chunk_size=1 << 20):
+        # BLAKE2b of the whole file, read in 1 MB chunks
+        digest = hashlib.blake2b(digest_size=16)
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+    def signature(self, image):
+        """
+        Returns the cache key fields of an image: size, mtime (ns)
+        and the content hash when use_hash is enabled.
+        """
+        stat = os.stat(image)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": self.content_hash(image) if self.use_hash else None,
+        }
+
+
+    def is_fresh(self, image, outputs=(), options=None):
+        """
+        Checks whether an image is unchanged since it was last processed
+        and its recorded output files (plus any in outputs) still exist.
+        With options (see pipeline_module.processing_options), the image must
+        also have been processed with the same options.
+        Updates the hit/miss counters.
+        """
+        entry = self.entries.get(os.path.abspath(image))
+        fresh = False
+        if options is not None and entry is not None and entry.get("options") != options:
+            # Processed with other options (e.g. without --features): the outputs are outdated
+            entry = None
+        if entry is not None and all(os.path.exists(p) for p in [*entry.get("outputs", []), *outputs]):
+            stat = os.stat(image)
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+                fresh = True
+            elif self.use_hash and entry.get("hash") and stat.st_size == entry["size"]:
+                # mtime changed (copy, touch): the content hash decides
+                fresh = self.content_hash(image) == entry["hash"]
+                if fresh:
+                    entry["mtime_ns"] = stat.st_mtime_ns
+
+        # Count the result for the end-of-run report
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh
+
+
+    def update(self, image, outputs=(), signature=None, options=None):
+        # Record an image as processed, with the files it produced and the options used
+        entry = dict(signature if signature is not None else self.signature(image))
+        entry["outputs"] = list(outputs)
+        if options is not None:
+            entry["options"] = options
+        self.entries[os.path.abspath(image)] = entry
+
+
+    def prune(self):
+        # Drop entries whose source image no longer exists
+        deleted = [path for path in self.entries if not os.path.exists(path)]
+        for path in deleted:
+            del self.entries[path]
+        self.removed += len(deleted)
+        return deleted
+
+
+    def report(self):
+        # Return the counters as a dictionary
+        return {"hits": self.hits, "misses": self.misses, "removed": self.removed}
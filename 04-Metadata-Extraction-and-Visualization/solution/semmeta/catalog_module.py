@@ -0,0 +1,210 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for file paths and the SQLite database
+import os
+import json
+import sqlite3
+
+# Import the shared value parser for values that are still strings
+from .value_parser_module import PARSER
+
+# Comparison operators accepted by SEMCatalog.query
+OPERATORS = ('<', '<=', '>', '>=', '=', '!=', 'like')
+
+
+def split_value(value, key=None):
+    """
+    Splits a cleaned metadata value into (number, SI unit, text).
+    {"value": 0.003198, "unit": "m"} and 'WD = 3.198 mm' give (0.003198, 'm', None),
+    'Signal B = InLens' and 'InLens' give (None, None, 'InLens').
+    """
+    # Cleaned numbers with a unit
+    if isinstance(value, dict) and "value" in value:
+        return float(value["value"]), value.get("unit"), None
+
+    # Plain numbers (EXIF fields) have no unit
+    if value is None:
+        return None, None, None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value), None, None
+
+    # Lists (e.g. rationals) and other types are kept as text
+    if not isinstance(value, str):
+        return None, None, str(value)
+
+    # Strings (raw or older cleaned files) go through the shared parser
+    parsed = PARSER.parse(value, key)
+    if isinstance(parsed.value, float):
+        return parsed.value, parsed.unit, None
+    return None, None, parsed.value
+
+
+# Class for storing cleaned metadata of many images in one queryable SQLite catalog
+class SEMCatalog:
+    # Fields indexed by default: the visualizer fields plus common query fields
+    COMMON_KEYS = (
+        "AP_WD", "AP_BEAM_TIME", "AP_IMAGE_PIXEL_SIZE", "AP_HOLDER_HEIGHT",
+        "AP_BEAM_CURRENT", "AP_HOLDER_DIAMETER", "AP_MAG", "AP_ACTUALKV",
+        "AP_PROBE_CURRENT", "DP_IMPLIED_DETECTOR", "DP_DETECTOR_TYPE", "DP_SEM",
+    )
+
+    # SQLite allows 2000 columns per table; keys beyond this go to the 'extra' JSON column
+    MAX_COLUMNS = 1900
+
+    def __init__(self, db_path, index_keys=COMMON_KEYS):
+        # Store the catalog path and open the database
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+
+        # Write-ahead log: appends do not block readers and need fewer fsyncs
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        # Keys that get an index as soon as their column exists
+        self.index_keys = set(index_keys)
+
+        # Create the table on first use and read the existing columns
+        self.create_table()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        # Commit pending rows and close the database
+        self.connection.commit()
+        self.connection.close()
+
+
+    def create_table(self):
+        """
+        One row per image: path, name, an 'extra' JSON column, and for each
+        metadata key a column without type affinity ("AP_WD", numbers kept as
+        REAL and text as TEXT, whatever the first value was) plus a unit column
+        ("AP_WD:unit" TEXT). Columns are added as new keys appear.
+        """
+        self.connection.execute("CREATE TABLE IF NOT EXISTS images ("
+                                "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, "
+                                "name TEXT NOT NULL, extra TEXT)")
+        self.connection.commit()
+        self.columns = {row[1] for row in self.connection.execute("PRAGMA table_info(images)")}
+
+
+    @staticmethod
+    def _quote(name):
+        # Quote a column name (keys are used as column names)
+        return '"' + name.replace('"', '""') + '"'
+
+
+    def _add_column(self, key):
+        # New value column and its unit column, indexed if it is a common key.
+        # No declared type: the first value of a key (None, 'N/A') must not turn later numbers into text
+        if len(self.columns) + 2 > self.MAX_COLUMNS:
+            return False
+        self.connection.execute(f"ALTER TABLE images ADD COLUMN {self._quote(key)}")
+        self.connection.execute(f"ALTER TABLE images ADD COLUMN {self._quote(key + ':unit')} TEXT")
+        self.columns.update((key, key + ':unit'))
+        if key in self.index_keys:
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {self._quote('idx_' + key)} ON images ({self._quote(key)})")
+        return True
+
+
+    def _row(self, image, cleaned_data):
+        # Convert one cleaned metadata dict into {column: value}
+        row = {"path": os.path.abspath(image), "name": os.path.splitext(os.path.basename(image))[0]}
+        extra = {}
+        for key, value in cleaned_data.items():
+            number, unit, text = split_value(value, key)
+            if key not in self.columns and not self._add_column(key):
+                extra[key] = value
+                continue
+            row[key] = number if number is not None else text
+            if key + ':unit' in self.columns:
+                row[key + ':unit'] = unit
+        row["extra"] = json.dumps(extra) if extra else None
+        return row
+
+
+    def append(self, image, cleaned_data):
+        # Add (or replace) a single image
+        self.append_many([(image, cleaned_data)])
+
+
+    def append_many(self, records):
+        """
+        Adds (or replaces) many (image path, cleaned metadata dict) records
+        in a single transaction, one executemany per set of columns.
+        """
+        with self.connection:
+            groups = {}
+            for image, cleaned_data in records:
+                row = self._row(image, cleaned_data)
+                groups.setdefault(tuple(row), []).append(tuple(row.values()))
+
+            # Re-processed images replace their previous row (INSERT OR REPLACE on path)
+            for columns, rows in groups.items():
+                names = ", ".join(self._quote(column) for column in columns)
+                marks = ", ".join("?" * len(columns))
+                self.connection.executemany(f"INSERT OR REPLACE INTO images ({names}) VALUES ({marks})", rows)
+
+
+    def remove(self, image):
+        # Drop an image from the catalog
+        with self.connection:
+            self.connection.execute("DELETE FROM images WHERE path = ?", (os.path.abspath(image),))
+
+
+    def query(self, *conditions, fields=()):
+        """
+        Returns the images matching all conditions, given as (key, operator, value):
+            catalog.query(("AP_WD", "<", 4e-3), ("DP_IMPLIED_DETECTOR", "=", "InLens"),
+                          fields=("AP_WD", "AP_BEAM_CURRENT"))
+        Numbers are in SI units (AP_WD in m). Returns a list of dicts with the
+        image path and the requested fields, numbers as (number, unit).
+        """
+        where, params = [], []
+        for key, operator, value in conditions:
+            if operator not in OPERATORS:
+                raise ValueError(f"unsupported operator: {operator}")
+
+            # A key that never appeared cannot match anything
+            if key not in self.columns:
+                return []
+            # Numbers only compare with numbers (SQLite sorts any text after every number)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                where.append(f"({self._quote(key)} {operator.upper()} ? AND typeof({self._quote(key)}) = 'real')")
+            else:
+                where.append(f"{self._quote(key)} {operator.upper()} ?")
+            params.append(value)
+
+        # Select the path and the requested fields (with units for numeric fields)
+        selected = ["path"]
+        for key in fields:
+            selected.append(self._quote(key) if key in self.columns else "NULL")
+            selected.append(self._quote(key + ':unit') if key + ':unit' in self.columns else "NULL")
+
+        sql = f"SELECT {', '.join(selected)} FROM images"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self.connection.execute(sql + " ORDER BY path", params).fetchall()
+
+        # Format the rows: (number, unit) for numeric fields, plain value otherwise
+        results = []
+        for row in rows:
+            record = {"path": row[0]}
+            for idx, key in enumerate(fields):
+                value, unit = row[1 + 2 * idx], row[2 + 2 * idx]
+                record[key] = (value, unit) if isinstance(value, float) else value
+            results.append(record)
+        return results
+
+
+    def __len__(self):
+        # Number of images in the catalog
+        return self.connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
@@ -0,0 +1,121 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import regular expressions for finding the first key line of the block
+import re
+
+
+# First key line ('AP_WD', 'DP_DETECTOR_TYPE', 'SV_USER_NAME', ...) of the block and,
+# on the line before it, the declared number of entries. The numeric header lines at
+# the top of the block never match, so the key/value section is found from the
+# content, not from a fixed line offset.
+FIRST_KEY_LINE = re.compile(r'^(?:(\d+)\r?\n)?([A-Z][A-Z0-9]*_\w+)\r?$', re.M)
+
+# Lines are split this many characters at a time (cut at a line end): the whole
+# block is never split into one list, and no pair waits for the end of the block
+CHUNK_SIZE = 8192
+
+
+def _newline(text):
+    # Lines end with CR LF (str.splitlines would also split inside values, e.g. on \x1c or \x85)
+    return '\r\n' if '\r\n' in text else '\n'
+
+
+def _section(text):
+    """
+    Finds the key/value section of the block.
+    Returns (offset of the first key line, declared entry count or None),
+    or (None, None) if the block holds no key.
+    """
+    match = FIRST_KEY_LINE.search(text)
+    if match is None:
+        return None, None
+    return match.start(2), int(match.group(1)) if match.group(1) else None
+
+
+def _section_stop(text, newline, start, count):
+    # End offset of the declared entries (the whole text when no count is declared)
+    if count is None:
+        return len(text)
+    lines = text.count(newline, start) + 1
+    if lines < 2 * count:
+        raise ValueError(f"{count} entries declared, {lines // 2} found")
+
+    # Usual case: the entries run to the end of the block (maybe with a final newline)
+    if lines == 2 * count or (lines == 2 * count + 1 and text.endswith(newline)):
+        return len(text)
+
+    # Something follows the entries: skip 2 * count lines to find where they end
+    pos = start
+    for _ in range(2 * count):
+        pos = text.find(newline, pos) + len(newline)
+    return pos - len(newline)
+
+
+def iter_instrument_block(text, keys=None):
+    """
+    Yields (key, value) pairs from the Zeiss-style tag 34118 block, starting
+    at the first key line instead of a fixed line offset. The lines are split
+    a few kilobytes at a time, so pairs come out as the block is read.
+    The line just before the first key declares the number of entries: at
+    most that many pairs are read, and fewer entries or a value where a key
+    is expected raise ValueError. With keys, only those keys are looked up
+    (in the given order, within the declared entries) and the rest of the
+    block is never parsed.
+    """
+    if not text:
+        return
+    newline = _newline(text)
+    start, count = _section(text)
+    if start is None:
+        return
+
+    # Selected keys: jump straight to each key line
+    if keys is not None:
+        stop = _section_stop(text, newline, start, count)
+        for key in keys:
+            value = _find_value(text, key, newline, start, stop)
+            if value is not None:
+                yield key, value
+        return
+
+    # Whole block: split a chunk, pair its lines (a key left without its value waits for the next chunk)
+    pos, size, found, carry = start, len(text), 0, []
+    while pos < size and (count is None or found < count):
+        end = text.find(newline, min(pos + CHUNK_SIZE, size))
+        end = size if end < 0 else end
+        lines = text[pos:end].split(newline)
+        if carry:
+            lines.insert(0, carry.pop())
+        if len(lines) % 2:
+            carry.append(lines.pop())
+        pos = end + len(newline)
+
+        # Never more pairs than declared. Key lines are upper case without spaces, values
+        # ('Label = value') are not: one check of the joined keys before their pairs are given out
+        chunk_keys = lines[0::2] if count is None else lines[0:2 * (count - found):2]
+        joined = '\n'.join(chunk_keys)
+        if chunk_keys and (' ' in joined or not joined.isupper()):
+            bad = next(idx for idx, key in enumerate(chunk_keys) if ' ' in key or not key.isupper())
+            raise ValueError(f"entry {found + bad}: {chunk_keys[bad]!r} is not a key")
+        yield from zip(chunk_keys, lines[1::2])
+        found += len(chunk_keys)
+
+    # A block cut short has fewer entries than it declares
+    if count is not None and found < count:
+        raise ValueError(f"{count} entries declared, {found} found")
+
+
+def _find_value(text, key, newline, start, stop):
+    # Locate '<key>' as a whole line among the entries and return the line after it (None if absent)
+    needle = key + newline
+    if text.startswith(needle, start):
+        pos = start + len(needle)
+    else:
+        pos = text.find(newline + needle, start, stop)
+        if pos < 0:
+            return None
+        pos += len(newline) + len(needle)
+
+    # The value runs to the end of its line (and never past the declared entries)
+    end = text.find(newline, pos, stop)
+    return text[pos:stop] if end < 0 else text[pos:end]
@@ -3,37 +3,47 @@
 # Import JSON module for reading and writing metadata files
 import json
 
-# Import regular expressions module for parsing numeric values and units
-import re
+# Import the shared value parser (numbers, SI units, 'Label = value' strings)
+from .value_parser_module import PARSER
+
+# Import the NDJSON reader and writer for the streaming mode
+from .ndjson_module import iter_ndjson, NDJSONWriter
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
 
 
 # Class for cleaning and formatting SEM metadata from JSON files
 class JsonCleaner:
-    def __init__(self, cleaned_data={}):                       
+    def __init__(self, cleaned_data=None):                       
         # Initialize the cleaned_data dictionary to store processed metadata
-        self.cleaned_data = cleaned_data
+        # (a new dict per instance, never a shared default)
+        self.cleaned_data = cleaned_data if cleaned_data is not None else {}
 
 
+    @profiled
     def load_json(self, jsfile):
         # Open the JSON file and load its contents into a Python dictionary
         with open(jsfile, 'r') as f:
             return json.load(f)
 
 
-    def clean_value(self, value):
+    def clean_value(self, value, key=None):
         """
-        Extracts numeric value and unit from strings, e.g., 'AP_WD =  3.18 mm'
+        Parses strings such as 'WD = 3.198 mm' into typed values:
+            - {"value": 0.003198, "unit": "m"} for numbers with a unit (SI)
+            - a float for plain numbers, the text for everything else
         """
         
-        # Use regex to extract a numeric value and its unit from the string
-        match = re.search(r'([\d.]+)\s*([a-zA-Zμ]+)', value)
+        # Use the shared parser (precompiled patterns, per-key cache)
+        parsed = PARSER.parse(value, key)
         
-        # If a match is found, return the formatted value and unit
-        if match:
-            return match.group(1) + ' ' + match.group(2)
+        # Numbers with a unit keep the SI unit next to the value
+        if isinstance(parsed.value, float) and parsed.unit is not None:
+            return {"value": parsed.value, "unit": parsed.unit}
         
-        # If no match is found, return the original value unchanged
-        return value
+        # Plain numbers and text values
+        return parsed.value
 
 
     def clean_dict(self, data):
@@ -52,9 +62,9 @@ class JsonCleaner:
             if value is None:
                 continue
             
-            # If the value is a string, clean it using regex
+            # If the value is a string, parse it into a typed value
             if isinstance(value, str):
-                cleaned[key] = self.clean_value(value)
+                cleaned[key] = self.clean_value(value, key)
             
             # Otherwise, keep the value as-is
             else:
@@ -68,6 +78,16 @@ class JsonCleaner:
         # Load raw metadata from the JSON file
         raw_data = self.load_json(jsfile)
         
+        # Clean the raw metadata, store and return the result
+        return self.process_dict(raw_data)
+
+
+    @profiled
+    def process_dict(self, raw_data):
+        """
+        Cleans an in-memory metadata dictionary (e.g. straight from
+        SEMMetaData) without going through a raw JSON file.
+        """
         # Clean the raw metadata and store the result
         self.cleaned_data = self.clean_dict(raw_data)
         
@@ -75,6 +95,30 @@ class JsonCleaner:
         return self.cleaned_data
 
 
+    def clean_stream(self, records, keep=("image",)):
+        """
+        Streaming mode: lazily yields the cleaned version of each metadata
+        dictionary of an iterator (e.g. iter_ndjson or pipeline.iter_metadata).
+        Keys in keep (the image path) are passed through unparsed.
+        Nothing is stored on the instance, so memory does not grow with the stream.
+        """
+        for record in records:
+            cleaned = self.clean_dict({k: v for k, v in record.items() if k not in keep})
+            yield {**{k: record[k] for k in keep if k in record}, **cleaned}
+
+
+    def process_ndjson(self, input_path, output_path, fast=True):
+        """
+        Cleans a newline-delimited JSON file of raw metadata records into
+        another NDJSON file, one record at a time.
+        fast=True uses orjson when it is installed.
+        Returns the number of records written.
+        """
+        with NDJSONWriter(output_path, fast=fast) as sink:
+            return sink.write_many(self.clean_stream(iter_ndjson(input_path, fast=fast)))
+
+
+    @profiled
     def save_cleaned(self, output_path):
         # Save the cleaned metadata to a new JSON file with indentation
         with open(output_path, 'w') as f:        
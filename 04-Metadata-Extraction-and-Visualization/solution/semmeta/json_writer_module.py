@@ -0,0 +1,76 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import JSON for serialisation, and queue/threading for the background writer
+import json
+import queue
+import threading
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
+
+# Class for writing JSON files from a background thread, off the processing path
+class BackgroundJsonWriter:
+    def __init__(self, maxsize=64):
+        # Bounded queue of pending (path, data, json.dump options) writes
+        self.queue = queue.Queue(maxsize=maxsize)
+
+        # Errors raised while writing, reported by flush()
+        self.errors = []
+
+        # Start the writer thread (daemon, so it never blocks interpreter exit)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def _run(self):
+        # Write queued documents until the None sentinel arrives
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                path, data, options = item
+                with open(path, 'w') as f:
+                    json.dump(data, f, **options)
+            except Exception as e:
+                self.errors.append((item[0], e))
+            finally:
+                self.queue.task_done()
+
+
+    def write(self, path, data, **options):
+        """
+        Queues a JSON document to be written to path.
+        The caller must not modify data afterwards. Blocks if the queue is full.
+        """
+        self.queue.put((path, data, options))
+
+
+    @profiled
+    def flush(self):
+        """
+        Waits until every queued document is on disk.
+        Raises IOError with the first failure if any write failed.
+        """
+        self.queue.join()
+        if self.errors:
+            errors, self.errors = self.errors, []
+            path, error = errors[0]
+            raise IOError(f"could not write {path}: {error}")
+
+
+    def close(self):
+        # Finish pending writes, then stop the thread
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.flush()
@@ -11,15 +11,49 @@ from PIL import Image, ExifTags  # Image processing and metadata handling
 # Import JSON module for reading and writing metadata
 import json
 
+# Import the header-only TIFF reader (no pixel decoding)
+from .tiff_header_module import TiffHeaderReader
+
+# Import the single-pass parser of the tag 34118 instrument block
+from .instrument_block_module import iter_instrument_block
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
+
+# EXIF tag tables, built once per process by _exif_tables()
+_EXIF_TABLES = None
+
+
+def _exif_tables():
+    """
+    Builds the EXIF name/number tables from PIL's ExifTags.TAGS once
+    and returns the cached copy on every later call.
+    Returns:
+        - exif_keys (tuple): tag names
+        - exif_number (tuple): corresponding numeric tag identifiers
+        - colormap_tags (frozenset): tag numbers named 'ColorMap'
+    """
+    global _EXIF_TABLES
+    if _EXIF_TABLES is None:
+        # Reverse the PIL EXIF tag dictionary to map names to numeric keys
+        exif_dict = {k: v for v, k in ExifTags.TAGS.items()}
+        exif_keys = tuple(exif_dict)
+        exif_number = tuple(exif_dict[k] for k in exif_keys)
+        colormap_tags = frozenset(exif_dict[k] for k in exif_keys if k == "ColorMap")
+        _EXIF_TABLES = (exif_keys, exif_number, colormap_tags)
+    return _EXIF_TABLES
+
 
 # SEMMetaData Class Initialization
 class SEMMetaData:
-    def __init__(self, image_metadata={}, semext=('tif', 'TIF'), semInsTag=[34118]):
+    def __init__(self, image_metadata=None, semext=('tif', 'TIF'), semInsTag=[34118]):
         # Store accepted SEM image file extensions
         self.semext = semext 
         
         # Initialize dictionary to hold extracted image metadata
-        self.image_metadata = image_metadata
+        # (a new dict per instance, never a shared default)
+        self.image_metadata = image_metadata if image_metadata is not None else {}
         
         # Store SEM-specific EXIF tag identifiers (e.g., 34118 for instrument metadata)
         self.semInsTag = semInsTag
@@ -28,6 +62,7 @@ class SEMMetaData:
         self.image_tags = np.array([], dtype='int')
 
 
+    @profiled
     def OpenCheckImage(self, image):
         """
         Opens an image file and verifies its accessibility and format.
@@ -45,6 +80,7 @@ class SEMMetaData:
                 return False
 
 
+    @profiled
     def ImageMetadata(self, img):
         """
         Extracts raw metadata and tag identifiers including 34118 
@@ -53,8 +89,8 @@ class SEMMetaData:
         # Extract raw tag dictionary from image
         self.image_metadata = img.tag
         
-        # Convert tag keys to NumPy array for fast lookup
-        self.image_tags = np.array(self.image_metadata) 
+        # Convert tag keys to a NumPy array (membership tests use a set, see GetExifMetadata)
+        self.image_tags = np.array(list(self.image_metadata)) 
         
         # Return both raw metadata and tag identifiers
         return self.image_metadata, self.image_tags
@@ -64,34 +100,43 @@ class SEMMetaData:
     def SEMEXIF(self):
         """
         Provides access to standard EXIF tag mappings from PIL.
+        The tables are computed once per process and shared.
         
         Returns:
-            - exif_keys (list): Human-readable EXIF tag names
-            - exif_number (list): Corresponding numeric tag identifiers used in image metadata.
+            - exif_keys (tuple): Human-readable EXIF tag names
+            - exif_number (tuple): Corresponding numeric tag identifiers used in image metadata.
         """
-        # Reverse the PIL EXIF tag dictionary to map names to numeric keys
-        exif_dict = {k: v for v, k in ExifTags.TAGS.items()}
-        
-        # Extract all tag names (keys) from the reversed dictionary
-        exif_keys = [key for key in exif_dict]
-        
-        # Extract corresponding numeric identifiers for each tag name
-        exif_number = [exif_dict[k] for k in exif_keys]
-        
-        # Return both tag names and their numeric codes
+        # Return both tag names and their numeric codes (cached)
+        exif_keys, exif_number, _ = _exif_tables()
         return exif_keys, exif_number 
         
 
+    # Split EXIF tags into found and missing entries in one pass
+    def _SplitExif(self, tags, exif_keys, exif_number):
+        """
+        Walks the EXIF table once, testing membership against a hash set of
+        the tags present in the image. tags maps tag number -> value tuple.
+        """
+        # Hash set of the present tags: O(1) membership instead of an array scan
+        present = set(tags)
+        
+        found_exif_metadata, none_exif_metadata = [], []
+        for idx, word in zip(exif_number, exif_keys):
+            if idx in present:
+                found_exif_metadata.append((tags[idx], word))
+            else:
+                none_exif_metadata.append((word, None))
+        return found_exif_metadata, none_exif_metadata
+
+
     # Extract Standard EXIF Metadata from SEM Image
+    @profiled
     def GetExifMetadata(self, img, exif_keys, exif_number):
         """
         Extracts standard EXIF metadata from a SEM image.
         """
-        # Extract available EXIF metadata from image using known tag numbers
-        found_exif_metadata = [(img.tag[idx][:], word) for idx, word in zip(exif_number, exif_keys) if idx in self.image_tags]
-        
-        # Mark EXIF fields not found in the image with None
-        none_exif_metadata = [(word, None) for num, word in zip(exif_number, exif_keys) if num not in self.image_tags] 
+        # Extract available EXIF metadata, marking missing fields with None
+        found_exif_metadata, none_exif_metadata = self._SplitExif(img.tag, exif_keys, exif_number)
         
         # Return both found and missing metadata
         return found_exif_metadata, none_exif_metadata
@@ -122,49 +167,35 @@ class SEMMetaData:
         '''
         Extracts instrument-specific metadata from SEM image EXIF tag 34118.
         Returns:
-            - list: a cleaned and escaped list of instrument metadata strings.
-            - and an empty list if tag 34118 is not found.
+            - str: the raw instrument metadata block (parsed by InsMetaDict).
+            - and an empty string if tag 34118 is not found.
         ''' 
-        try:
-            # Find the value associated with EXIF tag 34118
-            pairs = [params for tag, params in self.image_metadata.items() if tag == self.semInsTag[0]]
-            
-            # Unpack the first matching entry (instrument metadata)
-            instrument_metadata, *_ = pairs[0]  
-
-            # Clean the instrument metadata by skipping the first N lines
-            random_size_tag = 35
-            instrument_metadata = [instrument_metadata][0].split("\r\n")[random_size_tag:]          
-
-        # Handle case where tag 34118 is not found
-        except IndexError:
-            instrument_metadata = []
+        # Find the value associated with EXIF tag 34118 (a one-string tuple)
+        params = self.image_metadata.get(self.semInsTag[0]) if self.image_metadata else None
         
-        # Return cleaned instrument metadata or empty list
-        return instrument_metadata
+        # Return the instrument metadata block or an empty string
+        return params[0] if params else ""
 
 
     # Parse Instrument Metadata from Tag 34118
-    def InsMetaDict(self, list):
+    @profiled
+    def InsMetaDict(self, instrument_metadata, keys=None):
         """
-        Converts a flat list of instrument metadata into a structured dictionary.
+        Converts the instrument metadata block of tag 34118 into a structured dictionary.
+        The key/value section is located from its content (AP_*/DP_*/SV_* key lines),
+        not from a fixed line offset. With keys, only those entries are extracted.
+        Also accepts the block as a list of lines.
         Returns:
-            - dict: of all the information contained in the 34118 tag  
+            - dict: of all (or the selected) information contained in the 34118 tag  
             - and an empty dictionary if parsing fails.      
         """
         try:
-            # Initialize key and value lists
-            ins_keys, ins_values = [], []
-            
-            # Separate alternating entries into keys and values
-            for idx, val in enumerate(list):
-                if idx % 2 == 0:
-                    ins_keys.append(val)
-                else:
-                    ins_values.append(val)
-
-            # Combine keys and values into a dictionary
-            instrument_meta_dict = {k: v for k, v in zip(ins_keys, ins_values)}
+            # Older callers pass the block already split into lines
+            if isinstance(instrument_metadata, (list, tuple)):
+                instrument_metadata = "\r\n".join(instrument_metadata)
+
+            # Single pass over the block with the generator parser
+            instrument_meta_dict = dict(iter_instrument_block(instrument_metadata, keys))
             
         # Handle parsing errors gracefully
         except Exception as e:            
@@ -173,9 +204,66 @@ class SEMMetaData:
         
         # Return structured instrument metadata dictionary
         return instrument_meta_dict
+
+
+    # Read a few instrument fields straight from the file header
+    def InstrumentFields(self, image, keys, use_mmap=False):
+        """
+        Returns only the requested tag 34118 entries of an image
+        (e.g. the AP_* fields shown by SEMVisualizer), reading the header
+        directly and without building the full instrument dictionary.
+        """
+        try:
+            with TiffHeaderReader(image, use_mmap=use_mmap) as reader:
+                if self.semInsTag[0] not in reader.entries:
+                    return {}
+                text, = reader.read_tag(self.semInsTag[0])
+        except (IOError, ValueError):
+            # Print error if image cannot be opened or parsed
+            print('[ERROR]', image)
+            return {}
+        return self.InsMetaDict(text, keys=keys)
         
         
+    # Header-only extraction mode (no PIL image decoding)
+    @profiled
+    def HeaderMetaDict(self, image, use_mmap=False):
+        """
+        Extracts the same dictionary as ExifMetaDict + InsMetaDict by parsing
+        the TIFF header and IFD directly, reading only the bytes behind the tags.
+        Returns:
+            - dict: merged EXIF and instrument metadata
+            - and False if the file cannot be opened or is not a TIFF.
+        """
+        # Check if image has a supported extension
+        if not image.endswith(self.semext):
+            return False
+
+        exif_keys, exif_number, colormap_tags = _exif_tables()
+
+        try:
+            with TiffHeaderReader(image, use_mmap=use_mmap) as reader:
+                # Read the first value of each tag, never touching the ColorMap data
+                self.image_metadata = reader.tag_values(skip=colormap_tags)
+        except (IOError, ValueError):
+            # Print error if image cannot be opened or parsed
+            print('[ERROR]', image)
+            return False
+
+        # Same tag identifiers array as ImageMetadata
+        self.image_tags = np.array(list(self.image_metadata))
+
+        # Build found/missing lists in the same shape as GetExifMetadata
+        found_exif_metadata, none_exif_metadata = self._SplitExif(self.image_metadata, exif_keys, exif_number)
+
+        # Merge EXIF and instrument metadata into a single dictionary
+        allexif_metadict = self.ExifMetaDict(found_exif_metadata, none_exif_metadata)
+        instrument_meta_dict = self.InsMetaDict(self.GetInsMetadata)
+        return {**allexif_metadict, **instrument_meta_dict}
+
+
     # Export SEM Metadata to JSON Format    
+    @profiled
     def WriteSEMJson(self, file, semdict):   
         """
         Open the file in write mode and serialize the metadata dictionary
@@ -0,0 +1,120 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import os for the output folder and JSON for the default (standard library) serialiser
+import os
+import json
+
+# Optional faster serialiser: orjson is used when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_line(record, fast=True):
+    """
+    Serialises one record as a compact NDJSON line (bytes, newline included),
+    with orjson if available and fast=True, else with the json module.
+    """
+    if fast and orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, separators=(',', ':'), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_ndjson(path, fast=True):
+    """
+    Yields the records of a newline-delimited JSON file one at a time
+    (blank lines are skipped), so the file is never loaded as a whole.
+    """
+    loads = orjson.loads if fast and orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def compact_ndjson(path, key="image", fast=True):
+    """
+    Rewrites an NDJSON file keeping only the last record of each key (the
+    image path by default), where that record was written: re-processed
+    images appended by incremental runs replace their older lines.
+    Two passes over the file, only the keys are held in memory; the file is
+    replaced atomically. Returns the number of records dropped.
+    """
+    loads = orjson.loads if fast and orjson is not None else json.loads
+
+    # First pass: line number of the last record of each key
+    last, total = {}, 0
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f):
+            if line.strip():
+                last[loads(line).get(key)] = number
+                total += 1
+    if len(last) == total:
+        return 0
+
+    # Second pass: copy those lines, unchanged, to a new file that replaces the old one
+    keep = set(last.values())
+    tmp_path = path + ".tmp"
+    with open(path, 'rb') as f, open(tmp_path, 'wb', buffering=1 << 20) as out:
+        for number, line in enumerate(f):
+            if number in keep:
+                out.write(line)
+    os.replace(tmp_path, path)
+    return total - len(last)
+
+
+# Class for appending records to a newline-delimited JSON file with buffered writes
+class NDJSONWriter:
+    def __init__(self, path, append=False, buffer_size=1 << 20, fast=True):
+        # Store the output path and the serialiser choice
+        self.path = path
+        self.fast = fast
+
+        # Number of records written so far
+        self.count = 0
+
+        # Create the output folder if needed
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Large write buffer: many small lines become few large writes.
+        # With append=True, a re-processed image gets a new line and its old one stays:
+        # readers keep the last record of each image, or compact_ndjson is run once closed
+        self.file = open(path, 'ab' if append else 'wb', buffering=buffer_size)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def write(self, record):
+        # Append one record as one line
+        self.file.write(dumps_line(record, self.fast))
+        self.count += 1
+
+
+    def write_many(self, records):
+        """
+        Consumes an iterator of records lazily, writing each one as it comes.
+        Returns the number of records written.
+        """
+        written = 0
+        for record in records:
+            self.write(record)
+            written += 1
+        return written
+
+
+    def flush(self):
+        # Push the buffered lines to the file
+        self.file.flush()
+
+
+    def close(self):
+        # Flush and close the file (safe to call twice)
+        if not self.file.closed:
+            self.file.close()
@@ -0,0 +1,167 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import os for building output paths
+import os
+
+# Import the SEM processing classes used by each pipeline step
+from .metadata_extractor_module import SEMMetaData
+from .json_cleaner_module import JsonCleaner
+from .visualizer_module import SEMVisualizer
+from .ndjson_module import NDJSONWriter
+from .pixel_features_module import image_features
+from .similarity_module import perceptual_hash
+from .profiling_module import profiled
+from .cache_module import path_key
+
+
+@profiled
+def extract_metadata(semmeta, semimage, header_only=False):
+    """
+    Extracts the merged EXIF + instrument metadata dictionary of one image,
+    either through PIL or through the header-only TIFF reader.
+    Returns False if the image cannot be opened.
+    """
+    # Header-only mode: parse the IFD directly, no PIL image
+    if header_only:
+        return semmeta.HeaderMetaDict(semimage)
+
+    # Attempt to open and validate the SEM image
+    img = semmeta.OpenCheckImage(semimage)
+    if not img:
+        return False
+
+    # Extract raw EXIF metadata and tag identifiers
+    semmeta.ImageMetadata(img)
+    exif_keys, exif_number = semmeta.SEMEXIF
+    found_exif_metadata, none_exif_metadata = semmeta.GetExifMetadata(img, exif_keys, exif_number)
+
+    # Merge found and missing EXIF metadata into a dictionary
+    allexif_metadict = semmeta.ExifMetaDict(found_exif_metadata, none_exif_metadata)
+
+    # Extract instrument-specific metadata from tag 34118
+    instrument_meta_dict = semmeta.InsMetaDict(semmeta.GetInsMetadata)
+
+    # Merge EXIF and instrument metadata into a single dictionary
+    return {**allexif_metadict, **instrument_meta_dict}
+
+
+def output_paths(semimage, output_dir="output", unique=False):
+    """
+    Returns the raw JSON, cleaned JSON and PNG paths written for an image.
+    With unique=True the name also holds a hash of the image's absolute path
+    (<name>-<hash>_cleaned.json), so that images of different folders sharing
+    a file name (a.tif in two sessions) never overwrite each other's outputs.
+    """
+    # Extract the image name (without extension) for output naming
+    image_name = os.path.splitext(os.path.basename(semimage))[0]
+    if unique:
+        image_name = f"{image_name}-{path_key(semimage)}"
+    return (os.path.join(output_dir, f"{image_name}_raw.json"),
+            os.path.join(output_dir, f"{image_name}_cleaned.json"),
+            os.path.join(output_dir, f"{image_name}.png"))
+
+
+def processing_options(header_only=False, render=True, thumbnail=None, features=False):
+    """
+    The options that change what is written for an image, as stored in the
+    MetadataCache: an image processed with other options is not fresh.
+    """
+    return {"header_only": bool(header_only), "render": bool(render),
+            "thumbnail": thumbnail if render else None, "features": bool(features)}
+
+
+@profiled
+def process_image(semimage, output_dir="output", semmeta=None, cleaner=None,
+                  header_only=False, render=True, show=True, write_raw=True, writer=None,
+                  renderer=None, features=False, similarity=False, unique_names=False):
+    """
+    Runs the full pipeline on one image: extract -> clean -> cleaned JSON ->
+    figure, passing the metadata dictionary in memory between the steps.
+    The raw JSON is only written with write_raw=True; with a
+    BackgroundJsonWriter the JSON files are written from its thread;
+    with a FigureRenderer the figure is drawn headless on its reused figure.
+    With features=True the pixel statistics (PX_* fields) are added to the
+    cleaned metadata; with similarity=True its perceptual hash (PX_DHASH).
+    With unique_names=True the outputs are named as output_paths(unique=True).
+    Uses fresh SEMMetaData/JsonCleaner objects unless instances are passed in.
+    Returns the cleaned metadata dictionary; raises ValueError for bad images.
+    """
+    # Each call gets its own objects unless the caller reuses them
+    semmeta = semmeta if semmeta is not None else SEMMetaData()
+    cleaner = cleaner if cleaner is not None else JsonCleaner()
+
+    # Check that the file has a supported SEM extension
+    if not semimage.endswith(semmeta.semext):
+        raise ValueError(f"unsupported format: {semimage}")
+
+    # Extract the merged metadata dictionary
+    sem_fullmd_dict = extract_metadata(semmeta, semimage, header_only=header_only)
+    if not sem_fullmd_dict:
+        raise ValueError(f"bad image for processing: {semimage}")
+
+    # Define output paths for raw and cleaned metadata JSON files
+    os.makedirs(output_dir, exist_ok=True)
+    output_path_raw, output_path_cleaned, output_path_png = output_paths(semimage, output_dir, unique_names)
+
+    # Optionally save the raw metadata (in the background if a writer is given)
+    if write_raw:
+        if writer is not None:
+            writer.write(output_path_raw, sem_fullmd_dict)
+        else:
+            semmeta.WriteSEMJson(output_path_raw, sem_fullmd_dict)
+
+    # Clean the merged dictionary directly, no raw JSON round trip
+    cleaned_data = cleaner.process_dict(sem_fullmd_dict)
+
+    # Optionally add the image-quality features, computed on the memory-mapped pixels
+    if features:
+        cleaned_data.update(image_features(semimage, sem_fullmd_dict))
+
+    # Optionally add the perceptual hash used by the SimilarityIndex
+    if similarity:
+        cleaned_data["PX_DHASH"] = perceptual_hash(semimage)
+
+    # Save the cleaned version
+    if writer is not None:
+        writer.write(output_path_cleaned, cleaned_data, indent=2)
+    else:
+        cleaner.save_cleaned(output_path_cleaned)
+
+    # Visualize the SEM image alongside its cleaned metadata table
+    if render:
+        visualizer = SEMVisualizer(json_path=output_path_cleaned, image_path=semimage, metadata=cleaned_data)
+        visualizer.show_image_with_table(output_dir=output_dir, show=show, renderer=renderer,
+                                         png_path=output_path_png)
+
+    return cleaned_data
+
+
+def iter_metadata(images, semmeta=None, header_only=True, skipped=None):
+    """
+    Lazily yields {"image": path, **raw metadata} for each image of an
+    iterable, one image at a time. Bad images are skipped (and appended to
+    the skipped list, if given).
+    """
+    semmeta = semmeta if semmeta is not None else SEMMetaData()
+    for semimage in images:
+        sem_fullmd_dict = extract_metadata(semmeta, semimage, header_only=header_only)
+        if not sem_fullmd_dict:
+            if skipped is not None:
+                skipped.append(semimage)
+            continue
+        yield {"image": semimage, **sem_fullmd_dict}
+
+
+def export_ndjson(images, output_path, semmeta=None, cleaner=None, header_only=True,
+                  append=False, fast=True, skipped=None):
+    """
+    Streams extract -> clean -> NDJSON file over any number of images in
+    constant memory: one cleaned record per line, written through a buffer.
+    fast=True uses orjson when it is installed. Bad images are appended to
+    the skipped list, if given.
+    Returns the number of records written.
+    """
+    cleaner = cleaner if cleaner is not None else JsonCleaner()
+    records = iter_metadata(images, semmeta=semmeta, header_only=header_only, skipped=skipped)
+    with NDJSONWriter(output_path, append=append, fast=fast) as sink:
+        return sink.write_many(cleaner.clean_stream(records))
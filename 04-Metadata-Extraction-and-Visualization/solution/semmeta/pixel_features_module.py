@@ -0,0 +1,161 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import NumPy for the vectorised statistics and PIL for images that cannot be memory-mapped
+import numpy as np
+from PIL import Image
+
+# Import the header-only TIFF reader for the strip layout
+from .tiff_header_module import TiffHeaderReader
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
+# TIFF tag numbers of the pixel layout
+LAYOUT_TAGS = {
+    "ImageWidth": 256, "ImageLength": 257, "BitsPerSample": 258, "Compression": 259,
+    "StripOffsets": 273, "SamplesPerPixel": 277, "StripByteCounts": 279, "SampleFormat": 339,
+}
+
+# NumPy sample types by (SampleFormat, BitsPerSample): 1 unsigned, 2 signed, 3 float
+SAMPLE_TYPES = {
+    (1, 8): 'u1', (1, 16): 'u2', (1, 32): 'u4',
+    (2, 8): 'i1', (2, 16): 'i2', (2, 32): 'i4',
+    (3, 32): 'f4', (3, 64): 'f8',
+}
+
+
+def _first(value):
+    # Metadata values are plain numbers or (number, ...) tuples
+    return value[0] if isinstance(value, (tuple, list)) else value
+
+
+def strip_layout(image, metadata=None):
+    """
+    Returns the pixel layout of a TIFF image as a dict with width, height,
+    samples, dtype (NumPy, with byte order), compression, and the strip
+    offsets and byte counts.
+    A single 8-bit strip is taken straight from the metadata dictionary of
+    SEMMetaData; anything else is read from the file header.
+    """
+    metadata = metadata or {}
+    names = ("ImageWidth", "ImageLength", "BitsPerSample", "StripOffsets", "StripByteCounts")
+    if all(metadata.get(name) is not None for name in names):
+        width, height = _first(metadata["ImageWidth"]), _first(metadata["ImageLength"])
+        samples = _first(metadata.get("SamplesPerPixel")) or 1
+        bits = _first(metadata["BitsPerSample"])
+        if bits == 8 and _first(metadata["StripByteCounts"]) == width * height * samples:
+            return {"width": width, "height": height, "samples": samples,
+                    "dtype": np.dtype('u1' if (_first(metadata.get("SampleFormat")) or 1) == 1 else 'i1'),
+                    "compression": _first(metadata.get("Compression")) or 1,
+                    "offsets": (_first(metadata["StripOffsets"]),),
+                    "counts": (_first(metadata["StripByteCounts"]),)}
+
+    # Multi-strip or 16/32-bit images: full strip arrays and byte order from the header
+    with TiffHeaderReader(image) as reader:
+        tags = {name: reader.read_tag(tag) for name, tag in LAYOUT_TAGS.items() if tag in reader.entries}
+        byteorder = reader.byteorder
+    sample_type = SAMPLE_TYPES.get(((tags.get("SampleFormat") or (1,))[0], tags["BitsPerSample"][0]))
+    return {"width": tags["ImageWidth"][0], "height": tags["ImageLength"][0],
+            "samples": (tags.get("SamplesPerPixel") or (1,))[0],
+            "dtype": np.dtype(byteorder + sample_type) if sample_type else None,
+            "compression": (tags.get("Compression") or (1,))[0],
+            "offsets": tags.get("StripOffsets", ()), "counts": tags.get("StripByteCounts", ())}
+
+
+def pixel_array(image, metadata=None):
+    """
+    Returns the pixels of an image as a read-only NumPy array.
+    Uncompressed TIFFs whose strips are contiguous are memory-mapped
+    (no decoding, pages are read on demand); other images are decoded by PIL.
+    Palette images give their colour indices (grey levels for SEM images).
+    """
+    try:
+        layout = strip_layout(image, metadata)
+    except (IOError, ValueError, KeyError, IndexError):
+        layout = None
+
+    if layout and layout["compression"] == 1 and layout["dtype"] is not None and layout["offsets"]:
+        offsets, counts = layout["offsets"], layout["counts"]
+        contiguous = all(offsets[i] + counts[i] == offsets[i + 1] for i in range(len(offsets) - 1))
+        shape = (layout["height"], layout["width"]) + ((layout["samples"],) if layout["samples"] > 1 else ())
+        if contiguous and sum(counts) >= int(np.prod(shape)) * layout["dtype"].itemsize:
+            return np.memmap(image, dtype=layout["dtype"], mode='r', offset=offsets[0], shape=shape)
+
+    # Compressed, scattered or unusual layouts: let PIL decode the image
+    with Image.open(image) as img:
+        return np.asarray(img)
+
+
+def pixel_features(pixels, fft_size=512, bins=256):
+    """
+    Computes image-quality features of a pixel array with vectorised NumPy:
+        - PX_MEAN, PX_STD: grey level mean and standard deviation
+        - PX_SATURATION_HIGH / PX_SATURATION_LOW: fraction of pixels at the
+          top / bottom of the value range (clipped detector signal)
+        - PX_SHARPNESS: variance of the 4-neighbour Laplacian (focus measure)
+        - PX_NOISE: noise standard deviation from the flat high-frequency
+          floor of the power spectrum (centre crop of fft_size pixels)
+        - PX_SNR: PX_STD / PX_NOISE
+        - PX_HISTOGRAM: pixel counts in `bins` equal bins over the value range
+    Colour images are averaged to one channel first.
+    """
+    data = np.asarray(pixels)
+    if data.ndim == 3:
+        data = data.mean(axis=2, dtype=np.float32)
+
+    # Value range of the sample type (for saturation and the histogram)
+    if np.issubdtype(data.dtype, np.integer):
+        low, high = np.iinfo(data.dtype).min, np.iinfo(data.dtype).max
+    else:
+        low, high = float(data.min()), float(data.max())
+
+    size = data.size
+
+    # 8-bit data: one bincount gives the histogram, the moments and the saturation
+    if data.dtype == np.uint8 and bins == 256:
+        histogram = np.bincount(data.ravel(), minlength=256)
+        levels = np.arange(256, dtype=np.float64)
+        mean = float(histogram @ levels) / size
+        std = float(np.sqrt(max(0.0, float(histogram @ levels ** 2) / size - mean ** 2)))
+        high_count, low_count = int(histogram[255]), int(histogram[0])
+    else:
+        histogram, _ = np.histogram(data, bins=bins, range=(low, high))
+        mean = float(data.mean(dtype=np.float64))
+        std = float(data.std(dtype=np.float64))
+        high_count, low_count = int(np.count_nonzero(data == high)), int(np.count_nonzero(data == low))
+
+    # Laplacian on float32 views of the shifted array (no Python loop over pixels)
+    f = data.astype(np.float32, copy=False)
+    laplacian = f[1:-1, :-2] + f[1:-1, 2:] + f[:-2, 1:-1] + f[2:, 1:-1] - 4 * f[1:-1, 1:-1]
+
+    # White noise has a flat spectrum E|F|^2 = N sigma^2: measure it where the
+    # image content has died out (outer quarter of the frequency plane)
+    rows, cols = data.shape
+    top, left = max(0, (rows - fft_size) // 2), max(0, (cols - fft_size) // 2)
+    crop = f[top:top + fft_size, left:left + fft_size]
+    power = np.abs(np.fft.rfft2(crop - crop.mean())) ** 2
+    fy = np.abs(np.fft.fftfreq(crop.shape[0]))[:, None]
+    fx = np.fft.rfftfreq(crop.shape[1])[None, :]
+    outer = np.hypot(fy, fx) > 0.375
+    noise = float(np.sqrt(power[np.broadcast_to(outer, power.shape)].mean() / crop.size))
+
+    return {
+        "PX_MEAN": mean,
+        "PX_STD": std,
+        "PX_SATURATION_HIGH": high_count / size,
+        "PX_SATURATION_LOW": low_count / size,
+        "PX_SHARPNESS": float(laplacian.var(dtype=np.float64)),
+        "PX_NOISE": noise,
+        "PX_SNR": std / noise if noise > 0 else None,
+        "PX_HISTOGRAM": histogram.tolist(),
+    }
+
+
+@profiled
+def image_features(image, metadata=None, fft_size=512):
+    """
+    Pixel features of an image file (see pixel_features), reading the
+    pixels through a memory map when the TIFF layout allows it.
+    metadata is the SEMMetaData dictionary of the image, if already extracted.
+    """
+    return pixel_features(pixel_array(image, metadata), fft_size=fft_size)
@@ -0,0 +1,145 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for file paths and the pyramid manifest
+import os
+import json
+
+# Import PIL for decoding and downsampling the images
+from PIL import Image
+
+# Import the path hash that keeps same-named images of different folders apart
+from .cache_module import path_key
+
+
+def _displayable(img):
+    # Image.reduce and imshow handle L, I, F, RGB(A)... : convert the other modes first
+    if img.mode.startswith("I;16"):
+        return img.convert("I")
+    if img.mode == "P":
+        # Grey colour maps keep one channel; others (Zeiss maps have a few
+        # overlay colours) are expanded to RGB, as imshow would do
+        palette = img.getpalette() or []
+        grey = palette[0::3] == palette[1::3] == palette[2::3]
+        return img.convert("L" if grey else "RGB")
+    if img.mode in ("1", "PA"):
+        return img.convert("L" if img.mode == "1" else "RGBA")
+    return img
+
+
+def reduce_factor(width, height, max_size):
+    # Largest integer factor that keeps the longest side at least max_size pixels
+    return max(1, max(width, height) // max_size) if max_size else 1
+
+
+def load_preview(image_path, max_size=1024, pyramid_dir=None):
+    """
+    Loads an image at reduced resolution for display: the longest side is
+    brought down by an integer factor, but never below max_size pixels.
+    JPEG-compressed images decode directly at the lower resolution (draft),
+    others are box-averaged with Image.reduce.
+    With pyramid_dir, the level is read from (and first written to) an
+    ImagePyramid cached there, so repeated previews skip the full image.
+    """
+    if pyramid_dir is not None:
+        pyramid = ImagePyramid(image_path, pyramid_dir)
+        if not pyramid.is_fresh():
+            pyramid.build()
+        return pyramid.load(max_size)
+
+    with Image.open(image_path) as img:
+        factor = reduce_factor(img.width, img.height, max_size)
+        if factor == 1:
+            img.load()
+            return _displayable(img).copy()
+
+        # Let the decoder skip detail when it can (JPEG scale-on-decode)
+        img.draft(img.mode, (img.width // factor, img.height // factor))
+        factor = reduce_factor(img.width, img.height, max_size)
+        return _displayable(img).reduce(factor)
+
+
+# Class for caching a multi-resolution copy (halved at each level) of an image
+class ImagePyramid:
+    def __init__(self, image_path, cache_dir, min_size=256):
+        # Store the source image and where its levels are written
+        self.image_path = image_path
+        self.cache_dir = cache_dir
+
+        # Levels stop once the longest side would drop below min_size pixels
+        self.min_size = min_size
+
+        # Levels are named after the image and its path: <name>-<hash>.x2.tif, <name>-<hash>.x4.tif, ...
+        self.name = f"{os.path.splitext(os.path.basename(image_path))[0]}-{path_key(image_path)}"
+        self.manifest_path = os.path.join(cache_dir, f"{self.name}.pyramid.json")
+        self.manifest = self._read_manifest()
+
+
+    def _read_manifest(self):
+        # Manifest of the cached levels ({} if there is none yet)
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+
+    def _source_stat(self):
+        # Size and modification time of the source image
+        stat = os.stat(self.image_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+
+    def level_path(self, factor):
+        # Uncompressed TIFF of the level reduced by factor (faster to read back than PNG)
+        return os.path.join(self.cache_dir, f"{self.name}.x{factor}.tif")
+
+
+    def is_fresh(self):
+        # The cached levels belong to the current version of the image
+        return (self.manifest.get("source") == os.path.abspath(self.image_path)
+                and self.manifest.get("stat") == self._source_stat()
+                and all(os.path.isfile(self.level_path(f)) for f in self.manifest.get("levels", [])))
+
+
+    def build(self, img=None):
+        """
+        Writes every level, each one reduced by 2 from the previous one
+        (so the full image is decoded only once), and the manifest.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        source = img if img is not None else Image.open(self.image_path)
+        try:
+            width, height = source.size
+            level, factor, levels = _displayable(source), 1, []
+            while max(level.size) // 2 >= self.min_size:
+                level, factor = level.reduce(2), factor * 2
+                level.save(self.level_path(factor), format="TIFF")
+                levels.append(factor)
+        finally:
+            if img is None:
+                source.close()
+
+        # The manifest is written last: a partly built pyramid is never used
+        self.manifest = {"source": os.path.abspath(self.image_path), "stat": self._source_stat(),
+                         "size": [width, height], "levels": levels}
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f)
+
+
+    def load(self, max_size=1024):
+        """
+        Returns the image with its longest side brought down towards max_size,
+        starting from the smallest cached level that is still large enough.
+        """
+        width, height = self.manifest["size"]
+        factor = reduce_factor(width, height, max_size)
+
+        # Largest cached level not smaller than requested
+        cached = max([f for f in self.manifest["levels"] if f <= factor], default=1)
+        if cached == 1:
+            return load_preview(self.image_path, max_size)
+
+        with Image.open(self.level_path(cached)) as level:
+            level.load()
+            rest = factor // cached
+            return _displayable(level).reduce(rest) if rest > 1 else _displayable(level).copy()
@@ -0,0 +1,185 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for timing, memory tracing, the JSON report and the cProfile dump
+import os
+import json
+import time
+import functools
+import tracemalloc
+import cProfile
+from contextlib import contextmanager, nullcontext
+
+# Shared no-op context returned by stage() while profiling is disabled
+_DISABLED = nullcontext()
+
+
+def _io_counters():
+    # Bytes read and written by this process so far (Linux /proc; None elsewhere)
+    try:
+        with open("/proc/self/io", 'rb') as f:
+            fields = dict(line.split(b":") for line in f.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (IOError, KeyError, ValueError):
+        return None
+
+
+def percentile(values, fraction):
+    # Percentile of a sorted list, nearest lower rank (0.5 of two values is the first one)
+    return values[int(fraction * (len(values) - 1))]
+
+
+# Class for recording wall/CPU time, I/O bytes and peak memory of pipeline stages
+class Profiler:
+    def __init__(self, enabled=False, memory=False):
+        # When disabled, stage() and @profiled calls cost one attribute check
+        self.enabled = enabled
+
+        # Peak memory per stage needs tracemalloc, which slows Python down: opt-in
+        self.memory = memory
+
+        # Recorded samples: stage name -> list of (wall s, cpu s, bytes read, bytes written, peak bytes)
+        self.samples = {}
+
+        # Optional cProfile profiler running next to the stage timers
+        self.cprofile = None
+
+        # Absolute peak memory of each open stage, outermost first: an inner stage resets
+        # the tracemalloc peak, so the peak reached before is kept here for its parents
+        self._peaks = []
+
+
+    def enable(self, memory=False, cprofile=False):
+        # Start recording (and tracing memory / cProfiling if asked)
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+
+    def disable(self):
+        # Stop recording; the samples are kept for the report
+        self.enabled = False
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+    def stage(self, name):
+        """
+        Context manager timing one stage:
+            with PROFILER.stage("JsonCleaner.process_dict"):
+                ...
+        Returns a shared no-op context when profiling is disabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._record(name)
+
+
+    @contextmanager
+    def _record(self, name):
+        io_start = _io_counters()
+        if self.memory:
+            mem_start, peak_before = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak_before)
+            tracemalloc.reset_peak()
+            self._peaks.append(mem_start)
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            io_end = _io_counters()
+            read, written = ((io_end[0] - io_start[0], io_end[1] - io_start[1])
+                             if io_start and io_end else (None, None))
+            peak = None
+            if self.memory:
+                # Highest of the peaks before and after the inner stages, passed on to the parent
+                top = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], top)
+                peak = top - mem_start
+            self.samples.setdefault(name, []).append((wall, cpu, read, written, peak))
+
+
+    def drain(self):
+        # Return and forget the samples (sent from batch workers to the parent)
+        samples, self.samples = self.samples, {}
+        return samples
+
+
+    def merge(self, samples):
+        # Add samples recorded elsewhere (e.g. in a worker process)
+        for name, values in samples.items():
+            self.samples.setdefault(name, []).extend(values)
+
+
+    def report(self):
+        """
+        Aggregates the samples per stage: count, wall and CPU time
+        (total, p50, p95, max), bytes read/written and the largest peak memory.
+        Nested stages are inclusive (a stage also counts its inner stages,
+        its peak memory included).
+        """
+        report = {}
+        for name, values in sorted(self.samples.items()):
+            entry = {"count": len(values)}
+            for idx, label in ((0, "wall_s"), (1, "cpu_s")):
+                series = sorted(v[idx] for v in values)
+                entry[label] = {"total": sum(series), "p50": percentile(series, 0.5),
+                                "p95": percentile(series, 0.95), "max": series[-1]}
+            for idx, label in ((2, "bytes_read"), (3, "bytes_written")):
+                known = [v[idx] for v in values if v[idx] is not None]
+                entry[label] = sum(known) if known else None
+            peaks = [v[4] for v in values if v[4] is not None]
+            entry["peak_memory_bytes"] = max(peaks) if peaks else None
+            report[name] = entry
+        return report
+
+
+    def write_report(self, path):
+        # Save the aggregated report as JSON
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+    def dump_cprofile(self, path):
+        # Save the cProfile statistics (open with pstats or snakeviz)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(path)
+
+
+    def print_summary(self):
+        # Short table of the stages, slowest total first
+        report = self.report()
+        print(f"\n{'stage':40s} {'count':>6s} {'total s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'max ms':>9s}")
+        for name, entry in sorted(report.items(), key=lambda item: -item[1]["wall_s"]["total"]):
+            wall = entry["wall_s"]
+            print(f"{name:40s} {entry['count']:6d} {wall['total']:9.3f} {wall['p50'] * 1e3:9.2f} "
+                  f"{wall['p95'] * 1e3:9.2f} {wall['max'] * 1e3:9.2f}")
+
+
+# Process-wide profiler used by the @profiled stages of semmeta (disabled by default)
+PROFILER = Profiler()
+
+
+def profiled(func):
+    """
+    Decorator recording each call of a function or method as a stage named
+    after it (e.g. 'SEMMetaData.GetExifMetadata') when PROFILER is enabled.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return func(*args, **kwargs)
+        with PROFILER._record(name):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,204 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for file paths, timing and error reporting
+import os
+import time
+import traceback
+
+# Import the process pool used to render many images in parallel
+from concurrent.futures import ProcessPoolExecutor
+
+# Import NumPy for the pixel data
+import numpy as np
+
+# Import the Agg canvas and a plain Figure: no pyplot, no GUI, no global figure list
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Import the output naming of the pipeline and the table rows of the visualizer
+from .pipeline_module import output_paths
+from .visualizer_module import SEMVisualizer
+
+# Import the reduced-resolution image loading
+from .preview_module import load_preview
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
+
+# Per-process renderer, created once in each worker by _init_worker
+_WORKER = {}
+
+
+# Class for rendering many image + metadata table figures with one reused figure
+class FigureRenderer:
+    def __init__(self, rows=6, thumbnail=None, preview_size=1024, pyramid_dir=None):
+        # Number of table rows of the template (one per visualized variable)
+        self.rows = rows
+
+        # With thumbnail=<size in pixels> only a small PNG of the image is written
+        self.thumbnail = thumbnail
+
+        # Images are loaded reduced towards preview_size pixels, from the
+        # image pyramids in pyramid_dir if given (see preview_module)
+        self.preview_size = preview_size
+        self.pyramid_dir = pyramid_dir
+
+        # The figure template is built on the first render
+        self.figure = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def close(self):
+        # Drop the figure template (it is not registered with pyplot)
+        self.figure = None
+
+
+    def _build(self, width, height):
+        """
+        Builds the figure once: same layout as SEMVisualizer.show_image_with_table
+        (image above, metadata table below), with an image artist and table
+        cells that are updated in place for every image.
+        """
+        self.figure = Figure(figsize=(8, 8))
+        FigureCanvasAgg(self.figure)
+        ax_img, ax_table = self.figure.subplots(2, 1, gridspec_kw={'height_ratios': [2, 2]})
+
+        # Image artist, filled with the pixels of each image in render()
+        self.image_artist = ax_img.imshow(np.zeros((height, width), dtype=np.uint8), cmap='gray')
+        self.ax_img = ax_img
+        ax_img.axis('off')
+        ax_img.set_title("SEM Image", fontsize=14)
+
+        # Table with empty cells, filled with the metadata of each image in render()
+        self.table = ax_table.table(cellText=[["", "", ""]] * self.rows, colLabels=["Variable", "Value", "Unit"],
+                                    loc='center', cellLoc='center')
+        self.table.scale(1, 2)
+        ax_table.axis('off')
+        ax_table.set_title("Extracted Metadata", fontsize=12)
+
+        # The layout is computed once for all images
+        self.figure.tight_layout()
+
+
+    @profiled
+    def render(self, image_path, table_data, output_path):
+        """
+        Writes the image + metadata table figure (or the thumbnail) of one image.
+        table_data is a list of (variable, value, unit) rows (SEMVisualizer.extract_variables).
+        """
+        # Thumbnail-only output: PIL alone, no figure at all
+        if self.thumbnail:
+            self.save_thumbnail(image_path, output_path)
+            return
+
+        # Load the pixels at the resolution the figure needs
+        pixels = np.asarray(load_preview(image_path, max_size=self.preview_size, pyramid_dir=self.pyramid_dir))
+        height, width = pixels.shape[:2]
+
+        if self.figure is None:
+            self._build(width, height)
+
+        # Swap the pixels and rescale the grey levels like a fresh imshow would
+        self.image_artist.set_data(pixels)
+        self.image_artist.set_extent((-0.5, width - 0.5, height - 0.5, -0.5))
+        self.image_artist.set_clim(pixels.min(), pixels.max())
+        self.ax_img.set_xlim(-0.5, width - 0.5)
+        self.ax_img.set_ylim(height - 0.5, -0.5)
+
+        # Fill the table cells (row 0 holds the column labels)
+        for row in range(self.rows):
+            values = table_data[row] if row < len(table_data) else ("", "", "")
+            for col, text in enumerate(values):
+                self.table[row + 1, col].get_text().set_text(str(text))
+
+        # Save the figure; the pixels are released when the next image replaces them
+        self.figure.savefig(output_path)
+        self.image_artist.set_data(np.zeros((1, 1), dtype=np.uint8))
+
+
+    def save_thumbnail(self, image_path, output_path):
+        # Shrink the image to fit in a thumbnail x thumbnail square and save it as PNG
+        # (starting from the smallest pyramid level that is large enough)
+        img = load_preview(image_path, max_size=self.thumbnail, pyramid_dir=self.pyramid_dir)
+        img.thumbnail((self.thumbnail, self.thumbnail))
+
+        # Fast zlib level: SEM noise hardly compresses, the default level only costs time
+        img.save(output_path, format="PNG", compress_level=1)
+
+
+def _init_worker(rows, thumbnail, pyramid_dir):
+    # Each worker keeps one renderer (and one figure) for all its images
+    _WORKER['renderer'] = FigureRenderer(rows=rows, thumbnail=thumbnail, pyramid_dir=pyramid_dir)
+
+
+def _render_one(job):
+    """
+    Renders one image inside a worker.
+    Returns (image, error message or None).
+    """
+    image, output_dir = job
+    try:
+        _, cleaned_path, png_path = output_paths(image, output_dir, unique=True)
+
+        # The table uses the cleaned metadata written by the pipeline, or the image header
+        table_data = []
+        if not _WORKER['renderer'].thumbnail:
+            visualizer = SEMVisualizer(json_path=cleaned_path if os.path.isfile(cleaned_path) else None,
+                                       image_path=image)
+            visualizer.load_metadata()
+            table_data = visualizer.extract_variables()
+
+        _WORKER['renderer'].render(image, table_data, png_path)
+        return image, None
+    except Exception as e:
+        # Report the failure and keep going with the rest of the images
+        return image, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"
+
+
+def render_many(images, output_dir="output", workers=None, chunksize=16, thumbnail=None,
+                pyramid_dir=None, verbose=True):
+    """
+    Writes the PNG of many already processed images from a process pool,
+    using their <name>-<hash>_cleaned.json files in output_dir (see run_batch);
+    images not processed yet get their table straight from the file header.
+    With thumbnail=<size> only thumbnails are written (no cleaned JSON needed).
+    With pyramid_dir, images are read from cached image pyramids.
+    Each worker reuses one figure, so memory stays flat over thousands of images.
+    Returns a summary dictionary with counts, failures and throughput.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = len(SEMVisualizer().variables)
+    jobs = [(image, output_dir) for image in images]
+    failures = []
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(rows, thumbnail, pyramid_dir)) as pool:
+        for image, error in pool.map(_render_one, jobs, chunksize=chunksize):
+            if error is not None:
+                failures.append((image, error))
+                if verbose:
+                    print("[ERROR]", image, "->", error.splitlines()[0])
+    elapsed = time.perf_counter() - start
+
+    done = len(images) - len(failures)
+    summary = {
+        "files": len(images),
+        "rendered": done,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "files_per_s": done / elapsed if elapsed > 0 else 0.0,
+    }
+    if verbose:
+        print(f"\nRendered {done}/{len(images)} images ({len(failures)} failed) in {elapsed:.2f} s")
+    return summary
+
@@ -0,0 +1,164 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import os for the index file and NumPy for the packed hashes and the batched search
+import os
+import numpy as np
+
+# Import PIL for the resampling and the reduced-resolution image loading
+from PIL import Image
+from .preview_module import load_preview
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
+# Number of set bits of every byte value (popcount lookup table)
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+@profiled
+def perceptual_hash(image, hash_size=16, pyramid_dir=None):
+    """
+    Difference hash (dHash) of an image as a hex string of hash_size**2 bits:
+    the image is shrunk to (hash_size + 1) x hash_size grey levels and each
+    bit tells whether a pixel is brighter than its right neighbour.
+    Similar images (noise, contrast, small shifts) differ in only a few bits.
+    """
+    # A small preview is enough (and much cheaper) for a 17x16 thumbnail
+    img = load_preview(image, max_size=8 * hash_size, pyramid_dir=pyramid_dir)
+    small = np.asarray(img.convert("L").resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+def hamming_distances(hashes, query):
+    """
+    Hamming distances between a query hash (n bytes) and every row of an
+    (N, n) uint8 array of packed hashes, in one vectorised pass.
+    """
+    # NumPy >= 2.0 counts bits natively: compare 8 bytes at a time
+    if hasattr(np, "bitwise_count") and hashes.shape[1] % 8 == 0:
+        words = np.ascontiguousarray(hashes).view(np.uint64)
+        return np.bitwise_count(words ^ np.ascontiguousarray(query).view(np.uint64)).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[np.bitwise_xor(hashes, query)].sum(axis=1, dtype=np.int32)
+
+
+# Class for a nearest-neighbour index of perceptual hashes, updated image by image
+class SimilarityIndex:
+    def __init__(self, index_path):
+        # Store the path of the .npz file holding the index
+        self.index_path = index_path
+
+        # Image path -> row, and the packed hashes (one row per image)
+        self.rows = {}
+        self.paths = []
+        self.hashes = np.zeros((0, 0), dtype=np.uint8)
+
+        # Hashes added since the array was last rebuilt
+        self._pending = []
+
+        # Load the previous state if the index file exists
+        self.load()
+
+
+    def load(self):
+        # Read the index file, starting empty if it is missing or unreadable
+        try:
+            with np.load(self.index_path) as data:
+                self.paths = data["paths"].tolist()
+                self.hashes = data["hashes"]
+        except (IOError, ValueError, KeyError):
+            self.paths, self.hashes = [], np.zeros((0, 0), dtype=np.uint8)
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        self._pending = []
+
+
+    def save(self):
+        # Write to a temporary file first, then replace, so a crash never corrupts the index
+        self._flush()
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, paths=np.array(self.paths, dtype=str), hashes=self.hashes)
+        os.replace(tmp_path, self.index_path)
+
+
+    def __len__(self):
+        return len(self.rows)
+
+
+    def __contains__(self, image):
+        return os.path.abspath(image) in self.rows
+
+
+    def _flush(self):
+        # Append the pending hashes to the array in one go (amortised incremental updates)
+        if self._pending:
+            width = len(self._pending[0])
+            if self.hashes.size == 0:
+                self.hashes = np.zeros((len(self.paths) - len(self._pending), width), dtype=np.uint8)
+            self.hashes = np.vstack([self.hashes, np.array(self._pending, dtype=np.uint8)])
+            self._pending = []
+
+
+    def add(self, image, phash):
+        """
+        Adds (or updates) the perceptual hash (hex string) of an image.
+        """
+        path = os.path.abspath(image)
+        packed = bytes.fromhex(phash)
+        row = self.rows.get(path)
+        if row is None:
+            self.rows[path] = len(self.paths)
+            self.paths.append(path)
+            self._pending.append(list(packed))
+        else:
+            self._flush()
+            self.hashes[row] = np.frombuffer(packed, dtype=np.uint8)
+
+
+    def remove(self, image):
+        # Drop an image from the index (the last row takes its place)
+        path = os.path.abspath(image)
+        row = self.rows.pop(path, None)
+        if row is None:
+            return
+        self._flush()
+        last = len(self.paths) - 1
+        if row != last:
+            self.paths[row] = self.paths[last]
+            self.hashes[row] = self.hashes[last]
+            self.rows[self.paths[row]] = row
+        self.paths.pop()
+        self.hashes = self.hashes[:last]
+
+
+    def hash_of(self, image):
+        # Stored hash of an indexed image (None if it is not in the index)
+        row = self.rows.get(os.path.abspath(image))
+        if row is None:
+            return None
+        self._flush()
+        return self.hashes[row].tobytes().hex()
+
+
+    def query(self, phash, k=5, exclude=None):
+        """
+        Returns the k nearest images to a perceptual hash as a list of
+        (image path, Hamming distance), closest first.
+        exclude drops one image (typically the query image itself).
+        """
+        self._flush()
+        if not self.paths:
+            return []
+        distances = hamming_distances(self.hashes, np.frombuffer(bytes.fromhex(phash), dtype=np.uint8))
+        excluded = exclude is not None and exclude in self
+        if excluded:
+            distances[self.rows[os.path.abspath(exclude)]] = np.iinfo(np.int32).max
+
+        # Partial sort: only the k best rows are ordered
+        k = min(k, len(self.paths) - excluded)
+        if k <= 0:
+            return []
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best], kind="stable")]
+        return [(self.paths[row], int(distances[row])) for row in best]
@@ -0,0 +1,167 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import mmap for zero-copy access to the file and struct for decoding binary fields
+import mmap
+import struct
+
+
+# Class for reading TIFF tags straight from the file header, without decoding pixels
+class TiffHeaderReader:
+    # TIFF field types: type id -> (struct format of one value, size in bytes of one value)
+    FIELD_TYPES = {
+        1: ('B', 1),    # BYTE
+        2: ('s', 1),    # ASCII
+        3: ('H', 2),    # SHORT
+        4: ('L', 4),    # LONG
+        5: ('LL', 8),   # RATIONAL (numerator, denominator)
+        6: ('b', 1),    # SBYTE
+        7: ('B', 1),    # UNDEFINED
+        8: ('h', 2),    # SSHORT
+        9: ('l', 4),    # SLONG
+        10: ('ll', 8),  # SRATIONAL
+        11: ('f', 4),   # FLOAT
+        12: ('d', 8),   # DOUBLE
+        13: ('L', 4),   # IFD
+    }
+
+    def __init__(self, image, use_mmap=False):
+        # Store the path to the TIFF file
+        self.image = image
+
+        # Choose between seeked reads on the file handle and a memory map
+        self.use_mmap = use_mmap
+
+        # File handle / memory map, opened lazily by open()
+        self._file = None
+        self._buffer = None
+
+        # Byte order prefix for struct ('<' little endian, '>' big endian)
+        self.byteorder = '<'
+
+        # Raw IFD entries: tag -> (field type, count, 4-byte value/offset field)
+        self.entries = {}
+
+
+    def __enter__(self):
+        return self.open()
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def open(self):
+        """
+        Opens the file, checks the TIFF signature and parses the first IFD.
+        Only the 8-byte header and the IFD entries are read at this point.
+        """
+        self._file = open(self.image, 'rb')
+
+        # Either map the file or read through the plain file handle
+        if self.use_mmap:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = self._file
+
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+
+    def close(self):
+        # Release the memory map (if any) and the file handle
+        if self._buffer is not None and self._buffer is not self._file:
+            self._buffer.close()
+        if self._file is not None:
+            self._file.close()
+        self._buffer = self._file = None
+
+
+    def _read(self, offset, size):
+        # Seek to the given offset and read exactly size bytes
+        self._buffer.seek(offset)
+        data = self._buffer.read(size)
+        if len(data) != size:
+            raise ValueError(f"truncated TIFF file: {self.image}")
+        return data
+
+
+    def _read_header(self):
+        """
+        Parses the TIFF header (byte order, magic number, first IFD offset)
+        and the entries of the first IFD.
+        """
+        header = self._read(0, 8)
+
+        # 'II' is Intel (little endian), 'MM' is Motorola (big endian)
+        if header[:2] == b'II':
+            self.byteorder = '<'
+        elif header[:2] == b'MM':
+            self.byteorder = '>'
+        else:
+            raise ValueError(f"not a TIFF file: {self.image}")
+
+        # Classic TIFF has magic number 42 (BigTIFF uses 43 and is not supported)
+        magic, ifd_offset = struct.unpack(self.byteorder + 'HL', header[2:])
+        if magic != 42:
+            raise ValueError(f"unsupported TIFF variant ({magic}): {self.image}")
+
+        # Read the number of entries, then all 12-byte entries in one go
+        count, = struct.unpack(self.byteorder + 'H', self._read(ifd_offset, 2))
+        table = self._read(ifd_offset + 2, 12 * count)
+
+        # Each entry: tag (2), field type (2), count (4), value or offset (4)
+        self.entries = {}
+        for idx in range(count):
+            entry = table[12 * idx: 12 * idx + 12]
+            tag, field_type, num = struct.unpack(self.byteorder + 'HHL', entry[:8])
+            self.entries[tag] = (field_type, num, entry[8:])
+
+
+    def read_tag(self, tag, first_only=False):
+        """
+        Reads the value(s) of a single tag, following the value offset only
+        when the data does not fit in the 4-byte entry field.
+        Returns a tuple shaped like PIL's legacy img.tag values.
+        """
+        field_type, num, field = self.entries[tag]
+
+        # Unknown field types are decoded byte by byte
+        fmt, size = self.FIELD_TYPES.get(field_type, ('B', 1))
+
+        # Only fetch the first value for array tags when asked to
+        if first_only and field_type != 2:
+            num = min(num, 1)
+
+        # Values that fit in 4 bytes are stored inline, otherwise field is an offset
+        nbytes = size * num
+        if nbytes <= 4:
+            data = field[:nbytes]
+        else:
+            offset, = struct.unpack(self.byteorder + 'L', field)
+            data = self._read(offset, nbytes)
+
+        # ASCII: one latin-1 string without the trailing NUL (as PIL does)
+        if field_type == 2:
+            if data.endswith(b'\0'):
+                data = data[:-1]
+            return (data.decode('latin-1', 'replace'),)
+
+        # Decode all values at once, grouping rationals as (numerator, denominator)
+        values = struct.unpack(self.byteorder + fmt * num, data)
+        if len(fmt) == 2:
+            return tuple(zip(values[::2], values[1::2]))
+        return values
+
+
+    def tag_values(self, skip=()):
+        """
+        Returns a dictionary {tag: (first value,)} for every tag of the first IFD,
+        with full strings for ASCII tags. Tags in skip (e.g. ColorMap) are
+        listed with None and their data is never read.
+        """
+        return {tag: (None if tag in skip else self.read_tag(tag, first_only=True))
+                for tag in self.entries}
@@ -0,0 +1,130 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import regular expressions for parsing and namedtuple for the parsed values
+import re
+from collections import namedtuple
+
+
+# Parsed metadata value: number in SI units (or text), SI unit, original string
+ParsedValue = namedtuple("ParsedValue", ["value", "unit", "original"])
+
+# 'Label = value' instrument strings (split on the first ' = ')
+KEY_VALUE = re.compile(r'^(?P<label>.*?)\s=\s?(?P<value>.*)$', re.S)
+
+# A number followed by an optional unit: '3.18 mm', '1.00e-004 mbar', '0.', '-2'
+NUMBER_UNIT = re.compile(r'^\s*(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(?P<unit>.*?)\s*$', re.S)
+
+# A single unit token (unknown units are kept as they are)
+UNIT_TOKEN = re.compile(r'^[^\W\d_][^\W\d_²³/]*[²³]?$|^[°%][^\W\d_]*$')
+
+# SI prefixes used in the instrument block (µ appears both as micro sign and Greek mu)
+PREFIXES = {'f': 1e-15, 'p': 1e-12, 'n': 1e-9, 'µ': 1e-6, 'μ': 1e-6, 'u': 1e-6,
+            'm': 1e-3, 'k': 1e3, 'K': 1e3, 'M': 1e6, 'G': 1e9}
+
+
+def _unit_table():
+    # Unit string -> (scale factor to SI, SI unit)
+    table = {}
+    for base in ('m', 'A', 's', 'V', 'Pa', 'rad', 'Ah', 'Hz', 'W'):
+        table[base] = (1.0, base)
+        for prefix, scale in PREFIXES.items():
+            table.setdefault(prefix + base, (scale, base))
+    for prefix in ('', 'n', 'µ', 'μ', 'm'):
+        table[prefix + 'm²'] = (table[prefix + 'm'][0] ** 2, 'm²')
+
+    # Units that are not a prefix + SI base
+    table.update({
+        'mbar': (100.0, 'Pa'), 'bar': (1e5, 'Pa'),
+        'Secs': (1.0, 's'), 'sec': (1.0, 's'), 'Mins': (60.0, 's'), 'min': (60.0, 's'),
+        'Hours': (3600.0, 's'), 'h': (3600.0, 's'),
+        'X': (1.0, 'X'), 'K X': (1e3, 'X'),
+        '°': (1.0, '°'), '°C': (1.0, '°C'), '%': (1.0, '%'),
+    })
+    return table
+
+
+# Class for parsing instrument metadata values into typed, unit-normalised values
+class ValueParser:
+    # Unit string -> (scale to SI, SI unit), computed once per process
+    UNITS = _unit_table()
+
+    def __init__(self, max_cache=200000):
+        # Parse cache: key -> {raw string: ParsedValue}
+        self._cache = {}
+        self._cached = 0
+        self.max_cache = max_cache
+
+
+    def parse(self, value, key=None):
+        """
+        Parses a raw metadata value, e.g. 'WD = 3.198 mm' or '3.198 mm',
+        into ParsedValue(0.003198, 'm', 'WD = 3.198 mm').
+        'Vent inhibit = Beam Present' gives ParsedValue('Beam Present', None, ...).
+        Non-string values are returned as ParsedValue(value, None, value).
+        """
+        if not isinstance(value, str):
+            return ParsedValue(value, None, value)
+
+        # Per-key cache: most instrument values repeat from image to image
+        per_key = self._cache.get(key)
+        if per_key is None:
+            per_key = self._cache[key] = {}
+        parsed = per_key.get(value)
+        if parsed is None:
+            parsed = per_key[value] = self._parse(value)
+
+            # Bound the memory used by the cache
+            self._cached += 1
+            if self._cached > self.max_cache:
+                self._cache, self._cached = {}, 0
+        return parsed
+
+
+    def _parse(self, original):
+        # Keep only the part after 'Label = ' for instrument strings
+        match = KEY_VALUE.match(original)
+        text = match.group('value') if match else original
+
+        # Numbers with a known or single-token unit
+        match = NUMBER_UNIT.match(text)
+        if match:
+            number, unit = float(match.group('number')), match.group('unit')
+            if not unit:
+                return ParsedValue(number, None, original)
+            if unit in self.UNITS:
+                scale, si_unit = self.UNITS[unit]
+                # Round away float noise from the scaling (3.198 * 1e-3 -> 0.003198)
+                return ParsedValue(float(f"{number * scale:.12g}"), si_unit, original)
+            if UNIT_TOKEN.match(unit):
+                return ParsedValue(number, unit, original)
+
+        # Anything else is text (e.g. 'InLens', '1024 * 768', 'Supra 40')
+        return ParsedValue(text.strip(), None, original)
+
+
+def format_si(value, unit):
+    """
+    Formats an SI value with a readable prefix for display,
+    e.g. (0.003198, 'm') -> ('3.198', 'mm'), (16811892.0, 's') -> ('4670', 'h').
+    Returns (value: str, unit: str).
+    """
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return (str(value), unit or "")
+
+    # Long durations read better in hours
+    if unit == 's' and abs(value) >= 3600:
+        return (f"{value / 3600:.6g}", "h")
+
+    # Only SI base units get a prefix (not %, °, X, ...)
+    if unit in ('m', 'A', 's', 'V', 'Pa', 'Hz', 'W') and value != 0:
+        for prefix, scale in (('G', 1e9), ('M', 1e6), ('k', 1e3), ('', 1.0), ('m', 1e-3),
+                              ('µ', 1e-6), ('n', 1e-9), ('p', 1e-12), ('f', 1e-15)):
+            if abs(value) >= scale * 0.9995:
+                return (f"{value / scale:.4g}", prefix + unit)
+        return (f"{value / 1e-15:.4g}", 'f' + unit)
+
+    return (f"{value:.6g}", unit or "")
+
+
+# Shared parser instance, so every module uses the same patterns and cache
+PARSER = ValueParser()
@@ -1,18 +1,29 @@
 # Written by ahmed khalil ahmed.khalil@areasciencepark.it
 #
-# Import modules for file system operations (os), JSON parsing (json), 
-# and regular expressions -- regex (re)
-import os, json, re
+# Import modules for file system operations (os) and JSON parsing (json)
+import os, json
 
-# Import PIL for image loading and matplotlib for visualization
-from PIL import Image
+# Import matplotlib for visualization
 import matplotlib.pyplot as plt
 
+# Import the shared value parser and the display formatting of SI values
+from .value_parser_module import PARSER, format_si
+
+# Import the header reader of the instrument fields (images without cleaned metadata)
+from .metadata_extractor_module import SEMMetaData
+
+# Import the reduced-resolution image loading for the figure
+from .preview_module import load_preview
+
+# Import the stage timer (a no-op unless profiling is enabled)
+from .profiling_module import profiled
+
 
 # Class for visualizing SEM images alongside selected metadata
 class SEMVisualizer:
-    def __init__(self, json_path, image_path):
+    def __init__(self, json_path=None, image_path=None, metadata=None, preview_size=1024, pyramid_dir=None):
         # Store the path to the cleaned metadata JSON file
+        # (optional when the cleaned metadata dictionary is passed directly)
         self.json_path = json_path
         
         # Store the path to the SEM image file
@@ -27,39 +38,44 @@ class SEMVisualizer:
             "AP_BEAM_CURRENT",
             "AP_HOLDER_DIAMETER"]        
         
-        # Initialize an empty dictionary to hold loaded metadata
-        self.metadata = {}
+        # Dictionary holding the metadata, loaded from json_path if not given
+        self.metadata = metadata if metadata is not None else {}
+
+        # The 8x8 inch figure never shows more than ~800 pixels: larger images
+        # are loaded reduced (from the image pyramid in pyramid_dir, if given)
+        self.preview_size = preview_size
+        self.pyramid_dir = pyramid_dir
         
 
     # Load metadata from JSON file into self.metadata
     def load_metadata(self):
+        # Without a cleaned JSON file, only the displayed fields are read from the image header
+        if self.json_path is None:
+            self.metadata = SEMMetaData().InstrumentFields(self.image_path, self.variables)
+            return
         with open(self.json_path, 'r') as f:
             self.metadata = json.load(f)
 
 
     def clean_value(self, raw_value, variable_name=None):
         """
-        Extracts numerical value and unit from a string.
+        Formats a cleaned value ({"value": 0.003198, "unit": "m"}) or a raw
+        string ('WD = 3.198 mm') for display, e.g. ('3.198', 'mm').
         Returns (value: str, unit: str)
         """
         
-        # Ensure the input is a string before applying regex
-        if not isinstance(raw_value, str):
-            return ("N/A", "N/A")
-
-        # Use regex to extract numeric value and unit from the string
-        match = re.search(r"([-+]?\d*\.\d+|\d+)\s*([a-zA-Zµμ]+)", raw_value)        
-        if match:
-            value, unit = match.groups()
-            
-            # Optional: correct unit (e.g., convert 'Hours' to 's')
-            # if variable_name == "AP_BEAM_TIME" and unit.lower() == "hours":
-            #     unit = "s"
-            
-            return (value, unit)
-        else:
-            # Return fallback values (Not Available) if no match is found
-            return ("N/A", "N/A")
+        # Cleaned metadata already holds SI numbers: no parsing needed
+        if isinstance(raw_value, dict) and "value" in raw_value:
+            return format_si(raw_value["value"], raw_value.get("unit"))
+
+        # Older cleaned files hold strings: parse them with the shared parser
+        if isinstance(raw_value, str):
+            parsed = PARSER.parse(raw_value, variable_name)
+            if isinstance(parsed.value, float) and parsed.unit is not None:
+                return format_si(parsed.value, parsed.unit)
+
+        # Return fallback values (Not Available) if there is no number with a unit
+        return ("N/A", "N/A")
             
             
     def extract_variables(self):
@@ -86,23 +102,38 @@ class SEMVisualizer:
         return rows
         
 
-    def show_image_with_table(self):
+    @profiled
+    def show_image_with_table(self, output_dir="./output", show=True, renderer=None, png_path=None):
         """
         Displays the SEM image alongside a formatted metadata
         table and saves the combined output as a figure.
+        With show=False the figure is only saved and then closed (batch mode).
+        With a FigureRenderer the figure is drawn headless on its reused
+        figure template (or as a thumbnail) and never shown.
+        The figure is saved as output_dir/<image name>.png unless png_path is given.
         """
         
-        # Load metadata from JSON into self.metadata
-        self.load_metadata()
+        # Load metadata from JSON (or the image header) into self.metadata (unless passed in memory)
+        if not self.metadata:
+            self.load_metadata()
         
         # Extract and format selected metadata variables
         table_data = self.extract_variables()
         
         # Extract image name (without extension) for output naming
         image_name = os.path.splitext(os.path.basename(self.image_path))[0]
+        png_path = png_path or os.path.join(output_dir, f"{image_name}.png")
+
+        # Ensure output directory exists
+        os.makedirs(output_dir, exist_ok=True)
 
-        # Load the SEM image using PIL
-        img = Image.open(self.image_path)
+        # Headless mode: no pyplot figure is created
+        if renderer is not None:
+            renderer.render(self.image_path, table_data, png_path)
+            return
+
+        # Load the SEM image using PIL, at the resolution the figure needs
+        img = load_preview(self.image_path, max_size=self.preview_size, pyramid_dir=self.pyramid_dir)
 
         # Create a figure with two vertically stacked subplots
         fig, (ax_img, ax_table) = plt.subplots(2, 1, figsize=(8, 8), gridspec_kw={'height_ratios': [2, 2]})
@@ -124,11 +155,11 @@ class SEMVisualizer:
         # Adjust layout to prevent overlap
         plt.tight_layout()
         
-        # Ensure output directory exists
-        os.makedirs("./output", exist_ok=True)
-        
         # Save the figure as a PNG image
-        plt.savefig(f"./output/{image_name}.png")
+        plt.savefig(png_path)
         
-        # Display the figure
-        plt.show()
+        # Display the figure if asked, then always release it
+        # (plt.show() returns at once on non-interactive backends)
+        if show:
+            plt.show()
+        plt.close(fig)
@@ -0,0 +1,467 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import modules for the file system, the Linux inotify API (through ctypes), threads and signals
+import os
+import time
+import queue
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import threading
+from collections import deque
+
+# Import the process pool that survives worker crashes (shared with the batch driver)
+from .worker_module import WorkerPool
+
+# Import the SEM extensions, the per-image worker of the batch driver, the cache and the percentiles
+from .metadata_extractor_module import SEMMetaData
+from .batch_module import find_images, init_worker, run_one, expected_outputs
+from .cache_module import MetadataCache
+from .pipeline_module import processing_options
+from .profiling_module import percentile
+
+# inotify event flags (see linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# Events watched on every directory: new files, finished writes, files moved in
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event header: wd, mask, cookie, len (followed by the name)
+_EVENT = struct.Struct("iIII")
+
+
+# Minimal inotify binding: one descriptor, one watch per directory
+class _Inotify:
+    def __init__(self):
+        # Raises OSError (or AttributeError without inotify) so the caller can fall back to polling
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch descriptor -> watched directory
+        self.dirs = {}
+
+
+    def add_watch(self, directory):
+        # Watch one directory (watching it again is harmless)
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self.dirs[wd] = directory
+
+
+    def read(self, timeout):
+        # Wait up to timeout seconds and return the pending events as (directory, name, mask)
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            # The kernel drops the watch of a deleted directory
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            events.append((self.dirs.get(wd), name, mask))
+        return events
+
+
+    def close(self):
+        os.close(self.fd)
+
+
+# Class for detecting new SEM images in a directory tree once they are completely written
+class FolderWatcher:
+    def __init__(self, root, semext=SEMMetaData().semext, settle=0.25, poll_interval=0.5, use_inotify=None):
+        # Store the watched tree and the supported extensions
+        self.root = os.path.abspath(root)
+        self.semext = semext
+
+        # A file is ready once its size and mtime have not changed for settle seconds
+        self.settle = settle
+
+        # Seconds between two directory checks when polling
+        self.poll_interval = poll_interval
+
+        # Files seen but not ready yet: path -> [(size, mtime_ns), time of last change, time first seen]
+        self.pending = {}
+
+        # Polling state: directory -> (mtime_ns, {file path: (size, mtime_ns)})
+        self.listing = {}
+        self._next_scan = 0.0
+
+        # inotify when available (local Linux file systems), polling otherwise;
+        # use_inotify=False forces polling (network shares do not send inotify events)
+        self.inotify = None
+        if use_inotify is not False:
+            try:
+                self.inotify = _Inotify()
+            except (OSError, AttributeError):
+                if use_inotify:
+                    raise
+        self.mode = "inotify" if self.inotify is not None else "polling"
+
+        # Watch every existing directory; files already there are not reported
+        self._add_tree(self.root, report=False)
+
+
+    def close(self):
+        # Release the inotify descriptor
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+    def _seen(self, path, now):
+        # New or changed candidate file: (re)start its settle timer
+        if path.endswith(self.semext) and path not in self.pending:
+            self.pending[path] = [None, now, now]
+
+
+    def _add_tree(self, top, report):
+        # Watch (or list) a directory tree; report=True also queues the files found in it
+        if self.inotify is None:
+            # Polling: _list_dir recurses into the sub-directories itself
+            self._list_dir(top, report)
+            return
+        now = time.monotonic()
+        for directory, _, files in os.walk(top):
+            try:
+                self.inotify.add_watch(directory)
+            except OSError:
+                continue
+            if report:
+                for name in files:
+                    self._seen(os.path.join(directory, name), now)
+
+
+    def _list_dir(self, directory, report):
+        """
+        Polling: re-lists a directory whose mtime changed and queues new or
+        modified files (and new sub-directories) when report is True.
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.listing.pop(directory, None)
+            return
+        previous = self.listing.get(directory)
+        if previous is not None and previous[0] == mtime:
+            return
+        known = previous[1] if previous is not None else {}
+        files = {}
+        now = time.monotonic()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in self.listing:
+                            self._add_tree(entry.path, report)
+                    elif entry.name.endswith(self.semext):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                        if report and known.get(entry.path) != files[entry.path]:
+                            self._seen(entry.path, now)
+        except OSError:
+            return
+        self.listing[directory] = (mtime, files)
+
+
+    def _read_events(self, timeout):
+        # inotify: turn the kernel events into candidate files and new watches
+        now = time.monotonic()
+        for directory, name, mask in self.inotify.read(timeout):
+            # Events were lost (kernel queue full): list the whole tree once
+            if mask & IN_Q_OVERFLOW:
+                self._add_tree(self.root, report=True)
+            elif directory is None:
+                continue
+            elif mask & IN_ISDIR:
+                # New sub-directory: watch it and pick up files created before the watch
+                self._add_tree(os.path.join(directory, name), report=True)
+            else:
+                self._seen(os.path.join(directory, name), now)
+
+
+    def _settled(self):
+        # Candidates whose size and mtime are unchanged since settle seconds
+        ready = []
+        now = time.monotonic()
+        for path, entry in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != entry[0]:
+                entry[0], entry[1] = signature, now
+            elif stat.st_size > 0 and now - entry[1] >= self.settle:
+                del self.pending[path]
+                ready.append((path, entry[2]))
+                # Polling: remember the final state so the file is not reported again
+                listing = self.listing.get(os.path.dirname(path))
+                if listing is not None:
+                    listing[1][path] = signature
+        return ready
+
+
+    def poll(self, timeout=None):
+        """
+        Waits up to timeout seconds (default: poll_interval) for file system
+        changes and returns the files that just became ready as a list of
+        (path, time.monotonic() when first seen).
+        Only the directories that changed are looked at, never the whole tree
+        (so polling sees new files, not files rewritten in place).
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        # Files waiting to settle are checked several times per settle period
+        if self.pending:
+            timeout = min(timeout, self.settle / 4)
+        if self.inotify is not None:
+            self._read_events(timeout)
+        else:
+            time.sleep(timeout)
+            if time.monotonic() >= self._next_scan:
+                self._next_scan = time.monotonic() + self.poll_interval
+                for directory in list(self.listing):
+                    self._list_dir(directory, report=True)
+        return self._settled()
+
+
+def _init_watch_worker(*args):
+    # Ctrl-C goes to the whole process group: only the daemon handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_worker(*args)
+
+
+# Class for the long-running ingestion of new images into the outputs, catalog, NDJSON and index
+class IngestDaemon:
+    def __init__(self, root, output_dir="output", workers=None, queue_size=64,
+                 header_only=True, render=False, write_raw=True, features=False, thumbnail=None,
+                 cache=None, catalog=None, ndjson=None, index=None,
+                 settle=0.25, poll_interval=0.5, use_inotify=None, save_interval=30.0, verbose=True):
+        # Store the watched tree and the pipeline options (same meaning as in run_batch)
+        self.root = root
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.header_only = header_only
+        self.render = render
+        self.write_raw = write_raw
+        self.features = features
+        self.thumbnail = thumbnail
+        self.options = processing_options(header_only, render, thumbnail, features)
+
+        # The cache de-duplicates events and survives restarts
+        self.cache = cache if cache is not None else MetadataCache(os.path.join(output_dir, ".semmeta_cache.json"))
+        self.catalog = catalog
+        self.ndjson = ndjson
+        self.index = index
+
+        # Watcher options
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        # Seconds between two saves of the cache and the similarity index
+        self.save_interval = save_interval
+        self.verbose = verbose
+
+        # Bounded queue between the watcher thread and the pool: when it is full
+        # the watcher blocks (backpressure) and the kernel keeps the events
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.watcher = None
+
+        # Images being processed (absolute path) and images changed meanwhile
+        self.active = set()
+        self.deferred = {}
+
+        # Worker pool of the running daemon (it rebuilds itself after a worker crash)
+        self.pool = None
+
+        # Counters and the latest arrival-to-catalog latencies (seconds)
+        self.processed, self.failed, self.skipped, self.crashes = 0, 0, 0, 0
+        self.latencies = deque(maxlen=10000)
+
+
+    def stop(self, *_):
+        # Ask run() to finish the running images and return (also used as signal handler)
+        self.stop_event.set()
+
+
+    def _watch(self):
+        # Watcher thread: push ready files into the bounded queue
+        while not self.stop_event.is_set():
+            for item in self.watcher.poll():
+                while not self.stop_event.is_set():
+                    try:
+                        self.queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+
+
+    def _submit(self, image, first_seen):
+        # De-duplicate, then send one image to the pool
+        path = os.path.abspath(image)
+        if path in self.active:
+            # Changed while being processed: look at it again afterwards
+            self.deferred[path] = first_seen
+            return
+        try:
+            outputs = expected_outputs(image, self.output_dir, self.render, self.write_raw)
+            if self.cache.is_fresh(image, outputs, self.options) and (self.index is None or image in self.index):
+                self.skipped += 1
+                return
+            signature = self.cache.signature(image)
+        except OSError:
+            # Deleted before it could be processed
+            return
+        return_data = self.catalog is not None or self.ndjson is not None or self.index is not None
+        job = (image, self.output_dir, self.header_only, self.render, self.write_raw,
+               return_data, self.features, self.index is not None)
+        self.pool.submit(run_one, job, (path, first_seen, outputs, signature))
+        self.active.add(path)
+
+
+    def _collect(self, result, path, first_seen, outputs, signature):
+        # Store the result of one image as soon as its worker returns it
+        self.active.discard(path)
+        if result is None:
+            # It crashed its worker process on its own (the pool was rebuilt)
+            result = (path, 0, "worker process crashed", None, None)
+        image, _, error, cleaned_data, _ = result
+        if error is None:
+            if self.catalog is not None:
+                self.catalog.append(image, cleaned_data)
+            if self.ndjson is not None:
+                self.ndjson.write({"image": image, **cleaned_data})
+            if self.index is not None:
+                self.index.add(image, cleaned_data["PX_DHASH"])
+            self.cache.update(image, outputs, signature, self.options)
+            self.processed += 1
+            # Images found by the start-up scan have no arrival time
+            if first_seen is not None:
+                self.latencies.append(time.monotonic() - first_seen)
+            if self.verbose:
+                delay = f" ({self.latencies[-1] * 1e3:.0f} ms after arrival)" if first_seen is not None else ""
+                print(f"[OK] {image}{delay}")
+        else:
+            self.failed += 1
+            if self.verbose:
+                print("[ERROR]", image, "->", error.splitlines()[0])
+
+
+    def save(self):
+        # Persist the cache and the index, and push the buffered NDJSON lines to disk
+        self.cache.save()
+        if self.index is not None:
+            self.index.save()
+        if self.ndjson is not None:
+            self.ndjson.flush()
+
+
+    def run(self, initial_scan=True):
+        """
+        Watches the tree and processes every new or modified image until
+        stop() is called (SIGINT/SIGTERM when run from the main thread).
+        With initial_scan=True, images added while the daemon was not running
+        are processed first (unchanged ones are skipped through the cache).
+        On shutdown, the running images are finished and the cache, the index
+        and the NDJSON file are saved; images still queued are picked up by
+        the start-up scan of the next run. A worker that dies (killed, or
+        crashed by a corrupt file) does not stop the daemon: the pool is
+        restarted and the images it was processing are retried one by one,
+        the one crashing alone is counted as failed. Returns summary().
+        """
+        # Watch first, then scan, so that no file can slip in between
+        self.watcher = FolderWatcher(self.root, settle=self.settle, poll_interval=self.poll_interval,
+                                     use_inotify=self.use_inotify)
+        backlog = deque((image, None) for image in find_images([self.root])) if initial_scan else deque()
+        if self.verbose:
+            print(f"Watching {self.watcher.root} ({self.watcher.mode}), {len(backlog)} existing images")
+
+        # Graceful shutdown on Ctrl-C / kill (signal handlers only work in the main thread)
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, self.stop)
+
+        watcher_thread = threading.Thread(target=self._watch, name="semmeta-watcher", daemon=True)
+        watcher_thread.start()
+
+        # Two jobs per worker keep the pool busy while results are being stored
+        max_running = 2 * self.workers
+        next_save = time.monotonic() + self.save_interval
+        self.pool = WorkerPool(self.workers, _init_watch_worker, (self.render, self.thumbnail, None, False),
+                               warm=True, verbose=self.verbose)
+        try:
+            self.pool.start()
+            while True:
+                # Fill the pool from the start-up backlog, then from the queue
+                # (once stopping, only the running images are finished)
+                while self.pool.ready(max_running) and not self.stop_event.is_set():
+                    if backlog:
+                        item = backlog.popleft()
+                    else:
+                        try:
+                            item = self.queue.get_nowait()
+                        except queue.Empty:
+                            break
+                    self._submit(*item)
+
+                if self.pool.busy:
+                    for job, result in self.pool.results(timeout=0.05):
+                        self._collect(result, *job)
+                        # A change seen while it was running: check the image again
+                        if job[0] in self.deferred:
+                            backlog.append((job[0], self.deferred.pop(job[0])))
+                elif self.stop_event.is_set():
+                    break
+                else:
+                    # Idle: sleep on the queue until the watcher finds something
+                    try:
+                        backlog.append(self.queue.get(timeout=0.1))
+                    except queue.Empty:
+                        pass
+
+                if time.monotonic() >= next_save:
+                    self.save()
+                    next_save = time.monotonic() + self.save_interval
+        finally:
+            self.crashes = self.pool.crashes
+            self.pool.shutdown()
+            self.stop_event.set()
+            watcher_thread.join()
+            self.watcher.close()
+            self.save()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        return self.summary()
+
+
+    def summary(self):
+        # Counters and arrival-to-catalog latencies (p50/p95/max in seconds)
+        latencies = sorted(self.latencies)
+        summary = {"processed": self.processed, "failed": self.failed, "skipped": self.skipped,
+                   "crashes": self.crashes}
+        if latencies:
+            summary["latency_s"] = {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                                    "max": latencies[-1]}
+        return summary
@@ -0,0 +1,129 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Import os for the worker count and the queue of jobs to retry
+import os
+from collections import deque
+
+# Import the process pool and the helpers to wait for its results
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor, FIRST_COMPLETED, wait
+
+
+# Class for a process pool that survives the death of its workers (OOM kill, segfault in a decoder)
+class WorkerPool:
+    def __init__(self, workers=None, initializer=None, initargs=(), warm=False, verbose=False):
+        # Pool size and the per-worker set-up
+        self.workers = workers or os.cpu_count() or 1
+        self.initializer = initializer
+        self.initargs = initargs
+
+        # With warm=True every worker is started with the pool, not when the first job arrives
+        self.warm = warm
+        self.verbose = verbose
+
+        # Jobs in the pool: future -> (function, job, tag given by the caller)
+        self.running = {}
+
+        # Jobs lost together in a crash are retried one at a time: the suspects,
+        # and the future of the suspect running alone (if any)
+        self.suspects = deque()
+        self.isolated = None
+
+        # Number of times the pool was rebuilt
+        self.crashes = 0
+        self.pool = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+    def start(self):
+        # New process pool (with its workers running once it returns, if warm)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                        initargs=self.initargs)
+        if self.warm:
+            wait([self.pool.submit(os.getpid) for _ in range(self.workers)])
+
+
+    def shutdown(self):
+        # Wait for the workers to exit (safe to call twice)
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+
+    def _restart(self):
+        # A worker died: the pool is unusable, replace it
+        self.crashes += 1
+        if self.verbose:
+            print(f"[WARNING] worker process died, restarting the pool ({len(self.suspects)} jobs to retry)")
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.start()
+
+
+    @property
+    def busy(self):
+        # Jobs running or waiting to be retried
+        return bool(self.running or self.suspects)
+
+
+    def ready(self, limit):
+        # A new job may go in: fewer than limit running, and no crash suspect waiting or running alone
+        return len(self.running) < limit and not self.suspects and self.isolated is None
+
+
+    def submit(self, function, job, tag=None):
+        # Send function(job) to a worker; its result comes back from results() with tag
+        try:
+            future = self.pool.submit(function, job)
+        except BrokenExecutor:
+            # A worker died while idle: no job was lost
+            self._restart()
+            future = self.pool.submit(function, job)
+        self.running[future] = (function, job, tag)
+        return future
+
+
+    def _finish(self, future):
+        _, _, tag = self.running.pop(future)
+        if future is self.isolated:
+            self.isolated = None
+        return tag, future.result()
+
+
+    def results(self, timeout=None):
+        """
+        Waits up to timeout seconds for finished jobs and returns them as a
+        list of (tag, result). When a worker dies, every running job is lost
+        with the pool: the pool is rebuilt, a job that was running alone is
+        returned with result None (it crashed the worker), jobs lost together
+        are retried one at a time, alone, before any new job goes in.
+        """
+        # A suspect goes back in once the pool is empty
+        if self.suspects and not self.running:
+            function, job, tag = self.suspects.popleft()
+            self.isolated = self.submit(function, job, tag)
+        if not self.running:
+            return []
+
+        done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not any(isinstance(future.exception(), BrokenExecutor) for future in done):
+            return [self._finish(future) for future in done]
+
+        # Every job still running went down with the pool: wait for all their futures
+        wait(self.running)
+        lost = [future for future in self.running if isinstance(future.exception(), BrokenExecutor)]
+        finished = [self._finish(future) for future in list(self.running) if future not in lost]
+        lost = [self.running.pop(future) for future in lost]
+        self.isolated = None
+        if len(lost) == 1:
+            finished.append((lost[0][2], None))
+        else:
+            self.suspects.extend(lost)
+        self._restart()
+        return finished
@@ -0,0 +1,49 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Similarity query: python similar_main.py "imgs/LIL test_defect02.tif" -k 5
+import os
+import json
+import argparse
+
+# Import the similarity index, the output naming and the table formatting of the visualizer
+from semmeta.similarity_module import SimilarityIndex, perceptual_hash
+from semmeta.pipeline_module import output_paths
+from semmeta.visualizer_module import SEMVisualizer
+
+
+def main():
+    # Parse command-line options
+    parser = argparse.ArgumentParser(description="Find the SEM images most similar to a given image.")
+    parser.add_argument("semimage", help="query image (indexed or not)")
+    parser.add_argument("-o", "--output", default="output",
+                        help="output directory holding similarity_index.npz and the cleaned JSON files (default: output)")
+    parser.add_argument("-k", type=int, default=5, help="number of matches to show (default: 5)")
+    args = parser.parse_args()
+
+    # Load the index built by batch_main.py --similarity
+    index = SimilarityIndex(os.path.join(args.output, "similarity_index.npz"))
+    if not len(index):
+        raise SystemExit(f"Empty similarity index in {args.output} (run batch_main.py --similarity first)")
+
+    # Use the stored hash of an indexed image, otherwise hash the query now
+    phash = index.hash_of(args.semimage) or perceptual_hash(args.semimage)
+    matches = index.query(phash, k=args.k, exclude=args.semimage)
+
+    print(f"\n{len(matches)} images most similar to {args.semimage} (out of {len(index)}):")
+    for rank, (path, distance) in enumerate(matches, 1):
+        print(f"\n{rank}. {path}  (Hamming distance {distance}/{len(phash) * 4})")
+
+        # Key AP_* parameters from the cleaned metadata of the match
+        try:
+            with open(output_paths(path, args.output, unique=True)[1]) as f:
+                rows = SEMVisualizer(metadata=json.load(f)).extract_variables()
+        except (IOError, ValueError):
+            print("   (no cleaned metadata found)")
+            continue
+        for variable, value, unit in rows:
+            print(f"   {variable:22s} {value:>10s} {unit}")
+
+
+# Run the main function only if this script is executed directly (not imported)
+if __name__ == "__main__":
+    main()
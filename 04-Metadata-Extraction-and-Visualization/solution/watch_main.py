@@ -0,0 +1,76 @@
+# Written by ahmed khalil ahmed.khalil@areasciencepark.it
+#
+# Ingestion daemon: python watch_main.py /mnt/microscope -o output --catalog output/catalog.db
+import os
+import argparse
+
+# Import the watch-folder daemon and the optional sinks of the batch driver
+from semmeta.watch_module import IngestDaemon
+from semmeta.cache_module import MetadataCache
+from semmeta.catalog_module import SEMCatalog
+from semmeta.ndjson_module import NDJSONWriter, compact_ndjson
+from semmeta.similarity_module import SimilarityIndex
+
+
+def main():
+    # Parse command-line options
+    parser = argparse.ArgumentParser(description="Watch a folder and run the SEM metadata pipeline on every new image.")
+    parser.add_argument("folder", help="directory tree where the microscopes write their images")
+    parser.add_argument("-o", "--output", default="output", help="output directory (default: output)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("-q", "--queue-size", type=int, default=64,
+                        help="ready images waiting for a worker before the watcher pauses (default: 64)")
+    parser.add_argument("--settle", type=float, default=0.25,
+                        help="seconds a file size must stay unchanged before it is read (default: 0.25)")
+    parser.add_argument("--poll", action="store_true",
+                        help="poll the directories instead of using inotify (needed for network shares)")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="seconds between two polls (default: 0.5)")
+    parser.add_argument("--no-initial-scan", action="store_true",
+                        help="do not process the images already in the folder at start-up")
+    parser.add_argument("--render", action="store_true", help="also save the image + table PNG for each image")
+    parser.add_argument("--thumbnail", type=int, default=None, metavar="SIZE",
+                        help="with --render, save only a SIZE x SIZE thumbnail of each image")
+    parser.add_argument("--features", action="store_true",
+                        help="add pixel statistics and focus/noise metrics (PX_* fields) to the cleaned metadata")
+    parser.add_argument("--similarity", action="store_true",
+                        help="add each image to the similarity index <output>/similarity_index.npz")
+    parser.add_argument("--pil", action="store_true", help="extract through PIL instead of the header-only reader")
+    parser.add_argument("--no-raw", action="store_true", help="do not write the <name>-<hash>_raw.json files")
+    parser.add_argument("--catalog", default=None, help="SQLite catalog to append the cleaned metadata to")
+    parser.add_argument("--ndjson", default=None, help="also append the cleaned metadata to this NDJSON file")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        raise SystemExit(f"Not a directory: {args.folder}")
+
+    # Same sinks as batch_main.py, kept open for the lifetime of the daemon
+    cache = MetadataCache(os.path.join(args.output, ".semmeta_cache.json"))
+    catalog = SEMCatalog(args.catalog) if args.catalog else None
+    ndjson = NDJSONWriter(args.ndjson, append=True) if args.ndjson else None
+    index = SimilarityIndex(os.path.join(args.output, "similarity_index.npz")) if args.similarity else None
+
+    daemon = IngestDaemon(args.folder, output_dir=args.output, workers=args.workers,
+                          queue_size=args.queue_size, header_only=not args.pil, render=args.render,
+                          write_raw=not args.no_raw, features=args.features, thumbnail=args.thumbnail,
+                          cache=cache, catalog=catalog, ndjson=ndjson, index=index,
+                          settle=args.settle, poll_interval=args.poll_interval,
+                          use_inotify=False if args.poll else None)
+
+    # Runs until Ctrl-C or SIGTERM, then finishes the images in progress
+    summary = daemon.run(initial_scan=not args.no_initial_scan)
+    print(f"\nStopped: {summary['processed']} processed, {summary['failed']} failed, {summary['skipped']} unchanged")
+    if "latency_s" in summary:
+        latency = summary["latency_s"]
+        print(f"Arrival to catalog: p50 {latency['p50'] * 1e3:.0f} ms, p95 {latency['p95'] * 1e3:.0f} ms,"
+              f" max {latency['max'] * 1e3:.0f} ms")
+    if ndjson is not None:
+        ndjson.close()
+        # Re-processed images replace their older lines
+        print(f"NDJSON {args.ndjson}: {compact_ndjson(args.ndjson)} outdated records removed")
+    if catalog is not None:
+        catalog.close()
+
+
+# Run the main function only if this script is executed directly (not imported)
+if __name__ == "__main__":
+    main()